@@ -1,13 +1,26 @@
+from config import Config
+
+# Cooperative async modes must patch the standard library before anything else loads
+if Config.WEBSOCKET_ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif Config.WEBSOCKET_ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
 from flask import Flask
 from flask_cors import CORS
 import os
 import atexit
-from config import Config
 from utils.database import init_db
 from utils.websocket_manager import init_websocket_manager
 from utils.change_streams import start_change_stream_monitoring, stop_change_stream_monitoring
 from services.mcp_monitor import start_mcp_monitoring, stop_mcp_monitoring
 from services.notification_hub import start_notification_monitoring, stop_notification_monitoring
+from utils.metrics_sampler import start_metrics_sampling, stop_metrics_sampling
+from utils.job_scheduler import get_job_scheduler
+from models.audit_rollup import start_rollup_flushing, stop_rollup_flushing
+from services.audit_service import get_audit_service
 
 def create_app():
     app = Flask(__name__)
@@ -52,6 +65,17 @@ def create_app():
     # Start background services
     def start_services():
         try:
+            # Start system metrics sampling
+            start_metrics_sampling()
+            
+            # Every process writes audit records, so every process flushes its rollup counts
+            start_rollup_flushing()
+            
+            # In a multi-process deployment only one process runs the rest
+            if not Config.RUN_BACKGROUND_SERVICES:
+                print("✅ Websocket node started without background services")
+                return
+            
             # Start MCP monitoring
             start_mcp_monitoring()
             
@@ -61,6 +85,9 @@ def create_app():
             # Start notification monitoring
             start_notification_monitoring()
             
+            # Signed audit chain checkpoints keep verification incremental
+            get_audit_service().start_checkpointing()
+            
             print("✅ All MCP services started successfully")
             
         except Exception as e:
@@ -69,9 +96,14 @@ def create_app():
     # Stop background services on shutdown
     def stop_services():
         try:
-            stop_mcp_monitoring()
-            stop_change_stream_monitoring()
-            stop_notification_monitoring()
+            if Config.RUN_BACKGROUND_SERVICES:
+                stop_mcp_monitoring()
+                stop_change_stream_monitoring()
+                stop_notification_monitoring()
+                get_audit_service().stop_checkpointing()
+            stop_metrics_sampling()
+            get_job_scheduler().shutdown()
+            stop_rollup_flushing()
             print("✅ All MCP services stopped gracefully")
         except Exception as e:
             print(f"❌ Error stopping MCP services: {str(e)}")
@@ -87,4 +119,10 @@ def create_app():
 
 if __name__ == '__main__':
     app = create_app()
-    app.run(debug=True, host='0.0.0.0', port=5005)
+    
+    if Config.WEBSOCKET_ASYNC_MODE == 'threading':
+        app.run(debug=True, host='0.0.0.0', port=5005)
+    else:
+        # eventlet/gevent serve websockets through their own WSGI server
+        from utils.websocket_manager import get_websocket_manager
+        get_websocket_manager().socketio.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5005)))
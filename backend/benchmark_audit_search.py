@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark audit trail search: legacy regex scan vs indexed search.
+
+Generates a synthetic audit trail (10M records by default) in a separate
+database, applies the audit_trail index registry and times both search
+modes, reporting documents examined from explain().
+
+    python benchmark_audit_search.py --records 10000000
+    python benchmark_audit_search.py --skip-load      # reuse existing data
+"""
+
+import sys
+import os
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from pymongo import MongoClient
+from config import Config
+from models.audit_trail import AuditTrail, tokenize_command
+from utils.indexes import INDEX_REGISTRY, apply_index_registry
+
+COLLECTIONS = ['students', 'courses', 'attendance', 'leave', 'fees', 'api_audit']
+OPERATIONS = ['create', 'update', 'delete', 'api_call']
+COMMANDS = [
+    'UPDATE_STUDENT_PROFILE', 'MARK_ATTENDANCE', 'APPROVE_LEAVE',
+    'CREATE_COURSE', 'COLLECT_FEE', 'CHANGE_STREAM_DETECTED', 'GET /api/mcp/operations'
+]
+
+def generate_records(count, days):
+    """Yield synthetic audit records spread over the last `days` days"""
+    now = datetime.now()
+    
+    for i in range(count):
+        command = random.choice(COMMANDS)
+        timestamp = now - timedelta(seconds=random.randint(0, days * 86400))
+        
+        yield {
+            'collectionName': random.choice(COLLECTIONS),
+            'operationType': random.choice(OPERATIONS),
+            'entityId': f"{random.randint(0, 500000):024x}",
+            'mcpCommand': f"{command}:{i % 1000}",
+            'searchTokens': tokenize_command(f"{command}:{i % 1000}"),
+            'userId': f"user{random.randint(0, 5000)}",
+            'afterState': {'value': i},
+            'timestamp': timestamp,
+            'createdAt': timestamp
+        }
+
+def load(collection, count, days, batch_size=10000):
+    """Bulk insert the synthetic audit trail"""
+    print(f"Loading {count:,} audit records...")
+    started = time.perf_counter()
+    batch = []
+    
+    for record in generate_records(count, days):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    
+    print(f"Loaded in {time.perf_counter() - started:.1f}s")
+
+def run_query(trail, filter_query, limit, repeat):
+    """Median latency in ms plus explain() stats for one query"""
+    timings = []
+    
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(trail.collection.find(filter_query).sort('timestamp', -1).limit(limit))
+        timings.append((time.perf_counter() - started) * 1000)
+    
+    explain = trail.collection.find(filter_query).sort('timestamp', -1).limit(limit).explain()
+    stats = explain.get('executionStats', {})
+    
+    return {
+        'medianMs': sorted(timings)[len(timings) // 2],
+        'docsExamined': stats.get('totalDocsExamined'),
+        'keysExamined': stats.get('totalKeysExamined')
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark audit trail search modes')
+    parser.add_argument('--records', type=int, default=10_000_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--database', default='college_erp_search_benchmark')
+    parser.add_argument('--skip-load', action='store_true')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+    
+    client = MongoClient(Config.MONGO_URI)
+    db = client[args.database]
+    
+    if not args.skip_load:
+        db.audit_trail.drop()
+        load(db.audit_trail, args.records, args.days)
+    
+    apply_index_registry(db, {'audit_trail': INDEX_REGISTRY['audit_trail']})
+    
+    trail = AuditTrail()
+    trail.collection = db.audit_trail
+    
+    searches = [
+        ('collection prefix', 'stud', {}),
+        ('user exact', 'user42', {'match': 'exact'}),
+        ('command token', 'attendance', {}),
+        ('entity prefix', '0000ff', {'field': 'entityId'}),
+    ]
+    
+    print(f"\n{'search':<20}{'mode':<10}{'window':<10}{'median ms':>12}{'docs':>14}{'keys':>14}")
+    
+    for label, term, options in searches:
+        for mode in ('regex', 'indexed'):
+            for window, hours in (('7d', None), ('all', 24 * args.days)):
+                filter_query = trail.build_search_filter(term, mode=mode, hours=hours, **options)
+                result = run_query(trail, filter_query, args.limit, args.repeat)
+                print(f"{label:<20}{mode:<10}{window:<10}{result['medianMs']:>12.1f}"
+                      f"{str(result['docsExamined']):>14}{str(result['keysExamined']):>14}")
+    
+    client.close()
+
+if __name__ == "__main__":
+    main()
@@ -23,3 +23,101 @@ class Config:
     # Pagination
     DEFAULT_PAGE_SIZE = 20
     MAX_PAGE_SIZE = 100
+    
+    # Audit logging
+    AUDIT_POLICY_FILE = os.environ.get('AUDIT_POLICY_FILE') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'audit_policies.json'
+    )
+    AUDIT_CHECKPOINT_KEY = os.environ.get('AUDIT_CHECKPOINT_KEY') or SECRET_KEY
+    # Seconds between scheduled chain verifications that write a signed checkpoint
+    AUDIT_CHECKPOINT_INTERVAL = float(os.environ.get('AUDIT_CHECKPOINT_INTERVAL', 3600))
+    
+    # Audit statistics rollup: buffered increments are flushed after this many
+    # seconds or once this many distinct buckets are pending
+    AUDIT_ROLLUP_FLUSH_INTERVAL = float(os.environ.get('AUDIT_ROLLUP_FLUSH_INTERVAL', 5))
+    AUDIT_ROLLUP_FLUSH_SIZE = int(os.environ.get('AUDIT_ROLLUP_FLUSH_SIZE', 200))
+    
+    # Cold audit records are moved to compressed segment files under this directory
+    AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'audit_archive'
+    )
+    AUDIT_ARCHIVE_SEGMENT_SIZE = int(os.environ.get('AUDIT_ARCHIVE_SEGMENT_SIZE', 50000))
+    
+    # Store field-level deltas instead of full before/after states, with a
+    # full snapshot every AUDIT_SNAPSHOT_INTERVAL versions of an entity
+    AUDIT_DELTA_STORAGE = os.environ.get('AUDIT_DELTA_STORAGE', 'False').lower() == 'true'
+    AUDIT_SNAPSHOT_INTERVAL = int(os.environ.get('AUDIT_SNAPSHOT_INTERVAL', 20))
+    
+    # Audit search: index mcpCommand tokens and default time window in hours
+    AUDIT_SEARCH_TOKENS = os.environ.get('AUDIT_SEARCH_TOKENS', 'True').lower() == 'true'
+    AUDIT_SEARCH_DEFAULT_HOURS = int(os.environ.get('AUDIT_SEARCH_DEFAULT_HOURS', 24 * 7))
+    
+    # Change streams: server-side wait per getMore, worker lanes and lane queue size
+    CHANGE_STREAM_MAX_AWAIT_MS = int(os.environ.get('CHANGE_STREAM_MAX_AWAIT_MS', 1000))
+    CHANGE_STREAM_WORKERS = int(os.environ.get('CHANGE_STREAM_WORKERS', 4))
+    CHANGE_STREAM_QUEUE_SIZE = int(os.environ.get('CHANGE_STREAM_QUEUE_SIZE', 1000))
+    
+    # Change stream resume tokens are checkpointed every N seconds or N events;
+    # the backlog after a restart is read in batches of this size
+    CHANGE_STREAM_CHECKPOINT_INTERVAL = float(os.environ.get('CHANGE_STREAM_CHECKPOINT_INTERVAL', 5))
+    CHANGE_STREAM_CHECKPOINT_EVENTS = int(os.environ.get('CHANGE_STREAM_CHECKPOINT_EVENTS', 500))
+    CHANGE_STREAM_CATCHUP_BATCH_SIZE = int(os.environ.get('CHANGE_STREAM_CATCHUP_BATCH_SIZE', 1000))
+    
+    # Lanes collect change events for up to N ms or N events and write their
+    # audit records with one insert_many
+    CHANGE_STREAM_BATCH_WINDOW_MS = int(os.environ.get('CHANGE_STREAM_BATCH_WINDOW_MS', 20))
+    CHANGE_STREAM_BATCH_SIZE = int(os.environ.get('CHANGE_STREAM_BATCH_SIZE', 500))
+    
+    # Background system metrics sampler: sample period, number of samples kept
+    # and how often the heavier MongoDB serverStatus call is made
+    METRICS_SAMPLE_INTERVAL = float(os.environ.get('METRICS_SAMPLE_INTERVAL', 2))
+    METRICS_HISTORY_SIZE = int(os.environ.get('METRICS_HISTORY_SIZE', 1800))
+    METRICS_DB_SAMPLE_INTERVAL = float(os.environ.get('METRICS_DB_SAMPLE_INTERVAL', 10))
+    
+    # Websocket snapshots: versions kept for patching, and Engine.IO payload
+    # compression for messages above the threshold (bytes)
+    WEBSOCKET_SNAPSHOT_HISTORY = int(os.environ.get('WEBSOCKET_SNAPSHOT_HISTORY', 8))
+    WEBSOCKET_COMPRESSION = os.environ.get('WEBSOCKET_COMPRESSION', 'True').lower() == 'true'
+    WEBSOCKET_COMPRESSION_THRESHOLD = int(os.environ.get('WEBSOCKET_COMPRESSION_THRESHOLD', 1024))
+    
+    # Websocket deployment: Socket.IO async mode ('threading', 'eventlet' or
+    # 'gevent') and the queue that carries room broadcasts between processes.
+    # Leave the queue empty for a single process, use 'mongodb' for a capped
+    # collection, or give a redis://, amqp:// or zmq URL.
+    WEBSOCKET_ASYNC_MODE = os.environ.get('WEBSOCKET_ASYNC_MODE', 'threading')
+    WEBSOCKET_MESSAGE_QUEUE = os.environ.get('WEBSOCKET_MESSAGE_QUEUE', '')
+    WEBSOCKET_QUEUE_COLLECTION_SIZE = int(os.environ.get('WEBSOCKET_QUEUE_COLLECTION_SIZE', 64 * 1024 * 1024))
+    
+    # Only one process per deployment should run the change streams and monitors
+    RUN_BACKGROUND_SERVICES = os.environ.get('RUN_BACKGROUND_SERVICES', 'True').lower() == 'true'
+    
+    # Websocket backpressure: a client with more than this many packets waiting
+    # is congested. Policy 'latest' holds only the newest snapshot per stream
+    # until it drains; 'disconnect' drops the client. With a message queue each
+    # process checks its own clients every drain interval and takes congested
+    # ones out of the queued delta rooms, so a delta can still reach a client
+    # that became congested since the last check.
+    WEBSOCKET_MAX_QUEUE_DEPTH = int(os.environ.get('WEBSOCKET_MAX_QUEUE_DEPTH', 64))
+    WEBSOCKET_BACKPRESSURE_POLICY = os.environ.get('WEBSOCKET_BACKPRESSURE_POLICY', 'latest')
+    WEBSOCKET_OUTBOX_DRAIN_INTERVAL = float(os.environ.get('WEBSOCKET_OUTBOX_DRAIN_INTERVAL', 0.5))
+    
+    # Periodic background jobs share one scheduler: worker pool size and the
+    # random spread applied to each run, as a fraction of the job's interval
+    SCHEDULER_WORKERS = int(os.environ.get('SCHEDULER_WORKERS', 4))
+    SCHEDULER_JITTER = float(os.environ.get('SCHEDULER_JITTER', 0.1))
+    
+    # Longest window (minutes) served by the in-memory MCP operation counter
+    OPERATION_COUNTER_WINDOW_MINUTES = int(os.environ.get('OPERATION_COUNTER_WINDOW_MINUTES', 60))
+    
+    # MCP server health probing: comma-separated base URLs, the health path,
+    # and seconds between probe rounds and before a probe times out
+    MCP_SERVER_URLS = [url.strip() for url in os.environ.get('MCP_SERVER_URLS', 'http://localhost:8000').split(',') if url.strip()]
+    MCP_PROBE_PATH = os.environ.get('MCP_PROBE_PATH', '/health')
+    MCP_PROBE_INTERVAL = float(os.environ.get('MCP_PROBE_INTERVAL', 5))
+    MCP_PROBE_TIMEOUT = float(os.environ.get('MCP_PROBE_TIMEOUT', 5))
+    
+    # Opt-in time-series storage: comma-separated collections to create or
+    # migrate as time-series (system_health, mcp_operations), and an optional
+    # expiry for their documents in days (0 keeps them)
+    TIMESERIES_COLLECTIONS = [name.strip() for name in os.environ.get('TIMESERIES_COLLECTIONS', '').split(',') if name.strip()]
+    TIMESERIES_EXPIRE_DAYS = float(os.environ.get('TIMESERIES_EXPIRE_DAYS', 0))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Load test the websocket dashboards: ramp up concurrent Socket.IO clients.
+
+Each step opens --step more clients that subscribe to the dashboard streams
+and hold the connection. Per step it reports how many clients stay connected,
+connect latency and messages received, and stops once too many fail.
+
+    python load_test_websockets.py --url http://localhost:5005 --max 2000
+    python load_test_websockets.py --url http://node-a:5005 --url http://node-b:5005
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import itertools
+import time
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import aiohttp
+import socketio
+
+STREAMS = ['mcp_operations', 'system_health', 'audit_trail', 'notifications']
+
+class DashboardClient:
+    """One simulated admin dashboard"""
+    
+    def __init__(self, url, streams):
+        self.url = url
+        self.streams = streams
+        self.client = socketio.AsyncClient(reconnection=False)
+        self.messages = 0
+        self.connect_ms = None
+        self.error = None
+        
+        @self.client.on('*')
+        async def on_any(event, data=None):
+            self.messages += 1
+            
+            # Acknowledge snapshot versions so later ticks arrive as patches
+            if event in ('stream_data', 'stream_patch') and isinstance(data, dict) and 'version' in data:
+                await self.client.emit('ack_snapshot', {'stream': data['stream'], 'version': data['version']})
+    
+    async def start(self):
+        started = time.perf_counter()
+        try:
+            await self.client.connect(self.url, transports=['websocket'], wait_timeout=10)
+            self.connect_ms = (time.perf_counter() - started) * 1000
+            for stream in self.streams:
+                await self.client.emit('subscribe', {'stream': stream, 'room': 'default'})
+        except Exception as e:
+            self.error = str(e)
+    
+    @property
+    def connected(self):
+        return self.client.connected
+    
+    async def stop(self):
+        if self.client.connected:
+            await self.client.disconnect()
+
+async def node_stats(session, url):
+    """Connection stats reported by one node"""
+    try:
+        async with session.get(f"{url}/api/mcp/websocket/stats", timeout=5) as response:
+            body = await response.json()
+            return body.get('data', {})
+    except Exception:
+        return {}
+
+async def run(args):
+    clients = []
+    urls = itertools.cycle(args.url)
+    limit = asyncio.Semaphore(args.concurrency)
+    
+    async def start_client():
+        client = DashboardClient(next(urls), args.streams)
+        async with limit:
+            await client.start()
+        return client
+    
+    print(f"{'target':>8}{'connected':>11}{'failed':>8}{'p50 ms':>9}{'p95 ms':>9}{'msg/s':>10}  nodes")
+    
+    async with aiohttp.ClientSession() as session:
+        for target in range(args.start, args.max + 1, args.step):
+            new_clients = await asyncio.gather(*(start_client() for _ in range(target - len(clients))))
+            clients.extend(new_clients)
+            
+            before = sum(client.messages for client in clients)
+            await asyncio.sleep(args.hold)
+            received = sum(client.messages for client in clients) - before
+            
+            connected = sum(1 for client in clients if client.connected)
+            failed = len(clients) - connected
+            latencies = sorted(client.connect_ms for client in new_clients if client.connect_ms is not None)
+            p50 = latencies[len(latencies) // 2] if latencies else 0
+            p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+            
+            stats = await asyncio.gather(*(node_stats(session, url) for url in args.url))
+            per_node = '/'.join(str(node.get('total_connections', '?')) for node in stats)
+            
+            print(f"{target:>8}{connected:>11}{failed:>8}{p50:>9.1f}{p95:>9.1f}"
+                  f"{received / args.hold:>10.1f}  {per_node}")
+            
+            if failed > target * args.max_failure_rate:
+                errors = {client.error for client in clients if client.error}
+                print(f"Stopping: {failed} of {target} clients failed {sorted(errors)[:3]}")
+                break
+    
+    await asyncio.gather(*(client.stop() for client in clients), return_exceptions=True)
+
+def main():
+    parser = argparse.ArgumentParser(description='Ramp concurrent websocket dashboards')
+    parser.add_argument('--url', action='append', help='Node URL; repeat for several nodes')
+    parser.add_argument('--start', type=int, default=50)
+    parser.add_argument('--step', type=int, default=50)
+    parser.add_argument('--max', type=int, default=1000)
+    parser.add_argument('--hold', type=float, default=15, help='Seconds to hold each step')
+    parser.add_argument('--concurrency', type=int, default=50, help='Connects in flight at once')
+    parser.add_argument('--streams', nargs='+', default=STREAMS)
+    parser.add_argument('--max-failure-rate', type=float, default=0.05)
+    args = parser.parse_args()
+    args.url = args.url or ['http://localhost:5005']
+    
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
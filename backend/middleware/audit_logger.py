@@ -1,11 +1,16 @@
 import json
+import os
 import time
-from datetime import datetime
+import random
+from datetime import datetime, timedelta
+from fnmatch import fnmatch
 from functools import wraps
-from flask import request, g
+from flask import request, g, has_app_context
+from config import Config
 from services.audit_service import get_audit_service
 from models.mcp_operation import MCPOperation
 import logging
+import threading
 import traceback
 
 class AuditLogger:
@@ -17,7 +22,10 @@ class AuditLogger:
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         
-        # Audit configuration
+        # Audit configuration. The dict is never mutated in place: writers
+        # build a new copy under the lock and swap the reference, so readers
+        # can use self.config without locking.
+        self._config_lock = threading.Lock()
         self.config = {
             'log_requests': True,
             'log_responses': True,
@@ -26,8 +34,87 @@ class AuditLogger:
             'exclude_paths': ['/health', '/ping', '/favicon.ico'],
             'exclude_methods': ['OPTIONS'],
             'sensitive_fields': ['password', 'token', 'secret', 'key'],
-            'max_payload_size': 10000  # Max size of request/response to log
+            'max_payload_size': 10000,  # Max size of request/response to log
+            
+            # Per-route audit policies. Levels: 'full' (headers and bodies),
+            # 'metadata' (method, path, status and timing only) or 'none'.
+            # Routes are matched in order with fnmatch-style patterns; the
+            # first match wins, otherwise the method default applies.
+            'read_methods': ['GET', 'HEAD'],
+            'default_read_level': 'metadata',
+            'default_write_level': 'full',
+            'route_policies': [],
+            
+            # Policy file is re-read when its modification time changes
+            'policy_file': Config.AUDIT_POLICY_FILE,
+            'policy_reload_interval': 5  # Seconds between mtime checks
         }
+        
+        self._policy_mtime = None
+        self._policy_checked_at = 0
+        self._load_policy_file()
+    
+    def _load_policy_file(self):
+        """Load route policies from the policy file if it has changed"""
+        policy_file = self.config.get('policy_file')
+        self._policy_checked_at = time.time()
+        
+        if not policy_file:
+            return
+        
+        try:
+            mtime = os.path.getmtime(policy_file)
+        except OSError:
+            return
+        
+        if mtime == self._policy_mtime:
+            return
+        
+        try:
+            with open(policy_file) as f:
+                policies = json.load(f)
+            
+            with self._config_lock:
+                new_config = self.config.copy()
+                for key in ('read_methods', 'default_read_level', 'default_write_level', 'route_policies'):
+                    if key in policies:
+                        new_config[key] = policies[key]
+                self.config = new_config
+            
+            self._policy_mtime = mtime
+            self.logger.info(f"Loaded audit policies from {policy_file}")
+            
+        except Exception as e:
+            self.logger.error(f"Error loading audit policy file {policy_file}: {str(e)}")
+    
+    def _maybe_reload_policies(self):
+        """Hot-reload the policy file, checking its mtime at most once per interval"""
+        if time.time() - self._policy_checked_at >= self.config['policy_reload_interval']:
+            self._load_policy_file()
+    
+    def _resolve_policy(self):
+        """Resolve the audit policy for the current request"""
+        config = self.config
+        
+        for policy in config['route_policies']:
+            pattern = policy.get('pattern')
+            methods = policy.get('methods')
+            
+            if methods and request.method not in methods:
+                continue
+            
+            if pattern and fnmatch(request.path, pattern):
+                return {
+                    'level': policy.get('level', 'full'),
+                    'sample_rate': policy.get('sample_rate', 1.0)
+                }
+        
+        if request.method in config['read_methods']:
+            level = config['default_read_level']
+        else:
+            level = config['default_write_level']
+        
+        return {'level': level, 'sample_rate': 1.0}
     
     def _get_request_metadata(self):
         """Extract metadata from the current request"""
@@ -96,6 +183,17 @@ class AuditLogger:
             return
         
         try:
+            self._maybe_reload_policies()
+            
+            policy = self._resolve_policy()
+            
+            if policy['level'] == 'none':
+                return
+            
+            # Probabilistic sampling for high-frequency endpoints
+            if policy['sample_rate'] < 1.0 and random.random() >= policy['sample_rate']:
+                return
+            
             metadata = self._get_request_metadata()
             
             # Get request data
@@ -105,32 +203,34 @@ class AuditLogger:
             if request.args:
                 request_data['queryParams'] = dict(request.args)
             
-            # JSON body
-            if request.is_json:
-                try:
-                    json_data = request.get_json()
-                    if json_data:
-                        request_data['body'] = self._sanitize_data(json_data)
-                except Exception as e:
-                    request_data['body'] = f'Error parsing JSON: {str(e)}'
-            
-            # Form data
-            elif request.form:
-                request_data['formData'] = self._sanitize_data(dict(request.form))
-            
-            # Files
-            if request.files:
-                request_data['files'] = list(request.files.keys())
-            
-            # Headers (excluding sensitive ones)
-            headers = {}
-            for key, value in request.headers:
-                if not any(sensitive in key.lower() for sensitive in self.config['sensitive_fields']):
-                    headers[key] = value
-                else:
-                    headers[key] = '[REDACTED]'
-            
-            request_data['headers'] = headers
+            # Bodies, files and headers are only captured at the 'full' level
+            if policy['level'] == 'full':
+                # JSON body
+                if request.is_json:
+                    try:
+                        json_data = request.get_json()
+                        if json_data:
+                            request_data['body'] = self._sanitize_data(json_data)
+                    except Exception as e:
+                        request_data['body'] = f'Error parsing JSON: {str(e)}'
+                
+                # Form data
+                elif request.form:
+                    request_data['formData'] = self._sanitize_data(dict(request.form))
+                
+                # Files
+                if request.files:
+                    request_data['files'] = list(request.files.keys())
+                
+                # Headers (excluding sensitive ones)
+                headers = {}
+                for key, value in request.headers:
+                    if not any(sensitive in key.lower() for sensitive in self.config['sensitive_fields']):
+                        headers[key] = value
+                    else:
+                        headers[key] = '[REDACTED]'
+                
+                request_data['headers'] = headers
             
             # Truncate if too large
             request_data = self._truncate_payload(request_data)
@@ -140,10 +240,13 @@ class AuditLogger:
                 'auditType': 'api_request',
                 'action': f'{metadata["method"]} {metadata["path"]}',
                 'metadata': metadata,
-                'requestData': request_data
+                'requestData': request_data,
+                'auditLevel': policy['level'],
+                'sampleRate': policy['sample_rate']
             }
             
             # Store in g for later use in response logging
+            g.audit_policy = policy
             g.audit_start_time = time.time()
             g.audit_request_data = audit_data
             
@@ -161,15 +264,19 @@ class AuditLogger:
             # Calculate response time
             response_time = (time.time() - g.audit_start_time) * 1000 if hasattr(g, 'audit_start_time') else 0
             
+            policy = getattr(g, 'audit_policy', {'level': 'full'})
+            
             # Get response data
             response_data = {
                 'statusCode': response.status_code,
-                'headers': dict(response.headers),
                 'responseTime': round(response_time, 2)
             }
             
+            if policy['level'] == 'full':
+                response_data['headers'] = dict(response.headers)
+            
             # Get response body if it's JSON and not too large
-            if response.is_json and response.content_length and response.content_length < self.config['max_payload_size']:
+            if policy['level'] == 'full' and response.is_json and response.content_length and response.content_length < self.config['max_payload_size']:
                 try:
                     response_data['body'] = response.get_json()
                 except Exception:
@@ -232,7 +339,7 @@ class AuditLogger:
     def log_database_operation(self, operation_type, collection_name, entity_id, 
                              before_state=None, after_state=None, mcp_command=None):
         """Log database operations"""
-        if not self.config['log_database_changes']:
+        if not self._should_log_database_changes():
             return
         
         try:
@@ -265,6 +372,17 @@ class AuditLogger:
             self.logger.error(f"Error logging database operation: {str(e)}")
             return None
     
+    def _should_log_database_changes(self):
+        """Check database change logging for the current request.
+        
+        audit_decorator records its log_db_changes flag in flask.g, so each
+        request sees its own setting without touching the shared config.
+        """
+        if has_app_context() and 'audit_log_db_changes' in g:
+            return g.audit_log_db_changes
+        
+        return self.config['log_database_changes']
+    
     def log_mcp_operation(self, operation_data):
         """Log MCP operation"""
         try:
@@ -298,16 +416,12 @@ class AuditLogger:
                     self.log_request()
                 
                 try:
-                    # Store original database change logging setting
-                    original_db_logging = self.config['log_database_changes']
-                    self.config['log_database_changes'] = log_db_changes
+                    # Per-request database change logging setting
+                    g.audit_log_db_changes = log_db_changes and self.config['log_database_changes']
                     
                     # Execute function
                     result = f(*args, **kwargs)
                     
-                    # Restore original setting
-                    self.config['log_database_changes'] = original_db_logging
-                    
                     # Log response
                     if log_response and hasattr(result, 'status_code'):
                         result = self.log_response(result)
@@ -328,37 +442,32 @@ class AuditLogger:
     
     def update_audit_config(self, **kwargs):
         """Update audit configuration"""
-        for key, value in kwargs.items():
-            if key in self.config:
-                self.config[key] = value
-                self.logger.info(f"Updated audit config: {key} = {value}")
+        with self._config_lock:
+            new_config = self.config.copy()
+            
+            for key, value in kwargs.items():
+                if key in new_config:
+                    new_config[key] = value
+                    self.logger.info(f"Updated audit config: {key} = {value}")
+            
+            self.config = new_config
         
-        return self.config
+        return new_config.copy()
     
     def get_audit_stats(self, hours=24):
         """Get audit statistics"""
         try:
             start_time = datetime.now() - timedelta(hours=hours)
             
-            # API call stats
-            api_calls = self.audit_service.db.audit_trail.count_documents({
-                'collectionName': 'api_audit',
-                'operationType': 'api_call',
-                'timestamp': {'$gte': start_time}
-            })
+            # Counts come from the hourly audit rollup, one lookup for the whole window
+            counts = self.audit_service.audit_trail.rollup.get_window_counts(start_time)
             
-            # Error stats
-            api_errors = self.audit_service.db.audit_trail.count_documents({
-                'collectionName': 'api_audit',
-                'operationType': 'api_error',
-                'timestamp': {'$gte': start_time}
-            })
-            
-            # Database operation stats
-            db_operations = self.audit_service.db.audit_trail.count_documents({
-                'timestamp': {'$gte': start_time},
-                'collectionName': {'$ne': 'api_audit'}
-            })
+            api_calls = counts.get(('api_audit', 'api_call'), 0)
+            api_errors = counts.get(('api_audit', 'api_error'), 0)
+            db_operations = sum(
+                count for (collection_name, _), count in counts.items()
+                if collection_name != 'api_audit'
+            )
             
             # MCP operation stats
             mcp_operations = self.audit_service.db.mcp_operations.count_documents({
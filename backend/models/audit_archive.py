@@ -0,0 +1,271 @@
+from datetime import datetime
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import threading
+from bson import json_util
+from config import Config
+from utils.helpers import to_naive_utc
+
+class AuditArchive:
+    """Cold tier of the audit trail stored as gzip NDJSON segment files.
+    
+    Each segment holds up to a day of records in timestamp order and has a small
+    JSON index (time range, chain range, collections and entity keys).
+    A manifest lists every segment so reads only open the ones they need.
+    Segments stay 'pending' until their records are removed from MongoDB,
+    so a crash in between never shows a record twice.
+    """
+    
+    MANIFEST = 'manifest.json'
+    
+    def __init__(self, archive_dir=None):
+        self.archive_dir = archive_dir or Config.AUDIT_ARCHIVE_DIR
+        self.segment_size = Config.AUDIT_ARCHIVE_SEGMENT_SIZE
+        self._lock = threading.Lock()
+        self._index_cache = {}
+    
+    def _path(self, name):
+        return os.path.join(self.archive_dir, name)
+    
+    def _write_json(self, name, data):
+        """Atomically replace a JSON file in the archive directory"""
+        path = self._path(name)
+        tmp_path = f"{path}.tmp"
+        
+        with open(tmp_path, 'w') as handle:
+            json.dump(data, handle, default=str)
+            handle.flush()
+            os.fsync(handle.fileno())
+        
+        os.replace(tmp_path, path)
+    
+    def load_manifest(self):
+        """Get the list of archived segments"""
+        try:
+            with open(self._path(self.MANIFEST)) as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return {'segments': []}
+    
+    def _load_index(self, segment):
+        """Get a segment's index, cached after the first read"""
+        name = segment['index']
+        if name not in self._index_cache:
+            with open(self._path(name)) as handle:
+                index = json.load(handle)
+            index['entities'] = set(index['entities'])
+            self._index_cache[name] = index
+        return self._index_cache[name]
+    
+    @staticmethod
+    def _entity_key(collection_name, entity_id):
+        return f"{collection_name}:{entity_id}"
+    
+    def _write_segment(self, day, records):
+        """Write one segment file plus its index and return the manifest entry"""
+        stamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
+        base = f"audit-{day}-{stamp}"
+        segment_name = f"{base}.ndjson.gz"
+        index_name = f"{base}.index.json"
+        
+        digest = hashlib.sha256()
+        collections = {}
+        entities = set()
+        chain_seqs = [record['chainSeq'] for record in records if record.get('chainSeq') is not None]
+        
+        tmp_path = f"{self._path(segment_name)}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as handle:
+            for record in records:
+                line = json_util.dumps(record, json_options=json_util.RELAXED_JSON_OPTIONS)
+                handle.write(line + '\n')
+                digest.update(line.encode('utf-8'))
+                
+                collection_name = record.get('collectionName')
+                collections[collection_name] = collections.get(collection_name, 0) + 1
+                entities.add(self._entity_key(collection_name, record.get('entityId')))
+        
+        os.replace(tmp_path, self._path(segment_name))
+        
+        index = {
+            'segment': segment_name,
+            'day': day,
+            'count': len(records),
+            'minTimestamp': records[0]['timestamp'].isoformat(),
+            'maxTimestamp': records[-1]['timestamp'].isoformat(),
+            'minChainSeq': min(chain_seqs) if chain_seqs else None,
+            'maxChainSeq': max(chain_seqs) if chain_seqs else None,
+            'collections': collections,
+            'entities': sorted(entities),
+            'sha256': digest.hexdigest()
+        }
+        self._write_json(index_name, index)
+        
+        return {
+            'segment': segment_name,
+            'index': index_name,
+            'day': day,
+            'count': len(records),
+            'minTimestamp': index['minTimestamp'],
+            'maxTimestamp': index['maxTimestamp'],
+            'collections': sorted(name for name in collections if name),
+            'status': 'pending'
+        }
+    
+    def _set_status(self, segment_name, status):
+        with self._lock:
+            manifest = self.load_manifest()
+            for segment in manifest['segments']:
+                if segment['segment'] == segment_name:
+                    segment['status'] = status
+            self._write_json(self.MANIFEST, manifest)
+    
+    def archive(self, records):
+        """Write records (sorted by timestamp) into day segments of bounded size.
+        
+        Yields (segment_name, ids) after each segment is durably written; the
+        caller removes those ids from the hot collection and then calls
+        commit(segment_name).
+        """
+        os.makedirs(self.archive_dir, exist_ok=True)
+        
+        day = None
+        batch = []
+        
+        def flush(day, batch):
+            entry = self._write_segment(day, batch)
+            with self._lock:
+                manifest = self.load_manifest()
+                manifest['segments'].append(entry)
+                self._write_json(self.MANIFEST, manifest)
+            return entry['segment'], [record['_id'] for record in batch]
+        
+        for record in records:
+            record_day = record['timestamp'].strftime('%Y-%m-%d')
+            
+            if batch and (record_day != day or len(batch) >= self.segment_size):
+                yield flush(day, batch)
+                batch = []
+            
+            day = record_day
+            batch.append(record)
+        
+        if batch:
+            yield flush(day, batch)
+    
+    def commit(self, segment_name):
+        """Mark a segment live once its records are gone from the hot tier"""
+        self._set_status(segment_name, 'committed')
+    
+    def pending_segments(self):
+        """Segments written but not yet removed from the hot tier"""
+        return [segment for segment in self.load_manifest()['segments'] if segment.get('status') != 'committed']
+    
+    def read_segment(self, segment):
+        """Stream the records stored in a segment"""
+        with gzip.open(self._path(segment['segment']), 'rt', encoding='utf-8') as handle:
+            for line in handle:
+                if line.strip():
+                    yield json_util.loads(line)
+    
+    def _committed_segments(self):
+        return [segment for segment in self.load_manifest()['segments'] if segment.get('status') == 'committed']
+    
+    def find_entity_history(self, collection_name, entity_id):
+        """Archived changes for one entity in timestamp and chain order"""
+        key = self._entity_key(collection_name, str(entity_id))
+        changes = []
+        
+        for segment in self._committed_segments():
+            if collection_name not in segment['collections']:
+                continue
+            if key not in self._load_index(segment)['entities']:
+                continue
+            
+            changes.extend(
+                record for record in self.read_segment(segment)
+                if record.get('collectionName') == collection_name and record.get('entityId') == str(entity_id)
+            )
+        
+        changes.sort(key=lambda record: (record['timestamp'], record.get('chainSeq') or 0))
+        return changes
+    
+    def iter_records(self, start_date, end_date, collection_name=None):
+        """Stream archived records with a timestamp in [start_date, end_date]"""
+        # Archived timestamps are naive UTC; API dates usually carry an offset
+        start_date = to_naive_utc(start_date)
+        end_date = to_naive_utc(end_date)
+        start = start_date.isoformat()
+        end = end_date.isoformat()
+        
+        for segment in self._committed_segments():
+            if segment['maxTimestamp'] < start or segment['minTimestamp'] > end:
+                continue
+            if collection_name and collection_name not in segment['collections']:
+                continue
+            
+            for record in self.read_segment(segment):
+                if not start_date <= record['timestamp'] <= end_date:
+                    continue
+                if collection_name and record.get('collectionName') != collection_name:
+                    continue
+                yield record
+    
+    def iter_chain(self, after_seq=0):
+        """Stream archived chained records with chainSeq > after_seq in chain order.
+        
+        Segments are read in order of their lowest chain position and merged
+        through a heap, so only records from overlapping segments are held.
+        """
+        segments = []
+        for segment in self._committed_segments():
+            index = self._load_index(segment)
+            if index.get('maxChainSeq') is not None and index['maxChainSeq'] > after_seq:
+                segments.append((index['minChainSeq'], segment))
+        segments.sort(key=lambda item: item[0])
+        
+        heap = []
+        order = 0
+        for min_seq, segment in segments:
+            while heap and heap[0][0] < min_seq:
+                yield heapq.heappop(heap)[2]
+            
+            for record in self.read_segment(segment):
+                chain_seq = record.get('chainSeq')
+                if chain_seq is not None and chain_seq > after_seq:
+                    # The counter keeps duplicate positions from comparing records
+                    heapq.heappush(heap, (chain_seq, order, record))
+                    order += 1
+        
+        while heap:
+            yield heapq.heappop(heap)[2]
+    
+    def get_stats(self):
+        """Archive size and coverage"""
+        segments = self._committed_segments()
+        
+        return {
+            'segments': len(segments),
+            'records': sum(segment['count'] for segment in segments),
+            'bytes': sum(
+                os.path.getsize(self._path(segment['segment']))
+                for segment in segments if os.path.exists(self._path(segment['segment']))
+            ),
+            'oldest': segments[0]['minTimestamp'] if segments else None,
+            'newest': max(segment['maxTimestamp'] for segment in segments) if segments else None,
+            'pendingSegments': len(self.pending_segments())
+        }
+
+# Shared so manifest updates and the index cache are process-wide
+_audit_archive = None
+_audit_archive_lock = threading.Lock()
+
+def get_audit_archive():
+    """Get the global audit archive instance"""
+    global _audit_archive
+    with _audit_archive_lock:
+        if _audit_archive is None:
+            _audit_archive = AuditArchive()
+    return _audit_archive
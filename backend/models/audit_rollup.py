@@ -0,0 +1,271 @@
+from datetime import datetime, timedelta
+import threading
+import time
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from config import Config
+from utils.database import get_db
+from utils.job_scheduler import get_job_scheduler
+from utils.helpers import serialize_mongo_doc
+
+class AuditRollup:
+    """Hourly audit counts by collection, operation type and user.
+    
+    Increments are buffered in memory and flushed as one bulk upsert, so
+    writing an audit record costs no extra round trip.
+    """
+    
+    job_name = 'audit_rollup:flush'
+    
+    def __init__(self):
+        self.db = get_db()
+        self.collection = self.db.audit_rollups
+        self.audit_trail = self.db.audit_trail
+        
+        self.flush_interval = Config.AUDIT_ROLLUP_FLUSH_INTERVAL
+        self.flush_size = Config.AUDIT_ROLLUP_FLUSH_SIZE
+        
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._checked_built = False
+    
+    @staticmethod
+    def _bucket(timestamp):
+        """Start of the hour a timestamp falls in"""
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    
+    def record(self, changes):
+        """Buffer counts for audit records that were just written"""
+        with self._lock:
+            for change in changes:
+                key = (
+                    self._bucket(change['timestamp']),
+                    change.get('collectionName'),
+                    change.get('operationType'),
+                    change.get('userId')
+                )
+                self._pending[key] = self._pending.get(key, 0) + 1
+            
+            due = (len(self._pending) >= self.flush_size or
+                   time.monotonic() - self._last_flush >= self.flush_interval)
+        
+        if due:
+            self.flush()
+    
+    def start(self):
+        """Flush buffered counts every flush_interval, even when no audit records arrive"""
+        get_job_scheduler().add_job(self.job_name, self.flush, self.flush_interval)
+    
+    def stop(self):
+        """Stop periodic flushing and write what is still buffered"""
+        get_job_scheduler().remove_job(self.job_name)
+        self.flush()
+    
+    def flush(self):
+        """Write buffered counts with one bulk upsert"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        
+        keys = [key for key, count in pending.items() if count]
+        operations = [
+            UpdateOne(
+                {'hour': hour, 'collectionName': collection_name,
+                 'operationType': operation_type, 'userId': user_id},
+                {'$inc': {'count': pending[hour, collection_name, operation_type, user_id]}},
+                upsert=True
+            )
+            for hour, collection_name, operation_type, user_id in keys
+        ]
+        
+        if not operations:
+            return 0
+        
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # The other upserts were applied; only the failed ones are retried by the next flush
+            self._restore([keys[error['index']] for error in e.details.get('writeErrors', [])], pending)
+            raise
+        except Exception:
+            # Put the counts back so the next flush retries them
+            self._restore(keys, pending)
+            raise
+        
+        return len(operations)
+    
+    def _restore(self, keys, pending):
+        """Return unwritten counts to the buffer"""
+        with self._lock:
+            for key in keys:
+                self._pending[key] = self._pending.get(key, 0) + pending[key]
+    
+    def _bucket_pipeline(self, match=None):
+        """Aggregation grouping audit records into rollup buckets"""
+        pipeline = [{'$match': match}] if match else []
+        pipeline.append({'$group': {
+            '_id': {
+                'hour': {'$dateFromParts': {
+                    'year': {'$year': '$timestamp'},
+                    'month': {'$month': '$timestamp'},
+                    'day': {'$dayOfMonth': '$timestamp'},
+                    'hour': {'$hour': '$timestamp'}
+                }},
+                'collectionName': '$collectionName',
+                'operationType': '$operationType',
+                'userId': '$userId'
+            },
+            'count': {'$sum': 1}
+        }})
+        return pipeline
+    
+    def _apply_buckets(self, buckets, sign=1):
+        """Increment rollup documents from aggregated buckets in bulk"""
+        operations = []
+        applied = 0
+        
+        for bucket in buckets:
+            operations.append(UpdateOne(
+                {'hour': bucket['_id']['hour'],
+                 'collectionName': bucket['_id'].get('collectionName'),
+                 'operationType': bucket['_id'].get('operationType'),
+                 'userId': bucket['_id'].get('userId')},
+                {'$inc': {'count': sign * bucket['count']}},
+                upsert=True
+            ))
+            if len(operations) >= 1000:
+                self.collection.bulk_write(operations, ordered=False)
+                applied += len(operations)
+                operations = []
+        
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+            applied += len(operations)
+        
+        return applied
+    
+    def rebuild(self):
+        """Recompute the rollup from the audit trail"""
+        # Anything buffered is already covered by the aggregation; drop it without
+        # holding the lock while the aggregation runs, so record() never waits on it
+        with self._lock:
+            self._pending = {}
+        
+        self.collection.delete_many({})
+        self._apply_buckets(self.audit_trail.aggregate(self._bucket_pipeline(), allowDiskUse=True))
+        self._checked_built = True
+        
+        return self.collection.count_documents({})
+    
+    def record_removal(self, filter_query):
+        """Subtract audit records about to be deleted by filter_query"""
+        self._apply_buckets(
+            self.audit_trail.aggregate(self._bucket_pipeline(filter_query), allowDiskUse=True),
+            sign=-1
+        )
+        self.collection.delete_many({'count': {'$lte': 0}})
+    
+    def _prepare_read(self):
+        """Flush local counts and build the rollup on first use"""
+        if not self._checked_built:
+            if (self.collection.estimated_document_count() == 0 and
+                    self.audit_trail.estimated_document_count() > 0):
+                self.rebuild()
+            self._checked_built = True
+        
+        self.flush()
+    
+    def get_summary(self, days=7):
+        """Operation type, collection, daily and total counts in one pass over the rollup"""
+        self._prepare_read()
+        
+        pipeline = [
+            {'$facet': {
+                'operationTypes': [
+                    {'$group': {'_id': '$operationType', 'count': {'$sum': '$count'}}}
+                ],
+                'collections': [
+                    {'$group': {'_id': '$collectionName', 'count': {'$sum': '$count'}}}
+                ],
+                'dailyActivity': [
+                    {'$group': {
+                        '_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$hour'}},
+                        'count': {'$sum': '$count'}
+                    }},
+                    {'$sort': {'_id': -1}},
+                    {'$limit': days}
+                ],
+                'total': [
+                    {'$group': {'_id': None, 'count': {'$sum': '$count'}}}
+                ]
+            }}
+        ]
+        
+        result = next(self.collection.aggregate(pipeline), {})
+        total = result.get('total') or [{'count': 0}]
+        
+        return {
+            'operationTypes': serialize_mongo_doc(result.get('operationTypes', [])),
+            'collections': serialize_mongo_doc(result.get('collections', [])),
+            'dailyActivity': serialize_mongo_doc(result.get('dailyActivity', [])),
+            'totalChanges': total[0]['count']
+        }
+    
+    def get_window_counts(self, start_time, end_time=None):
+        """Counts by (collection, operation type) between two times.
+        
+        Whole hours come from the rollup; the partial first hour is counted
+        exactly from the audit trail's timestamp index.
+        """
+        self._prepare_read()
+        
+        end_time = end_time or datetime.now()
+        first_full_hour = self._bucket(start_time)
+        if first_full_hour < start_time:
+            first_full_hour += timedelta(hours=1)
+        
+        counts = {}
+        
+        rollup_pipeline = [
+            {'$match': {'hour': {'$gte': first_full_hour, '$lte': end_time}}},
+            {'$group': {
+                '_id': {'collectionName': '$collectionName', 'operationType': '$operationType'},
+                'count': {'$sum': '$count'}
+            }}
+        ]
+        
+        head_pipeline = [
+            {'$match': {'timestamp': {'$gte': start_time, '$lt': min(first_full_hour, end_time)}}},
+            {'$group': {
+                '_id': {'collectionName': '$collectionName', 'operationType': '$operationType'},
+                'count': {'$sum': 1}
+            }}
+        ]
+        
+        for source, pipeline in ((self.collection, rollup_pipeline), (self.audit_trail, head_pipeline)):
+            for bucket in source.aggregate(pipeline):
+                key = (bucket['_id'].get('collectionName'), bucket['_id'].get('operationType'))
+                counts[key] = counts.get(key, 0) + bucket['count']
+        
+        return counts
+
+# Shared by every AuditTrail instance so buffered counts are flushed together
+_audit_rollup = None
+_audit_rollup_lock = threading.Lock()
+
+def get_audit_rollup():
+    """Get the global audit rollup instance"""
+    global _audit_rollup
+    with _audit_rollup_lock:
+        if _audit_rollup is None:
+            _audit_rollup = AuditRollup()
+    return _audit_rollup
+
+def start_rollup_flushing():
+    """Start periodic flushing of buffered audit rollup counts"""
+    get_audit_rollup().start()
+
+def stop_rollup_flushing():
+    """Stop periodic flushing and write the remaining audit rollup counts"""
+    get_audit_rollup().stop()
@@ -1,24 +1,103 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
+import heapq
+import re
+import threading
 from bson import ObjectId
+from pymongo import UpdateOne
+from config import Config
 from utils.database import get_db
 from utils.helpers import serialize_mongo_doc
+from utils.diff_engine import diff, apply, conflicts, fill_old_values
+from models.audit_rollup import get_audit_rollup
+from models.audit_archive import get_audit_archive
 import json
 
+# Placeholders written by the change stream when the previous value is unknown
+UNKNOWN_VALUE_MARKERS = ('[PREVIOUS_VALUE]', '[REMOVED_FIELD]')
+
+# Operations that always store a full snapshot in delta storage mode
+SNAPSHOT_OPERATIONS = ('create', 'insert', 'delete')
+
+# Fields matched by the indexed search mode
+SEARCH_FIELDS = ('collectionName', 'entityId', 'mcpCommand', 'userId')
+
+def tokenize_command(text, max_tokens=32):
+    """Lowercase word tokens for the searchTokens inverted index"""
+    tokens = []
+    for token in re.findall(r'[a-z0-9]+', str(text).lower()):
+        if len(token) > 1 and token not in tokens:
+            tokens.append(token)
+    return tokens[:max_tokens]
+
+def has_unknown_values(state):
+    """Check for placeholder values anywhere in a document"""
+    for value in state.values():
+        if isinstance(value, str) and value in UNKNOWN_VALUE_MARKERS:
+            return True
+        if isinstance(value, dict) and has_unknown_values(value):
+            return True
+    return False
+
 class AuditTrail:
     def __init__(self):
         self.db = get_db()
         self.collection = self.db.audit_trail
+        self.rollup = get_audit_rollup()
+        self.archive = get_audit_archive()
+        
+        # Highest version of records archived or deleted, so entity versions never restart
+        self.removed_versions = self.db.audit_removed_versions
+        
+        # Search defaults
+        self.search_tokens = Config.AUDIT_SEARCH_TOKENS
+        self.search_default_hours = Config.AUDIT_SEARCH_DEFAULT_HOURS
+        self.search_max_limit = 500
+        
+        # Field-level delta storage with periodic snapshots
+        self.delta_storage = Config.AUDIT_DELTA_STORAGE
+        self.snapshot_interval = Config.AUDIT_SNAPSHOT_INTERVAL
+        
+        # Latest (version, state) per entity, so writes don't replay history
+        self._state_cache = OrderedDict()
+        self._state_cache_size = 1000
+        self._state_lock = threading.Lock()
+    
+    def _add_search_tokens(self, change_data):
+        if self.search_tokens and change_data.get('mcpCommand'):
+            change_data['searchTokens'] = tokenize_command(change_data['mcpCommand'])
     
     def log_change(self, change_data):
         """Log a database change"""
-        change_data.update({
-            'timestamp': datetime.now(),
-            'createdAt': datetime.now()
-        })
+        now = datetime.now()
+        change_data.setdefault('timestamp', now)
+        change_data.setdefault('createdAt', now)
+        self._add_search_tokens(change_data)
         
         result = self.collection.insert_one(change_data)
+        self.rollup.record([change_data])
         return str(result.inserted_id)
     
+    def log_changes(self, changes, session=None, record_rollup=True):
+        """Log several database changes in one insert_many.
+        
+        Pass record_rollup=False inside a transaction and record the rollup
+        counts once it commits.
+        """
+        if not changes:
+            return []
+        
+        now = datetime.now()
+        for change_data in changes:
+            change_data.setdefault('timestamp', now)
+            change_data.setdefault('createdAt', now)
+            self._add_search_tokens(change_data)
+        
+        result = self.collection.insert_many(changes, ordered=True, session=session)
+        if record_rollup:
+            self.rollup.record(changes)
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+    
     def get_changes(self, limit=100, offset=0, collection_name=None, operation_type=None, 
                    start_date=None, end_date=None, entity_id=None):
         """Get audit trail with filtering"""
@@ -52,22 +131,47 @@ class AuditTrail:
             'hasMore': offset + limit < total
         }
     
-    def get_entity_history(self, collection_name, entity_id):
-        """Get complete change history for a specific entity"""
-        changes = list(self.collection.find({
+    @staticmethod
+    def _history_key(change):
+        """Sort key for an entity history: time, then chain position"""
+        return (change['timestamp'], change.get('chainSeq') or 0)
+    
+    def entity_changes(self, collection_name, entity_id, include_archived=True):
+        """Stored audit records for one entity in history order"""
+        changes = self.collection.find({
             'collectionName': collection_name,
             'entityId': str(entity_id)
-        }).sort('timestamp', 1))
+        }).sort([('timestamp', 1), ('chainSeq', 1)])
         
-        return serialize_mongo_doc(changes)
+        if not include_archived:
+            return list(changes)
+        
+        # Rolled-back and not yet checkpointed records stay in the collection past
+        # the archive cutoff, so the tiers overlap in time and have to be merged
+        return list(heapq.merge(
+            self.archive.find_entity_history(collection_name, entity_id),
+            changes,
+            key=self._history_key
+        ))
+    
+    def get_entity_history(self, collection_name, entity_id, include_archived=True):
+        """Get complete change history for a specific entity"""
+        changes = self.entity_changes(collection_name, entity_id, include_archived)
+        return serialize_mongo_doc(list(self.materialize(changes)))
     
-    def rollback_operation(self, audit_id, rollback_reason=None):
-        """Mark an operation for rollback"""
+    def rollback_operation(self, audit_id, append, rollback_reason=None):
+        """Mark an operation for rollback.
+        
+        The rollback entry is written through append, the audit service's
+        chained append, so it gets a chain position like every other record.
+        """
         audit_record = self.collection.find_one({'_id': ObjectId(audit_id)})
         
         if not audit_record or audit_record.get('operationType') == 'delete':
             return False
         
+        audit_record = self.expand_record(audit_record)
+        
         # Create rollback entry
         rollback_data = {
             'originalAuditId': audit_id,
@@ -77,22 +181,19 @@ class AuditTrail:
             'beforeState': audit_record.get('afterState'),
             'afterState': audit_record.get('beforeState'),
             'rollbackReason': rollback_reason,
-            'timestamp': datetime.now(),
-            'createdAt': datetime.now(),
             'status': 'pending'
         }
-        
-        result = self.collection.insert_one(rollback_data)
+        rollback_id = append(rollback_data)
         
         # Mark original as rolled back
         self.collection.update_one(
             {'_id': ObjectId(audit_id)},
-            {'$set': {'rolledBack': True, 'rollbackId': str(result.inserted_id)}}
+            {'$set': {'rolledBack': True, 'rollbackId': rollback_id}}
         )
         
-        return str(result.inserted_id)
+        return rollback_id
     
-    def get_rollback_candidates(self, hours=24):
+    def get_rollback_candidates(self, hours=24, serialize=True):
         """Get operations that can be rolled back"""
         cutoff_time = datetime.now() - timedelta(hours=hours)
         
@@ -102,68 +203,87 @@ class AuditTrail:
             'rolledBack': {'$ne': True}
         }).sort('timestamp', -1))
         
-        return serialize_mongo_doc(candidates)
+        return serialize_mongo_doc(candidates) if serialize else candidates
     
     def get_audit_stats(self):
         """Get audit trail statistics"""
-        # Operation type stats
-        type_pipeline = [
-            {'$group': {
-                '_id': '$operationType',
-                'count': {'$sum': 1}
-            }}
-        ]
-        type_stats = list(self.collection.aggregate(type_pipeline))
-        
-        # Collection stats
-        collection_pipeline = [
-            {'$group': {
-                '_id': '$collectionName',
-                'count': {'$sum': 1}
-            }}
-        ]
-        collection_stats = list(self.collection.aggregate(collection_pipeline))
-        
-        # Daily activity
-        daily_pipeline = [
-            {'$group': {
-                '_id': {
-                    '$dateToString': {
-                        'format': '%Y-%m-%d',
-                        'date': '$timestamp'
-                    }
-                },
-                'count': {'$sum': 1}
-            }},
-            {'$sort': {'_id': -1}},
-            {'$limit': 7}
-        ]
-        daily_stats = list(self.collection.aggregate(daily_pipeline))
-        
-        return {
-            'operationTypes': serialize_mongo_doc(type_stats),
-            'collections': serialize_mongo_doc(collection_stats),
-            'dailyActivity': serialize_mongo_doc(daily_stats),
-            'totalChanges': self.collection.count_documents({})
-        }
+        # Served from the hourly rollup instead of scanning the audit trail
+        return self.rollup.get_summary()
     
-    def search_changes(self, search_term, limit=50):
-        """Search audit trail"""
-        filter_query = {
-            '$or': [
-                {'collectionName': {'$regex': search_term, '$options': 'i'}},
-                {'entityId': {'$regex': search_term, '$options': 'i'}},
-                {'mcpCommand': {'$regex': search_term, '$options': 'i'}},
-                {'userId': {'$regex': search_term, '$options': 'i'}}
-            ]
-        }
+    def search_changes(self, search_term, limit=50, mode='indexed', match='prefix', field=None,
+                       start_date=None, end_date=None, hours=None):
+        """Search audit trail.
+        
+        The indexed mode matches exactly or by case-sensitive prefix on
+        indexed fields, plus mcpCommand tokens, so every branch of the $or is
+        an index scan. The regex mode is the original case-insensitive
+        substring search. Both are limited to the last search_default_hours
+        unless a time range is given.
+        """
+        filter_query = self.build_search_filter(search_term, mode, match, field, start_date, end_date, hours)
         
         changes = list(self.collection.find(filter_query)
                       .sort('timestamp', -1)
-                      .limit(limit))
+                      .limit(min(limit, self.search_max_limit)))
         
         return serialize_mongo_doc(changes)
     
+    def build_search_filter(self, search_term, mode='indexed', match='prefix', field=None,
+                            start_date=None, end_date=None, hours=None):
+        """Query filter used by search_changes"""
+        if not start_date and not end_date:
+            start_date = datetime.now() - timedelta(hours=hours or self.search_default_hours)
+        
+        fields = [field] if field else list(SEARCH_FIELDS)
+        
+        if mode == 'regex':
+            clauses = [{name: {'$regex': search_term, '$options': 'i'}} for name in fields]
+        else:
+            if match == 'exact':
+                clauses = [{name: search_term} for name in fields]
+            else:
+                prefix = {'$regex': f"^{re.escape(search_term)}"}
+                clauses = [{name: prefix} for name in fields]
+            
+            tokens = tokenize_command(search_term)
+            if self.search_tokens and tokens and (not field or field == 'mcpCommand'):
+                clauses.append({'searchTokens': {'$all': tokens}})
+        
+        filter_query = {'$or': clauses}
+        
+        if start_date or end_date:
+            filter_query['timestamp'] = {}
+            if start_date:
+                filter_query['timestamp']['$gte'] = start_date
+            if end_date:
+                filter_query['timestamp']['$lte'] = end_date
+        
+        return filter_query
+    
+    def backfill_search_tokens(self, batch_size=1000):
+        """Add searchTokens to records written before token indexing"""
+        cursor = self.collection.find(
+            {'mcpCommand': {'$type': 'string'}, 'searchTokens': {'$exists': False}},
+            {'mcpCommand': 1}
+        ).batch_size(batch_size)
+        
+        updated = 0
+        operations = []
+        
+        for change in cursor:
+            operations.append(UpdateOne(
+                {'_id': change['_id']},
+                {'$set': {'searchTokens': tokenize_command(change['mcpCommand'])}}
+            ))
+            if len(operations) >= batch_size:
+                updated += self.collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        
+        if operations:
+            updated += self.collection.bulk_write(operations, ordered=False).modified_count
+        
+        return updated
+    
     def get_recent_changes(self, minutes=60, limit=100):
         """Get recent changes for real-time monitoring"""
         cutoff_time = datetime.now() - timedelta(minutes=minutes)
@@ -175,43 +295,312 @@ class AuditTrail:
         return serialize_mongo_doc(changes)
     
     def validate_data_integrity(self, collection_name, entity_id):
-        """Check data integrity for an entity"""
-        changes = list(self.collection.find({
-            'collectionName': collection_name,
-            'entityId': str(entity_id)
-        }).sort('timestamp', 1))
+        """Check data integrity for an entity in one ordered pass"""
+        changes = self.entity_changes(collection_name, entity_id)
         
-        if not changes:
-            return {'valid': True, 'message': 'No changes found'}
-        
-        # Check for logical consistency
         issues = []
+        total = 0
+        state = None
+        known = False
+        version = None
         
-        for i in range(1, len(changes)):
-            prev_change = changes[i-1]
-            curr_change = changes[i]
+        for change in changes:
+            total += 1
+            
+            # Once an entity is versioned, records written while delta storage
+            # was off carry no version and sit outside its history
+            if version is not None and not change.get('entityVersion'):
+                continue
+            
+            if change.get('storage') == 'delta':
+                if version is not None and change['entityVersion'] != version + 1:
+                    issues.append({
+                        'type': 'version_gap',
+                        'changeId': str(change['_id']),
+                        'message': f"Expected version {version + 1}, found {change['entityVersion']}"
+                    })
+                
+                if known and conflicts(state, change['delta']):
+                    issues.append({
+                        'type': 'state_mismatch',
+                        'changeId': str(change['_id']),
+                        'message': 'Delta does not apply to the previous version'
+                    })
+                
+                state = apply(state, change['delta']) if known else None
+                version = change['entityVersion']
+                continue
             
             # Check if before state matches previous after state
-            if (prev_change.get('afterState') != curr_change.get('beforeState')):
-                issues.append({
-                    'type': 'state_mismatch',
-                    'changeId': str(curr_change['_id']),
-                    'message': 'Before state does not match previous after state'
-                })
+            if total > 1 and (known or not change.get('entityVersion')):
+                before_state = change.get('beforeState')
+                if change.get('entityVersion') and 'beforeState' not in change:
+                    before_state = state
+                
+                if state != before_state:
+                    issues.append({
+                        'type': 'state_mismatch',
+                        'changeId': str(change['_id']),
+                        'message': 'Before state does not match previous after state'
+                    })
+            
+            state = change.get('afterState')
+            known = True
+            version = change.get('entityVersion')
+        
+        if total == 0:
+            return {'valid': True, 'message': 'No changes found'}
         
         return {
             'valid': len(issues) == 0,
             'issues': issues,
-            'totalChanges': len(changes)
+            'totalChanges': total,
+            'currentVersion': version
         }
     
-    def cleanup_old_audit_logs(self, days=90):
-        """Clean up old audit logs"""
+    @staticmethod
+    def _entity_key(collection_name, entity_id):
+        return f"{collection_name}:{entity_id}"
+    
+    def _latest_version(self, collection_name, entity_id):
+        """Highest entity version ever stored for an entity (0 if unversioned)"""
+        latest = self.collection.find_one(
+            {'collectionName': collection_name, 'entityId': str(entity_id), 'entityVersion': {'$exists': True}},
+            {'entityVersion': 1},
+            sort=[('entityVersion', -1)]
+        )
+        removed = self.removed_versions.find_one({'_id': self._entity_key(collection_name, entity_id)})
+        
+        return max(latest['entityVersion'] if latest else 0, removed['version'] if removed else 0)
+    
+    def _record_removed_versions(self, batch_filter):
+        """Keep the highest version of each entity whose records leave the collection"""
+        pipeline = [
+            {'$match': {**batch_filter, 'entityVersion': {'$exists': True}}},
+            {'$group': {
+                '_id': {'collection': '$collectionName', 'entityId': '$entityId'},
+                'version': {'$max': '$entityVersion'}
+            }}
+        ]
+        
+        operations = [
+            UpdateOne(
+                {'_id': self._entity_key(item['_id']['collection'], item['_id']['entityId'])},
+                {'$max': {'version': item['version']}},
+                upsert=True
+            )
+            for item in self.collection.aggregate(pipeline)
+        ]
+        
+        if operations:
+            self.removed_versions.bulk_write(operations, ordered=False)
+    
+    def reconstruct(self, collection_name, entity_id, version=None):
+        """Rebuild an entity's state at a version from the nearest snapshot"""
+        entity_filter = {'collectionName': collection_name, 'entityId': str(entity_id)}
+        
+        if version is None:
+            version = self._latest_version(collection_name, entity_id)
+        if not version:
+            return None
+        
+        snapshot = self.collection.find_one(
+            {**entity_filter, 'storage': 'snapshot', 'entityVersion': {'$lte': version}},
+            sort=[('entityVersion', -1)]
+        )
+        
+        # Records left in the collection can be older than archived ones, so
+        # the nearest snapshot may be in either tier
+        archived = [
+            change for change in self.archive.find_entity_history(collection_name, entity_id)
+            if change.get('entityVersion') and change['entityVersion'] <= version
+        ]
+        for change in archived:
+            if change.get('storage') == 'snapshot' and (
+                    snapshot is None or change['entityVersion'] > snapshot['entityVersion']):
+                snapshot = change
+        
+        if snapshot is None:
+            return None
+        
+        deltas = heapq.merge(
+            sorted(
+                (change for change in archived
+                 if change.get('storage') == 'delta' and change['entityVersion'] > snapshot['entityVersion']),
+                key=lambda change: change['entityVersion']
+            ),
+            self.collection.find(
+                {**entity_filter, 'storage': 'delta',
+                 'entityVersion': {'$gt': snapshot['entityVersion'], '$lte': version}}
+            ).sort('entityVersion', 1),
+            key=lambda change: change['entityVersion']
+        )
+        
+        state = snapshot.get('afterState')
+        for change in deltas:
+            state = apply(state, change['delta'])
+        
+        return state
+    
+    def compact_change(self, change_data):
+        """Convert a change to delta storage before it is written.
+        
+        Assigns the next entity version and replaces the before/after states
+        with a field-level delta from the previous version. Creates, deletes,
+        every snapshot_interval-th version and changes whose before state does
+        not match the recorded history are stored as full snapshots instead.
+        A forward-only delta already on the record (from a change stream) is
+        completed with old values from the previous version.
+        """
+        collection_name = change_data['collectionName']
+        entity_id = change_data['entityId']
+        key = (collection_name, entity_id)
+        delta_hint = change_data.pop('delta', None)
+        
+        stored_version = self._latest_version(collection_name, entity_id)
+        
+        with self._state_lock:
+            cached = self._state_cache.get(key)
+        
+        if cached and cached[0] >= stored_version:
+            version, previous = cached
+        else:
+            version = stored_version
+            previous = self.reconstruct(collection_name, entity_id, version) if version else None
+        
+        before_state = change_data.get('beforeState')
+        after_state = change_data.get('afterState')
+        
+        if delta_hint is not None and previous is not None:
+            delta = fill_old_values(previous, delta_hint)
+            after_state = apply(previous, delta)
+        elif previous is not None and after_state is not None:
+            delta = diff(previous, after_state)
+        else:
+            delta = None
+        
+        # A complete before state that disagrees with history means an unaudited write
+        before_complete = before_state is not None and not has_unknown_values(before_state)
+        diverged = before_complete and previous is not None and before_state != previous
+        
+        new_version = version + 1
+        change_data['entityVersion'] = new_version
+        
+        if (delta is None or diverged or
+                change_data['operationType'] in SNAPSHOT_OPERATIONS or
+                new_version % self.snapshot_interval == 0):
+            change_data['storage'] = 'snapshot'
+            change_data['afterState'] = after_state
+            if previous is not None and not diverged:
+                # Derivable from the previous version
+                change_data.pop('beforeState', None)
+        else:
+            change_data['storage'] = 'delta'
+            change_data['delta'] = delta
+            change_data.pop('beforeState', None)
+            change_data.pop('afterState', None)
+        
+        with self._state_lock:
+            self._state_cache[key] = (new_version, after_state)
+            self._state_cache.move_to_end(key)
+            while len(self._state_cache) > self._state_cache_size:
+                self._state_cache.popitem(last=False)
+        
+        return change_data
+    
+    def clear_state_cache(self):
+        """Forget cached entity states after a failed write"""
+        with self._state_lock:
+            self._state_cache.clear()
+    
+    def expand_record(self, change):
+        """Fill in beforeState and afterState for a versioned audit record"""
+        version = change.get('entityVersion')
+        if not version:
+            return change
+        
+        change = dict(change)
+        
+        if change.get('storage') == 'delta':
+            before_state = self.reconstruct(change['collectionName'], change['entityId'], version - 1)
+            change['beforeState'] = before_state
+            change['afterState'] = apply(before_state, change['delta'])
+        elif 'beforeState' not in change:
+            change['beforeState'] = (
+                self.reconstruct(change['collectionName'], change['entityId'], version - 1)
+                if version > 1 else None
+            )
+        
+        return change
+    
+    def materialize(self, changes):
+        """Fill in before and after states across an ordered entity history"""
+        state = None
+        known = False
+        versioned = False
+        
+        for change in changes:
+            if versioned and not change.get('entityVersion'):
+                yield change
+                continue
+            
+            if change.get('storage') == 'delta':
+                if not known:
+                    change = self.expand_record(change)
+                else:
+                    change = dict(change, beforeState=state, afterState=apply(state, change['delta']))
+            elif change.get('entityVersion') and 'beforeState' not in change:
+                change = self.expand_record(change) if not known else dict(change, beforeState=state)
+            
+            state = change.get('afterState')
+            known = True
+            versioned = versioned or bool(change.get('entityVersion'))
+            yield change
+    
+    def cleanup_old_audit_logs(self, days=90, archive=True):
+        """Move old audit logs to the archive tier (or just delete them)"""
         cutoff_date = datetime.now() - timedelta(days=days)
         
-        result = self.collection.delete_many({
+        filter_query = {
             'timestamp': {'$lt': cutoff_date},
             'rolledBack': {'$ne': True}
-        })
+        }
+        
+        if not archive:
+            self.rollup.record_removal(filter_query)
+            self._record_removed_versions(filter_query)
+            result = self.collection.delete_many(filter_query)
+            return result.deleted_count
+        
+        # Finish segments left pending by an interrupted run
+        for segment in self.archive.pending_segments():
+            ids = [record['_id'] for record in self.archive.read_segment(segment)]
+            self._remove_archived(ids)
+            self.archive.commit(segment['segment'])
+        
+        # Chained records are only archived once a checkpoint has verified them
+        checkpoint = self.db.audit_checkpoints.find_one(sort=[('chainSeq', -1)])
+        filter_query['$or'] = [{'chainSeq': {'$exists': False}}]
+        if checkpoint:
+            filter_query['$or'].append({'chainSeq': {'$lte': checkpoint['chainSeq']}})
+        
+        archived = 0
+        cursor = self.collection.find(filter_query).sort('timestamp', 1).batch_size(1000)
+        
+        for segment_name, ids in self.archive.archive(cursor):
+            archived += self._remove_archived(ids)
+            self.archive.commit(segment_name)
+        
+        return archived
+    
+    def _remove_archived(self, ids):
+        """Delete archived records from the collection in batches"""
+        removed = 0
+        
+        for start in range(0, len(ids), 1000):
+            batch_filter = {'_id': {'$in': ids[start:start + 1000]}}
+            self.rollup.record_removal(batch_filter)
+            self._record_removed_versions(batch_filter)
+            removed += self.collection.delete_many(batch_filter).deleted_count
         
-        return result.deleted_count
+        return removed
@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 from bson import ObjectId
 from utils.database import get_db
 from utils.helpers import serialize_mongo_doc
+from utils.operation_counter import get_operation_counter
 
 class MCPOperation:
     def __init__(self):
@@ -17,6 +18,10 @@ class MCPOperation:
         })
         
         result = self.collection.insert_one(operation_data)
+        get_operation_counter().record_local(
+            result.inserted_id, operation_data['timestamp'],
+            operation_data.get('status'), operation_data.get('operationType')
+        )
         return str(result.inserted_id)
     
     def get_operations(self, limit=100, offset=0, status=None, operation_type=None, start_date=None, end_date=None):
@@ -66,8 +71,32 @@ class MCPOperation:
             {'_id': ObjectId(operation_id)},
             {'$set': update_data}
         )
+        if result.modified_count:
+            get_operation_counter().record_local(operation_id, None, status)
         return result.modified_count > 0
     
+    def timeout_stuck_operations(self, started_before, error_message='Operation timed out - marked as stuck'):
+        """Fail every operation still running since before started_before in one update"""
+        now = datetime.now()
+        
+        # The status in the filter guards the transition: operations that
+        # completed meanwhile no longer match and keep their result
+        result = self.collection.update_many(
+            {'status': 'running', 'timestamp': {'$lt': started_before}},
+            {'$set': {
+                'status': 'failed',
+                'errorMessage': error_message,
+                'timedOut': True,
+                'failedAt': now,
+                'updatedAt': now
+            }}
+        )
+        
+        if result.modified_count:
+            get_operation_counter().record_transition_local('running', 'failed', started_before)
+        
+        return result.modified_count
+    
     def get_operation_stats(self):
         """Get operation statistics"""
         pipeline = [
@@ -2,8 +2,8 @@ from datetime import datetime, timedelta
 from bson import ObjectId
 from utils.database import get_db
 from utils.helpers import serialize_mongo_doc
-import psutil
-import time
+from utils.metrics_sampler import get_metrics_sampler
+from utils.operation_counter import get_operation_counter
 
 class SystemHealth:
     def __init__(self):
@@ -21,45 +21,9 @@ class SystemHealth:
         return str(result.inserted_id)
     
     def get_current_system_metrics(self):
-        """Get current system performance metrics"""
+        """Get current system performance metrics from the background sampler"""
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
-            
-            # Get database connection info
-            db_stats = self.db.command("serverStatus")
-            
-            metrics = {
-                'timestamp': datetime.now(),
-                'cpu': {
-                    'usage_percent': cpu_percent,
-                    'core_count': psutil.cpu_count()
-                },
-                'memory': {
-                    'total_gb': round(memory.total / (1024**3), 2),
-                    'used_gb': round(memory.used / (1024**3), 2),
-                    'usage_percent': memory.percent,
-                    'available_gb': round(memory.available / (1024**3), 2)
-                },
-                'disk': {
-                    'total_gb': round(disk.total / (1024**3), 2),
-                    'used_gb': round(disk.used / (1024**3), 2),
-                    'usage_percent': round((disk.used / disk.total) * 100, 2),
-                    'free_gb': round(disk.free / (1024**3), 2)
-                },
-                'database': {
-                    'connections': db_stats.get('connections', {}),
-                    'uptime_seconds': db_stats.get('uptime', 0),
-                    'version': db_stats.get('version', 'unknown')
-                },
-                'system': {
-                    'uptime_seconds': time.time() - psutil.boot_time(),
-                    'load_average': psutil.getloadavg() if hasattr(psutil, 'getloadavg') else [0, 0, 0]
-                }
-            }
-            
-            return metrics
+            return get_metrics_sampler().latest()
         except Exception as e:
             return {
                 'timestamp': datetime.now(),
@@ -67,35 +31,41 @@ class SystemHealth:
                 'status': 'error'
             }
     
+    def get_recent_samples(self, seconds=300):
+        """Get sampled system metrics from the in-memory history"""
+        return get_metrics_sampler().get_history(seconds)
+    
     def get_health_history(self, hours=24, interval_minutes=5):
         """Get system health history"""
         start_time = datetime.now() - timedelta(hours=hours)
         
-        # Aggregate data by intervals
+        # Aggregate system samples by intervals; matching on component and
+        # time first lets time-series storage skip whole buckets
         pipeline = [
             {'$match': {
+                'component': 'system',
                 'timestamp': {'$gte': start_time}
             }},
-            {'$sort': {'timestamp': 1}},
             {'$group': {
                 '_id': {
-                    '$dateToString': {
-                        'format': '%Y-%m-%d %H:%M',
-                        'date': {
-                            '$dateTrunc': {
-                                'date': '$timestamp',
-                                'unit': 'minute',
-                                'binSize': interval_minutes
-                            }
-                        }
+                    '$dateTrunc': {
+                        'date': '$timestamp',
+                        'unit': 'minute',
+                        'binSize': interval_minutes
                     }
                 },
-                'avgCpuUsage': {'$avg': '$cpu.usage_percent'},
-                'avgMemoryUsage': {'$avg': '$memory.usage_percent'},
-                'avgDiskUsage': {'$avg': '$disk.usage_percent'},
-                'timestamp': {'$first': '$timestamp'}
+                'avgCpuUsage': {'$avg': '$metrics.cpu.usage_percent'},
+                'avgMemoryUsage': {'$avg': '$metrics.memory.usage_percent'},
+                'avgDiskUsage': {'$avg': '$metrics.disk.usage_percent'}
             }},
-            {'$sort': {'timestamp': 1}}
+            {'$sort': {'_id': 1}},
+            {'$project': {
+                '_id': {'$dateToString': {'format': '%Y-%m-%d %H:%M', 'date': '$_id'}},
+                'avgCpuUsage': 1,
+                'avgMemoryUsage': 1,
+                'avgDiskUsage': 1,
+                'timestamp': '$_id'
+            }}
         ]
         
         history = list(self.collection.aggregate(pipeline))
@@ -105,20 +75,9 @@ class SystemHealth:
         """Get MCP server health status"""
         # This would typically ping the MCP server
         # For now, we'll simulate based on recent operations
-        recent_ops = self.db.mcp_operations.count_documents({
-            'timestamp': {'$gte': datetime.now() - timedelta(minutes=5)}
-        })
-        
-        failed_ops = self.db.mcp_operations.count_documents({
-            'timestamp': {'$gte': datetime.now() - timedelta(minutes=30)},
-            'status': 'failed'
-        })
-        
-        total_recent = self.db.mcp_operations.count_documents({
-            'timestamp': {'$gte': datetime.now() - timedelta(minutes=30)}
-        })
-        
-        error_rate = (failed_ops / max(total_recent, 1)) * 100
+        counter = get_operation_counter()
+        recent_ops = counter.counts(5)['total']
+        error_rate = counter.failure_rate(30)['rate']
         
         status = 'healthy'
         if error_rate > 20:
@@ -128,12 +87,23 @@ class SystemHealth:
         elif recent_ops == 0:
             status = 'idle'
         
+        # Latest probe of the primary endpoint, when the prober runs here
+        probe = self.collection.find_one(
+            {'component': 'mcp_server'}, sort=[('timestamp', -1)]
+        )
+        probe_metrics = (probe or {}).get('metrics', {})
+        
+        if probe_metrics.get('status') == 'down':
+            status = 'critical'
+        
         return {
             'status': status,
             'recentOperations': recent_ops,
             'errorRate': round(error_rate, 2),
+            'responseTime': probe_metrics.get('responseTime'),
+            'responseTimeP99': probe_metrics.get('responseTimeP99'),
             'lastCheck': datetime.now(),
-            'uptime': 'unknown'  # Would be calculated from actual server ping
+            'uptime': probe_metrics.get('uptime', 'unknown')
         }
     
     def get_database_health(self):
@@ -206,10 +176,7 @@ class SystemHealth:
                 })
         
         # Check for failed MCP operations
-        recent_failures = self.db.mcp_operations.count_documents({
-            'timestamp': {'$gte': datetime.now() - timedelta(minutes=10)},
-            'status': 'failed'
-        })
+        recent_failures = get_operation_counter().counts(10)['byStatus'].get('failed', 0)
         
         if recent_failures > 5:
             alerts.append({
@@ -1,11 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from datetime import datetime, timedelta
 from services.mcp_monitor import get_monitor_instance
 from services.audit_service import get_audit_service
+from services.rollback_planner import get_rollback_planner
+from models.audit_trail import SEARCH_FIELDS
 from services.analytics_engine import get_analytics_engine
 from services.notification_hub import get_notification_hub
 from utils.change_streams import get_change_stream_manager
 from utils.websocket_manager import get_websocket_manager
+from utils.metrics_sampler import get_metrics_sampler
+from utils.job_scheduler import get_job_scheduler
+from utils.timeseries import get_storage_stats
 from middleware.rate_limiter import rate_limit_mcp, rate_limit_analytics, rate_limit_audit
 from middleware.audit_logger import audit_mcp_operation, get_audit_logger
 from bson import ObjectId
@@ -16,6 +21,7 @@ mcp_bp = Blueprint('mcp', __name__)
 # Initialize services
 mcp_monitor = get_monitor_instance()
 audit_service = get_audit_service()
+rollback_planner = get_rollback_planner()
 analytics_engine = get_analytics_engine()
 notification_hub = get_notification_hub()
 change_stream_manager = get_change_stream_manager()
@@ -176,6 +182,7 @@ def get_operation_stats():
 
 @mcp_bp.route('/operations/live', methods=['GET'])
 @rate_limit_mcp
+@audit_mcp_operation
 def get_live_operations():
     """Get live feed of recent operations"""
     try:
@@ -196,6 +203,7 @@ def get_live_operations():
 # System Health Endpoints
 @mcp_bp.route('/health/current', methods=['GET'])
 @rate_limit_mcp
+@audit_mcp_operation
 def get_current_health():
     """Get current system health metrics"""
     try:
@@ -214,6 +222,7 @@ def get_current_health():
 
 @mcp_bp.route('/health/summary', methods=['GET'])
 @rate_limit_mcp
+@audit_mcp_operation
 def get_health_summary():
     """Get comprehensive system health summary"""
     try:
@@ -232,6 +241,7 @@ def get_health_summary():
 
 @mcp_bp.route('/health/history', methods=['GET'])
 @rate_limit_mcp
+@audit_mcp_operation
 def get_health_history():
     """Get system health history"""
     try:
@@ -244,7 +254,61 @@ def get_health_history():
             'success': True,
             'data': history
         }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@mcp_bp.route('/health/samples', methods=['GET'])
+@rate_limit_mcp
+@audit_mcp_operation
+def get_health_samples():
+    """Get recent in-memory system metric samples"""
+    try:
+        seconds = int(request.args.get('seconds', 300))
+        
+        samples = mcp_monitor.system_health.get_recent_samples(seconds)
         
+        return jsonify({
+            'success': True,
+            'data': samples,
+            'sampler': get_metrics_sampler().get_status()
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@mcp_bp.route('/scheduler/stats', methods=['GET'])
+@rate_limit_mcp
+def get_scheduler_stats():
+    """Get run counts, durations and overruns of scheduled background jobs"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': get_job_scheduler().get_stats()
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@mcp_bp.route('/storage/stats', methods=['GET'])
+@rate_limit_mcp
+def get_monitoring_storage_stats():
+    """Get storage mode and size of the monitoring collections"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': get_storage_stats(mcp_monitor.db)
+        }), 200
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -253,6 +317,7 @@ def get_health_history():
 
 @mcp_bp.route('/health/alerts', methods=['GET'])
 @rate_limit_mcp
+@audit_mcp_operation
 def get_health_alerts():
     """Get current health alerts"""
     try:
@@ -271,6 +336,7 @@ def get_health_alerts():
 
 @mcp_bp.route('/health/mcp-server', methods=['GET'])
 @rate_limit_mcp
+@audit_mcp_operation
 def get_mcp_server_status():
     """Get MCP server health status"""
     try:
@@ -321,7 +387,61 @@ def get_audit_changes():
             'success': True,
             'data': changes
         }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@mcp_bp.route('/audit/search', methods=['GET'])
+@rate_limit_audit
+def search_audit_changes():
+    """Search audit trail changes"""
+    try:
+        search_term = request.args.get('q', '').strip()
+        if not search_term:
+            return jsonify({
+                'success': False,
+                'error': 'Search term is required'
+            }), 400
+        
+        mode = request.args.get('mode', 'indexed')
+        match = request.args.get('match', 'prefix')
+        field = request.args.get('field')
+        
+        if mode not in ('indexed', 'regex') or match not in ('exact', 'prefix'):
+            return jsonify({
+                'success': False,
+                'error': 'mode must be indexed or regex and match must be exact or prefix'
+            }), 400
+        
+        if field and field not in SEARCH_FIELDS:
+            return jsonify({
+                'success': False,
+                'error': f"field must be one of {', '.join(SEARCH_FIELDS)}"
+            }), 400
         
+        start_date = request.args.get('startDate')
+        end_date = request.args.get('endDate')
+        hours = request.args.get('hours')
+        
+        changes = audit_service.audit_trail.search_changes(
+            search_term,
+            limit=int(request.args.get('limit', 50)),
+            mode=mode,
+            match=match,
+            field=field,
+            start_date=datetime.fromisoformat(start_date.replace('Z', '+00:00')) if start_date else None,
+            end_date=datetime.fromisoformat(end_date.replace('Z', '+00:00')) if end_date else None,
+            hours=int(hours) if hours else None
+        )
+        
+        return jsonify({
+            'success': True,
+            'data': changes
+        }), 200
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -393,6 +513,113 @@ def get_rollback_candidates():
             'error': str(e)
         }), 500
 
+@mcp_bp.route('/audit/rollback-plan', methods=['POST'])
+@rate_limit_audit
+def plan_rollback():
+    """Dry-run a multi-change rollback and return the planned operations"""
+    try:
+        data = request.get_json(silent=True) or {}
+        plan = rollback_planner.plan(**_rollback_plan_args(data))
+        
+        return jsonify({
+            'success': True,
+            'data': rollback_planner.serialize_plan(plan)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@mcp_bp.route('/audit/rollback-plan/execute', methods=['POST'])
+@rate_limit_audit
+@audit_mcp_operation
+def execute_rollback_plan():
+    """Apply a multi-change rollback in a single transaction"""
+    try:
+        data = request.get_json(silent=True) or {}
+        reason = data.get('reason', 'Manual rollback via API')
+        transactional = bool(data.get('transactional', True))
+        plan_args = _rollback_plan_args(data)
+        
+        if not any(plan_args[key] for key in ('start_date', 'user_id', 'mcp_command')):
+            return jsonify({
+                'success': False,
+                'error': 'startDate, userId or mcpCommand is required'
+            }), 400
+        
+        if data.get('background'):
+            job_id = rollback_planner.execute_async(reason, transactional, **plan_args)
+            return jsonify({
+                'success': True,
+                'data': {'jobId': job_id}
+            }), 202
+        
+        result = rollback_planner.execute(reason, transactional, **plan_args)
+        
+        if result['success']:
+            return jsonify({
+                'success': True,
+                'data': result
+            }), 200
+        else:
+            return jsonify({
+                'success': False,
+                'error': result['error'],
+                'jobId': result['jobId']
+            }), 400
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@mcp_bp.route('/audit/rollback-jobs/<job_id>', methods=['GET'])
+@rate_limit_audit
+def get_rollback_job(job_id):
+    """Get progress of a rollback job"""
+    try:
+        if not ObjectId.is_valid(job_id):
+            return jsonify({
+                'success': False,
+                'error': 'Invalid job id'
+            }), 400
+        
+        job = rollback_planner.get_job(job_id)
+        
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Rollback job not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': job
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+def _rollback_plan_args(data):
+    """Translate a rollback plan request body into planner arguments"""
+    start_date = data.get('startDate')
+    end_date = data.get('endDate')
+    
+    return {
+        'start_date': datetime.fromisoformat(start_date.replace('Z', '+00:00')) if start_date else None,
+        'end_date': datetime.fromisoformat(end_date.replace('Z', '+00:00')) if end_date else None,
+        'user_id': data.get('userId'),
+        'mcp_command': data.get('mcpCommand'),
+        'collection_name': data.get('collection'),
+        'force': bool(data.get('force', False))
+    }
+
 @mcp_bp.route('/audit/suspicious-activity', methods=['GET'])
 @rate_limit_audit
 def get_suspicious_activity():
@@ -405,7 +632,63 @@ def get_suspicious_activity():
             'success': True,
             'data': activity
         }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@mcp_bp.route('/audit/chain/verify', methods=['POST'])
+@rate_limit_audit
+@audit_mcp_operation
+def verify_audit_chain():
+    """Verify the audit hash chain since the last checkpoint"""
+    try:
+        data = request.get_json(silent=True) or {}
+        full = bool(data.get('full', False))
+        
+        result = audit_service.verify_chain(full=full)
+        
+        if not result['success']:
+            return jsonify({
+                'success': False,
+                'error': result['error']
+            }), 500
+        
+        return jsonify({
+            'success': True,
+            'data': result
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@mcp_bp.route('/audit/archive', methods=['POST'])
+@rate_limit_audit
+@audit_mcp_operation
+def archive_audit_logs():
+    """Move old audit records to compressed archive segments"""
+    try:
+        data = request.get_json(silent=True) or {}
+        days = int(data.get('days', 90))
         
+        result = audit_service.archive_old_audit_logs(days)
+        
+        if not result['success']:
+            return jsonify({
+                'success': False,
+                'error': result['error']
+            }), 500
+        
+        return jsonify({
+            'success': True,
+            'data': result
+        }), 200
+    
     except Exception as e:
         return jsonify({
             'success': False,
@@ -422,8 +705,27 @@ def generate_compliance_report():
         start_date = datetime.fromisoformat(data['startDate'].replace('Z', '+00:00'))
         end_date = datetime.fromisoformat(data['endDate'].replace('Z', '+00:00'))
         collection_name = data.get('collection')
+        output_format = data.get('format', 'json')
+        workers = data.get('workers')
+        
+        if workers is not None and (isinstance(workers, bool) or not isinstance(workers, int) or workers < 1):
+            return jsonify({
+                'success': False,
+                'error': 'workers must be a positive integer'
+            }), 400
         
-        report = audit_service.generate_compliance_report(start_date, end_date, collection_name)
+        # Stream large reports line by line instead of building them in memory
+        if output_format in ('ndjson', 'csv'):
+            mimetype = 'application/x-ndjson' if output_format == 'ndjson' else 'text/csv'
+            
+            return Response(
+                stream_with_context(audit_service.stream_compliance_report(
+                    start_date, end_date, collection_name, output_format, workers
+                )),
+                mimetype=mimetype
+            )
+        
+        report = audit_service.generate_compliance_report(start_date, end_date, collection_name, workers)
         
         return jsonify({
             'success': True,
@@ -632,6 +934,7 @@ def update_notification_rule(rule_name):
 # Real-time Monitoring Endpoints
 @mcp_bp.route('/realtime/metrics', methods=['GET'])
 @rate_limit_mcp
+@audit_mcp_operation
 def get_realtime_metrics():
     """Get real-time metrics for dashboard"""
     try:
@@ -650,6 +953,7 @@ def get_realtime_metrics():
 
 @mcp_bp.route('/realtime/connection-pool', methods=['GET'])
 @rate_limit_mcp
+@audit_mcp_operation
 def get_connection_pool_status():
     """Get database connection pool status"""
     try:
@@ -669,6 +973,7 @@ def get_connection_pool_status():
 # Change Stream Management Endpoints
 @mcp_bp.route('/change-streams/status', methods=['GET'])
 @rate_limit_mcp
+@audit_mcp_operation
 def get_change_stream_status():
     """Get change stream status"""
     try:
@@ -728,6 +1033,7 @@ def configure_change_stream(collection):
 # WebSocket Management Endpoints
 @mcp_bp.route('/websocket/stats', methods=['GET'])
 @rate_limit_mcp
+@audit_mcp_operation
 def get_websocket_stats():
     """Get WebSocket connection statistics"""
     try:
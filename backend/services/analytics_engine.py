@@ -9,6 +9,15 @@ from bson import ObjectId
 import logging
 from collections import defaultdict
 
+# Only the resource readings; with time-series storage the rest of each
+# sample is never unpacked
+RESOURCE_FIELDS = {
+    'timestamp': 1,
+    'metrics.cpu.usage_percent': 1,
+    'metrics.memory.usage_percent': 1,
+    'metrics.disk.usage_percent': 1
+}
+
 class AnalyticsEngine:
     def __init__(self):
         self.mcp_operation = MCPOperation()
@@ -184,7 +193,7 @@ class AnalyticsEngine:
             metrics = list(self.db.system_health.find({
                 'timestamp': {'$gte': start_time},
                 'component': 'system'
-            }))
+            }, RESOURCE_FIELDS))
             
             if not metrics:
                 return anomalies
@@ -364,7 +373,7 @@ class AnalyticsEngine:
             metrics = list(self.db.system_health.find({
                 'timestamp': {'$gte': start_date},
                 'component': 'system'
-            }).sort('timestamp', 1))
+            }, RESOURCE_FIELDS).sort('timestamp', 1))
             
             if len(metrics) < 10:  # Need enough data points
                 return insights
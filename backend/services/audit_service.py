@@ -1,10 +1,26 @@
+import csv
+import heapq
+import io
+import itertools
 import json
-import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime, timedelta
 from models.audit_trail import AuditTrail
 from models.mcp_operation import MCPOperation
+from utils.audit_hash import (
+    GENESIS_HASH, HASH_VERSION, compute_chain_hash, compute_record_hash,
+    sign_checkpoint, verify_change, verify_change_batch
+)
 from utils.database import get_db
+from utils.job_scheduler import get_job_scheduler
+from utils.helpers import serialize_mongo_doc, to_naive_utc
+from config import Config
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+import hmac
 import logging
 
 class AuditService:
@@ -13,30 +29,72 @@ class AuditService:
         self.mcp_operation = MCPOperation()
         self.db = get_db()
         
+        # Compliance scanning
+        self.compliance_batch_size = 1000
+        
+        # Hash chain state. Appends are serialized by the lock; the unique
+        # index on chainSeq catches writers in other processes.
+        self.checkpoints = self.db.audit_checkpoints
+        self._chain_lock = threading.RLock()
+        self._chain_head = None
+        self.chain_append_retries = 5
+        self.checkpoint_interval = Config.AUDIT_CHECKPOINT_INTERVAL
+        self.checkpoint_job_name = 'audit_chain:checkpoint'
+        
+        # Chain head and written records per open transaction, applied on commit
+        self._transactions = {}
+        self.max_chain_issues = 100
+        
         # Setup logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
     
+    def _build_change(self, collection_name, operation_type, entity_id,
+                      before_state=None, after_state=None, mcp_command=None,
+                      user_id=None, metadata=None, delta=None):
+        """Build an audit record for a database change"""
+        change_data = {
+            'collectionName': collection_name,
+            'operationType': operation_type,  # create, update, delete
+            'entityId': str(entity_id),
+            'beforeState': before_state,
+            'afterState': after_state,
+            'mcpCommand': mcp_command,
+            'userId': user_id,
+            'metadata': metadata or {},
+            'ipAddress': metadata.get('ipAddress') if metadata else None,
+            'userAgent': metadata.get('userAgent') if metadata else None
+        }
+        
+        # Forward-only delta (e.g. from a change stream), completed when stored
+        if delta is not None and self.audit_trail.delta_storage:
+            change_data['delta'] = delta
+        
+        return change_data
+    
+    def _compact(self, change_data):
+        """Switch a record to delta storage, then timestamp it and hash what is stored"""
+        if self.audit_trail.delta_storage:
+            self.audit_trail.compact_change(change_data)
+        
+        now = datetime.now()
+        change_data.setdefault('timestamp', now)
+        change_data.setdefault('createdAt', now)
+        change_data['hashVersion'] = HASH_VERSION
+        change_data['changeHash'] = compute_record_hash(change_data)
+        return change_data
+    
     def log_database_change(self, collection_name, operation_type, entity_id, 
                           before_state=None, after_state=None, mcp_command=None, 
-                          user_id=None, metadata=None):
+                          user_id=None, metadata=None, delta=None):
         """Log a database change with full context"""
         try:
-            change_data = {
-                'collectionName': collection_name,
-                'operationType': operation_type,  # create, update, delete
-                'entityId': str(entity_id),
-                'beforeState': before_state,
-                'afterState': after_state,
-                'mcpCommand': mcp_command,
-                'userId': user_id,
-                'metadata': metadata or {},
-                'changeHash': self._generate_change_hash(collection_name, entity_id, operation_type, after_state),
-                'ipAddress': metadata.get('ipAddress') if metadata else None,
-                'userAgent': metadata.get('userAgent') if metadata else None
-            }
+            change_data = self._build_change(
+                collection_name, operation_type, entity_id, before_state,
+                after_state, mcp_command, user_id, metadata, delta
+            )
             
-            audit_id = self.audit_trail.log_change(change_data)
+            audit_id = self._append_to_chain(change_data)
             self.logger.info(f"Logged change: {collection_name}.{operation_type} for entity {entity_id}")
             
             return audit_id
@@ -45,13 +103,320 @@ class AuditService:
             self.logger.error(f"Error logging database change: {str(e)}")
             return None
     
-    def _generate_change_hash(self, collection_name, entity_id, operation_type, after_state):
-        """Generate a hash for the change to detect tampering"""
+    def log_database_changes_bulk(self, changes, session=None):
+        """Log many database changes with one insert_many.
+        
+        Each item takes the keyword arguments of log_database_change. Raises
+        on failure so callers inside a transaction can abort it.
+        """
+        records = [self._build_change(**change) for change in changes]
+        
+        audit_ids = self._append_many_to_chain(records, session=session)
+        self.logger.info(f"Logged {len(audit_ids)} changes in bulk")
+        
+        return audit_ids
+    
+    def _load_chain_head(self):
+        """Load the latest chain link from the audit trail"""
+        head = self.audit_trail.collection.find_one(
+            {'chainSeq': {'$exists': True}},
+            {'chainSeq': 1, 'chainHash': 1},
+            sort=[('chainSeq', -1)]
+        )
+        
+        if head:
+            return {'seq': head['chainSeq'], 'hash': head['chainHash']}
+        
+        return {'seq': 0, 'hash': GENESIS_HASH}
+    
+    def _append_to_chain(self, change_data):
+        """Append a change to the audit hash chain.
+        
+        Each record stores the previous record's chain hash, so any edit or
+        deletion breaks every later link and verification can resume from the
+        last signed checkpoint instead of rehashing the whole trail.
+        """
+        with self._chain_lock:
+            # Entity versions are assigned under the same lock as chain positions
+            self._compact(change_data)
+            
+            for _ in range(self.chain_append_retries):
+                if self._chain_head is None:
+                    self._chain_head = self._load_chain_head()
+                
+                chain_seq = self._chain_head['seq'] + 1
+                prev_hash = self._chain_head['hash']
+                
+                change_data.pop('_id', None)
+                change_data['chainSeq'] = chain_seq
+                change_data['prevHash'] = prev_hash
+                change_data['chainHash'] = compute_chain_hash(chain_seq, prev_hash, change_data.get('changeHash'))
+                
+                try:
+                    audit_id = self.audit_trail.log_change(change_data)
+                except DuplicateKeyError:
+                    # Another process appended first; reload the head and retry
+                    self._chain_head = None
+                    continue
+                except Exception:
+                    self.audit_trail.clear_state_cache()
+                    raise
+                
+                self._chain_head = {'seq': chain_seq, 'hash': change_data['chainHash']}
+                return audit_id
+        
+        raise RuntimeError('Could not append to audit hash chain')
+    
+    def _append_many_to_chain(self, records, session=None):
+        """Append a batch of records to the audit hash chain in one insert.
+        
+        With a session started by begin_chain_transaction, the new chain head
+        and rollup counts are kept with the transaction until it commits.
+        """
+        if not records:
+            return []
+        
+        with self._chain_lock:
+            transaction = self._transactions.get(id(session)) if session is not None else None
+            
+            if transaction is not None:
+                head = transaction['head']
+            else:
+                if self._chain_head is None:
+                    self._chain_head = self._load_chain_head()
+                head = self._chain_head
+            
+            chain_seq = head['seq']
+            prev_hash = head['hash']
+            
+            for record in records:
+                self._compact(record)
+                chain_seq += 1
+                record.pop('_id', None)
+                record['chainSeq'] = chain_seq
+                record['prevHash'] = prev_hash
+                record['chainHash'] = compute_chain_hash(chain_seq, prev_hash, record.get('changeHash'))
+                prev_hash = record['chainHash']
+            
+            try:
+                audit_ids = self.audit_trail.log_changes(
+                    records, session=session, record_rollup=transaction is None
+                )
+            except Exception:
+                # Partial or conflicting insert; reload the head on next append
+                self._chain_head = None
+                self.audit_trail.clear_state_cache()
+                raise
+            
+            if transaction is not None:
+                transaction['head'] = {'seq': chain_seq, 'hash': prev_hash}
+                transaction['records'].extend(records)
+            else:
+                self._chain_head = {'seq': chain_seq, 'hash': prev_hash}
+            return audit_ids
+    
+    def begin_chain_transaction(self, session):
+        """Start, or restart after a retry, the chain appends of a transaction.
+        
+        Call right before the transaction's chain appends and keep them last in
+        the transaction: the chain lock is held from here until
+        commit_chain_transaction or abort_chain_transaction, so other appends
+        wait only for the audit insert and the commit, not the data writes.
+        """
+        if id(session) not in self._transactions:
+            self._chain_lock.acquire()
+        
+        # Entity versions cached by an aborted attempt were never committed
+        self.audit_trail.clear_state_cache()
+        self._transactions[id(session)] = {'head': self._load_chain_head(), 'records': []}
+    
+    def commit_chain_transaction(self, session):
+        """Adopt a committed transaction's chain head, release the chain lock and record its rollup counts"""
+        transaction = self._transactions.pop(id(session), None)
+        if transaction is None:
+            return
+        
         try:
-            content = f"{collection_name}:{entity_id}:{operation_type}:{json.dumps(after_state, sort_keys=True, default=str)}"
-            return hashlib.sha256(content.encode()).hexdigest()
-        except Exception:
-            return None
+            self._chain_head = transaction['head']
+        finally:
+            self._chain_lock.release()
+        
+        self.audit_trail.rollup.record(transaction['records'])
+    
+    def abort_chain_transaction(self, session):
+        """Forget a failed transaction's appends and release the chain lock"""
+        transaction = self._transactions.pop(id(session), None)
+        if transaction is None:
+            return
+        
+        try:
+            self._chain_head = None
+            self.audit_trail.clear_state_cache()
+        finally:
+            self._chain_lock.release()
+    
+    def get_latest_checkpoint(self):
+        """Get the most recent signed chain checkpoint"""
+        return self.checkpoints.find_one(sort=[('chainSeq', -1)])
+    
+    def _checkpoint_signature_valid(self, checkpoint):
+        """Check the HMAC signature of a stored checkpoint"""
+        expected = sign_checkpoint(
+            Config.AUDIT_CHECKPOINT_KEY,
+            checkpoint['chainSeq'],
+            checkpoint['chainHash'],
+            checkpoint['createdAt']
+        )
+        return hmac.compare_digest(expected, checkpoint.get('signature', ''))
+    
+    def _create_checkpoint(self, chain_seq, chain_hash, records_verified):
+        """Store a signed checkpoint for a verified chain position"""
+        # Mongo stores milliseconds, so truncate before signing
+        now = datetime.now()
+        created_at = now.replace(microsecond=(now.microsecond // 1000) * 1000)
+        
+        checkpoint = {
+            'chainSeq': chain_seq,
+            'chainHash': chain_hash,
+            'recordsVerified': records_verified,
+            'createdAt': created_at,
+            'signature': sign_checkpoint(Config.AUDIT_CHECKPOINT_KEY, chain_seq, chain_hash, created_at)
+        }
+        
+        self.checkpoints.insert_one(checkpoint)
+        return checkpoint
+    
+    def start_checkpointing(self):
+        """Verify the chain and write a signed checkpoint every checkpoint_interval"""
+        get_job_scheduler().add_job(self.checkpoint_job_name, self._checkpoint_chain, self.checkpoint_interval)
+    
+    def stop_checkpointing(self):
+        """Stop scheduled chain checkpoints"""
+        get_job_scheduler().remove_job(self.checkpoint_job_name)
+    
+    def _checkpoint_chain(self):
+        """Scheduled job: verify records appended since the last checkpoint and sign the new head"""
+        result = self.verify_chain(create_checkpoint=True)
+        
+        if not result.get('success'):
+            raise RuntimeError(result.get('error', 'Chain verification failed'))
+        
+        if not result['valid']:
+            self.logger.warning(f"Audit chain verification found {result.get('issueCount', 0)} issue(s); no checkpoint written")
+    
+    def verify_chain(self, full=False, create_checkpoint=True):
+        """Verify the audit hash chain incrementally.
+        
+        Starts from the latest signed checkpoint (or the genesis when full is
+        set) and only re-checks records appended since. Archived records are
+        merged in by chain position, so a full verify spans both tiers. When
+        everything checks out a new checkpoint is written at the last
+        verified position.
+        """
+        try:
+            issues = []
+            start_seq = 0
+            running_hash = GENESIS_HASH
+            checkpoint = None if full else self.get_latest_checkpoint()
+            
+            if checkpoint:
+                if not self._checkpoint_signature_valid(checkpoint):
+                    return {
+                        'success': True,
+                        'valid': False,
+                        'issues': [{
+                            'type': 'invalid_checkpoint',
+                            'chainSeq': checkpoint['chainSeq'],
+                            'message': 'Checkpoint signature does not match'
+                        }],
+                        'recordsVerified': 0
+                    }
+                
+                start_seq = checkpoint['chainSeq']
+                running_hash = checkpoint['chainHash']
+            
+            cursor = self.audit_trail.collection.find(
+                {'chainSeq': {'$gt': start_seq}},
+                self._compliance_projection()
+            ).sort('chainSeq', 1).batch_size(self.compliance_batch_size)
+            
+            records = heapq.merge(
+                self.audit_trail.archive.iter_chain(start_seq),
+                cursor,
+                key=lambda change: change['chainSeq']
+            )
+            
+            expected_seq = start_seq + 1
+            records_verified = 0
+            issue_count = 0
+            
+            for change in records:
+                records_verified += 1
+                found = []
+                
+                if change['chainSeq'] != expected_seq:
+                    found.append({
+                        'type': 'chain_gap',
+                        'message': f"Expected chain position {expected_seq}, found {change['chainSeq']}"
+                    })
+                
+                if change.get('prevHash') != running_hash:
+                    found.append({
+                        'type': 'chain_broken',
+                        'message': 'Previous hash does not match the preceding record'
+                    })
+                
+                validation = verify_change(change)
+                if not validation['valid']:
+                    found.append({
+                        'type': 'invalid_hash',
+                        'message': 'Change hash does not match record content',
+                        'validation': validation
+                    })
+                
+                expected_chain_hash = compute_chain_hash(change['chainSeq'], change.get('prevHash'), change.get('changeHash'))
+                if change.get('chainHash') != expected_chain_hash:
+                    found.append({
+                        'type': 'chain_broken',
+                        'message': 'Chain hash does not match record content'
+                    })
+                
+                for issue in found:
+                    issue_count += 1
+                    if len(issues) < self.max_chain_issues:
+                        issues.append({
+                            **issue,
+                            'auditId': str(change['_id']),
+                            'chainSeq': change['chainSeq'],
+                            'collection': change['collectionName'],
+                            'entityId': change['entityId'],
+                            'timestamp': change.get('timestamp')
+                        })
+                
+                expected_seq = change['chainSeq'] + 1
+                running_hash = change.get('chainHash')
+            
+            new_checkpoint = None
+            if create_checkpoint and issue_count == 0 and records_verified > 0:
+                new_checkpoint = self._create_checkpoint(expected_seq - 1, running_hash, records_verified)
+            
+            return {
+                'success': True,
+                'valid': issue_count == 0,
+                'issues': issues,
+                'issueCount': issue_count,
+                'verifiedFrom': start_seq,
+                'verifiedTo': expected_seq - 1,
+                'recordsVerified': records_verified,
+                'checkpoint': {
+                    'chainSeq': new_checkpoint['chainSeq'],
+                    'createdAt': new_checkpoint['createdAt']
+                } if new_checkpoint else None
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error verifying audit chain: {str(e)}")
+            return {'success': False, 'error': str(e)}
     
     def validate_change_integrity(self, audit_id):
         """Validate that a change hasn't been tampered with"""
@@ -60,21 +425,7 @@ class AuditService:
             if not change:
                 return {'valid': False, 'error': 'Change record not found'}
             
-            # Recalculate hash
-            expected_hash = self._generate_change_hash(
-                change['collectionName'],
-                change['entityId'],
-                change['operationType'],
-                change['afterState']
-            )
-            
-            stored_hash = change.get('changeHash')
-            
-            return {
-                'valid': expected_hash == stored_hash,
-                'expectedHash': expected_hash,
-                'storedHash': stored_hash
-            }
+            return verify_change(change)
             
         except Exception as e:
             return {'valid': False, 'error': str(e)}
@@ -90,6 +441,8 @@ class AuditService:
             if audit_record.get('rolledBack'):
                 return {'success': False, 'error': 'Change already rolled back'}
             
+            audit_record = self.audit_trail.expand_record(audit_record)
+            
             collection_name = audit_record['collectionName']
             entity_id = audit_record['entityId']
             operation_type = audit_record['operationType']
@@ -121,7 +474,7 @@ class AuditService:
             
             if rollback_successful:
                 # Mark as rolled back in audit trail
-                rollback_id = self.audit_trail.rollback_operation(audit_id, rollback_reason)
+                rollback_id = self.audit_trail.rollback_operation(audit_id, self._append_to_chain, rollback_reason)
                 
                 # Log the rollback as a new change
                 self.log_database_change(
@@ -152,12 +505,14 @@ class AuditService:
     def get_entity_audit_trail(self, collection_name, entity_id):
         """Get complete audit trail for a specific entity"""
         try:
-            changes = self.audit_trail.get_entity_history(collection_name, entity_id)
+            records = self.audit_trail.entity_changes(collection_name, entity_id)
+            
+            # Hashes cover the stored records, so validate before expanding them
+            validations = [verify_change(record) if record.get('changeHash') else None for record in records]
+            changes = serialize_mongo_doc(list(self.audit_trail.materialize(records)))
             
-            # Add validation status for each change
-            for change in changes:
-                if change.get('changeHash'):
-                    validation = self.validate_change_integrity(str(change['_id']))
+            for change, validation in zip(changes, validations):
+                if validation is not None:
                     change['validationStatus'] = validation
             
             return {
@@ -169,6 +524,23 @@ class AuditService:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def archive_old_audit_logs(self, days=90):
+        """Move audit records older than the given age to the archive tier"""
+        try:
+            archived = self.audit_trail.cleanup_old_audit_logs(days)
+            
+            self.logger.info(f"Archived {archived} audit records older than {days} days")
+            
+            return {
+                'success': True,
+                'archived': archived,
+                'archive': self.audit_trail.archive.get_stats()
+            }
+            
+        except Exception as e:
+            self.logger.error(f"Error archiving audit logs: {str(e)}")
+            return {'success': False, 'error': str(e)}
+    
     def detect_suspicious_activity(self, hours=24):
         """Detect potentially suspicious database activity"""
         try:
@@ -208,26 +580,16 @@ class AuditService:
                     }
                 })
             
-            # Pattern 2: Failed validation checks
-            invalid_changes = list(self.audit_trail.collection.find({
-                'timestamp': {'$gte': cutoff_time},
-                'changeHash': {'$exists': True}
-            }))
+            # Pattern 2: Tampering, checked against the hash chain from the last checkpoint
+            chain_result = self.verify_chain(create_checkpoint=False)
             
-            for change in invalid_changes:
-                validation = self.validate_change_integrity(str(change['_id']))
-                if not validation.get('valid'):
-                    suspicious_patterns.append({
-                        'type': 'invalid_hash',
-                        'severity': 'high',
-                        'description': f"Change integrity validation failed for {change['collectionName']} entity {change['entityId']}",
-                        'details': {
-                            'auditId': str(change['_id']),
-                            'collection': change['collectionName'],
-                            'entityId': change['entityId'],
-                            'validation': validation
-                        }
-                    })
+            for issue in chain_result.get('issues', []):
+                suspicious_patterns.append({
+                    'type': issue['type'],
+                    'severity': 'high',
+                    'description': f"Audit chain verification failed for {issue.get('collection', 'audit_trail')} entity {issue.get('entityId', 'unknown')}: {issue['message']}",
+                    'details': issue
+                })
             
             # Pattern 3: Unusual operation patterns
             unusual_ops_pipeline = [
@@ -268,34 +630,83 @@ class AuditService:
             self.logger.error(f"Error detecting suspicious activity: {str(e)}")
             return {'success': False, 'error': str(e)}
     
-    def generate_compliance_report(self, start_date, end_date, collection_name=None):
-        """Generate compliance audit report"""
-        try:
-            filter_query = {
-                'timestamp': {
-                    '$gte': start_date,
-                    '$lte': end_date
-                }
-            }
-            
-            if collection_name:
-                filter_query['collectionName'] = collection_name
-            
-            # Get all changes in the period
-            changes = list(self.audit_trail.collection.find(filter_query))
-            
-            # Statistics
-            stats = {
-                'totalChanges': len(changes),
-                'operationTypes': {},
-                'collections': {},
-                'users': {},
-                'validationIssues': 0
+    def _compliance_projection(self):
+        """Projection for counting and verifying audit records; the record hash covers every stored field"""
+        return {'searchTokens': 0}
+    
+    def _compliance_issue(self, change, validation):
+        """Build a validation issue entry for the compliance report"""
+        return {
+            'auditId': str(change['_id']),
+            'timestamp': change.get('timestamp'),
+            'collection': change['collectionName'],
+            'entityId': change['entityId'],
+            'validation': validation
+        }
+    
+    def _scan_compliance(self, start_date, end_date, collection_name=None, workers=None):
+        """Single-pass compliance scan over one cursor.
+        
+        Yields ('issue', issue) for every record whose hash does not match and
+        finishes with ('summary', stats). Counts are aggregated as the cursor is
+        consumed and hashes are recomputed inline, or across a process pool when
+        workers > 1, so memory stays bounded by the batch size.
+        """
+        # Compare like with like against the naive timestamps of both tiers
+        start_date = to_naive_utc(start_date)
+        end_date = to_naive_utc(end_date)
+        
+        filter_query = {
+            'timestamp': {
+                '$gte': start_date,
+                '$lte': end_date
             }
-            
-            validation_issues = []
-            
-            for change in changes:
+        }
+        
+        if collection_name:
+            filter_query['collectionName'] = collection_name
+        
+        cursor = self.audit_trail.collection.find(
+            filter_query, self._compliance_projection()
+        ).batch_size(self.compliance_batch_size)
+        
+        # Archived records in the window are scanned before the live collection
+        records = itertools.chain(
+            self.audit_trail.archive.iter_records(start_date, end_date, collection_name),
+            cursor
+        )
+        
+        stats = {
+            'totalChanges': 0,
+            'operationTypes': {},
+            'collections': {},
+            'users': {},
+            'validationIssues': 0
+        }
+        
+        # More processes than cores only adds spawn and IPC overhead
+        if workers:
+            workers = min(workers, os.cpu_count() or 1)
+        
+        executor = None
+        if workers and workers > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        
+        pending = set()
+        batch = []
+        
+        def drain(futures):
+            for future in futures:
+                for change, validation in future.result():
+                    yield change, validation
+        
+        try:
+            for change in records:
+                stats['totalChanges'] += 1
+                
                 # Count by operation type
                 op_type = change['operationType']
                 stats['operationTypes'][op_type] = stats['operationTypes'].get(op_type, 0) + 1
@@ -305,21 +716,60 @@ class AuditService:
                 stats['collections'][collection] = stats['collections'].get(collection, 0) + 1
                 
                 # Count by user
-                user_id = change.get('userId', 'system')
+                user_id = change.get('userId') or 'system'
                 stats['users'][user_id] = stats['users'].get(user_id, 0) + 1
                 
+                if not change.get('changeHash'):
+                    continue
+                
                 # Validate integrity
-                if change.get('changeHash'):
-                    validation = self.validate_change_integrity(str(change['_id']))
-                    if not validation.get('valid'):
+                if executor is None:
+                    validation = verify_change(change)
+                    if not validation['valid']:
                         stats['validationIssues'] += 1
-                        validation_issues.append({
-                            'auditId': str(change['_id']),
-                            'timestamp': change['timestamp'],
-                            'collection': change['collectionName'],
-                            'entityId': change['entityId'],
-                            'validation': validation
-                        })
+                        yield 'issue', self._compliance_issue(change, validation)
+                    continue
+                
+                batch.append(change)
+                
+                if len(batch) >= self.compliance_batch_size:
+                    pending.add(executor.submit(verify_change_batch, batch))
+                    batch = []
+                    
+                    # Bound the number of batches in flight
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for change, validation in drain(done):
+                            stats['validationIssues'] += 1
+                            yield 'issue', self._compliance_issue(change, validation)
+            
+            if executor is not None:
+                if batch:
+                    pending.add(executor.submit(verify_change_batch, batch))
+                
+                done, pending = wait(pending)
+                for change, validation in drain(done):
+                    stats['validationIssues'] += 1
+                    yield 'issue', self._compliance_issue(change, validation)
+        
+        finally:
+            cursor.close()
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        
+        yield 'summary', stats
+    
+    def generate_compliance_report(self, start_date, end_date, collection_name=None, workers=None):
+        """Generate compliance audit report"""
+        try:
+            stats = {}
+            validation_issues = []
+            
+            for kind, payload in self._scan_compliance(start_date, end_date, collection_name, workers):
+                if kind == 'issue':
+                    validation_issues.append(payload)
+                else:
+                    stats = payload
             
             return {
                 'success': True,
@@ -337,23 +787,79 @@ class AuditService:
             self.logger.error(f"Error generating compliance report: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    def stream_compliance_report(self, start_date, end_date, collection_name=None,
+                                 output_format='ndjson', workers=None):
+        """Stream a compliance report as NDJSON or CSV lines.
+        
+        Validation issues are emitted as soon as they are found and the
+        aggregated statistics follow once the scan completes.
+        """
+        if output_format == 'csv':
+            columns = ['section', 'auditId', 'timestamp', 'collection', 'entityId',
+                       'storedHash', 'expectedHash', 'name', 'count']
+            
+            def write_row(row):
+                buffer = io.StringIO()
+                csv.DictWriter(buffer, fieldnames=columns).writerow(row)
+                return buffer.getvalue()
+            
+            yield ','.join(columns) + '\r\n'
+            
+            for kind, payload in self._scan_compliance(start_date, end_date, collection_name, workers):
+                if kind == 'issue':
+                    yield write_row({
+                        'section': 'invalid_hash',
+                        'auditId': payload['auditId'],
+                        'timestamp': payload['timestamp'],
+                        'collection': payload['collection'],
+                        'entityId': payload['entityId'],
+                        'storedHash': payload['validation'].get('storedHash'),
+                        'expectedHash': payload['validation'].get('expectedHash')
+                    })
+                else:
+                    yield write_row({'section': 'total', 'name': 'totalChanges', 'count': payload['totalChanges']})
+                    yield write_row({'section': 'total', 'name': 'validationIssues', 'count': payload['validationIssues']})
+                    for section, key in (('operationType', 'operationTypes'),
+                                         ('collection', 'collections'),
+                                         ('user', 'users')):
+                        for name, count in payload[key].items():
+                            yield write_row({'section': section, 'name': name, 'count': count})
+            return
+        
+        yield json.dumps({
+            'type': 'header',
+            'reportPeriod': {
+                'startDate': start_date,
+                'endDate': end_date,
+                'collection': collection_name
+            },
+            'generatedAt': datetime.now()
+        }, default=str) + '\n'
+        
+        for kind, payload in self._scan_compliance(start_date, end_date, collection_name, workers):
+            if kind == 'issue':
+                yield json.dumps({'type': 'validationIssue', **payload}, default=str) + '\n'
+            else:
+                yield json.dumps({'type': 'statistics', 'statistics': payload}, default=str) + '\n'
+    
     def get_rollback_candidates(self, hours=24):
         """Get operations that can be safely rolled back"""
         try:
-            candidates = self.audit_trail.get_rollback_candidates(hours)
+            candidates = self.audit_trail.get_rollback_candidates(hours, serialize=False)
+            
+            # Safety checks for all candidates in a constant number of queries
+            safety_checks = self._check_rollback_safety_batch(candidates)
             
-            # Add safety checks for each candidate
             safe_candidates = []
             
-            for candidate in candidates:
-                safety_check = self._check_rollback_safety(candidate)
+            for candidate, safety_check in zip(candidates, safety_checks):
                 if safety_check['safe']:
                     candidate['safetyCheck'] = safety_check
                     safe_candidates.append(candidate)
             
             return {
                 'success': True,
-                'candidates': safe_candidates,
+                'candidates': serialize_mongo_doc(safe_candidates),
                 'totalCandidates': len(safe_candidates)
             }
             
@@ -362,47 +868,120 @@ class AuditService:
     
     def _check_rollback_safety(self, audit_record):
         """Check if a rollback operation is safe to perform"""
+        return self._check_rollback_safety_batch([audit_record])[0]
+    
+    def _check_rollback_safety_batch(self, audit_records):
+        """Check rollback safety for many audit records at once.
+        
+        One aggregation finds the latest change per (collection, entityId) and
+        counts the changes after each candidate's own timestamp, and one $in
+        query per target collection checks which entities still exist.
+        """
+        if not audit_records:
+            return []
+        
         try:
-            collection_name = audit_record['collectionName']
-            entity_id = audit_record['entityId']
+            entities_by_collection = {}
+            candidate_times = {}
+            for record in audit_records:
+                key = (record['collectionName'], record['entityId'])
+                entities_by_collection.setdefault(key[0], set()).add(key[1])
+                candidate_times.setdefault(key, set()).add(record['timestamp'])
+            candidate_times = {key: sorted(times) for key, times in candidate_times.items()}
+            
+            # Latest change and later-change counts per entity, so the group stays one small document per entity
+            group = {
+                '_id': {'collection': '$collectionName', 'entityId': '$entityId'},
+                'latest': {'$max': '$timestamp'},
+                'after0': {'$sum': 1}
+            }
+            
+            # Entities with several candidates get one extra counter per later candidate timestamp
+            for index in range(1, max(len(times) for times in candidate_times.values())):
+                branches = [
+                    {
+                        'case': {'$and': [
+                            {'$eq': ['$collectionName', collection_name]},
+                            {'$eq': ['$entityId', entity_id]}
+                        ]},
+                        'then': times[index]
+                    }
+                    for (collection_name, entity_id), times in candidate_times.items()
+                    if len(times) > index
+                ]
+                threshold = {'$switch': {'branches': branches, 'default': datetime.max}}
+                group[f'after{index}'] = {'$sum': {'$cond': [{'$gt': ['$timestamp', threshold]}, 1, 0]}}
+            
+            pipeline = [
+                {'$match': {
+                    '$or': [
+                        {'collectionName': collection_name, 'entityId': entity_id, 'timestamp': {'$gt': times[0]}}
+                        for (collection_name, entity_id), times in candidate_times.items()
+                    ]
+                }},
+                {'$group': group}
+            ]
             
-            # Check if there are dependent changes after this one
-            dependent_changes = list(self.audit_trail.collection.find({
-                'collectionName': collection_name,
-                'entityId': entity_id,
-                'timestamp': {'$gt': audit_record['timestamp']}
-            }))
+            later_changes = {
+                (item['_id']['collection'], item['_id']['entityId']): item
+                for item in self.audit_trail.collection.aggregate(pipeline)
+            }
             
-            if dependent_changes:
-                return {
-                    'safe': False,
-                    'reason': f'Found {len(dependent_changes)} dependent changes after this operation',
-                    'dependentChanges': len(dependent_changes)
-                }
+            # Entity existence, one query per target collection
+            existing = set()
+            for collection_name, entity_ids in entities_by_collection.items():
+                object_ids = [ObjectId(entity_id) for entity_id in entity_ids if ObjectId.is_valid(entity_id)]
+                
+                if not object_ids:
+                    continue
+                
+                for doc in self.db[collection_name].find({'_id': {'$in': object_ids}}, {'_id': 1}):
+                    existing.add((collection_name, str(doc['_id'])))
             
-            # Check if entity still exists (for update/delete rollbacks)
-            target_collection = self.db[collection_name]
-            entity_exists = target_collection.find_one({'_id': ObjectId(entity_id)}) is not None
+            results = []
             
-            if audit_record['operationType'] in ['update', 'delete'] and not entity_exists:
-                return {
-                    'safe': False,
-                    'reason': 'Target entity no longer exists',
-                    'dependentChanges': 0
-                }
+            for record in audit_records:
+                key = (record['collectionName'], record['entityId'])
+                later = later_changes.get(key)
+                
+                if later and later['latest'] > record['timestamp']:
+                    dependent_changes = later[f"after{candidate_times[key].index(record['timestamp'])}"]
+                    results.append({
+                        'safe': False,
+                        'reason': f'Found {dependent_changes} dependent changes after this operation',
+                        'dependentChanges': dependent_changes
+                    })
+                
+                elif not ObjectId.is_valid(record['entityId']):
+                    results.append({
+                        'safe': False,
+                        'reason': 'Entity id is not a valid ObjectId',
+                        'dependentChanges': 0
+                    })
+                
+                # Check if entity still exists (for update/delete rollbacks)
+                elif record['operationType'] in ['update', 'delete'] and key not in existing:
+                    results.append({
+                        'safe': False,
+                        'reason': 'Target entity no longer exists',
+                        'dependentChanges': 0
+                    })
+                
+                else:
+                    results.append({
+                        'safe': True,
+                        'reason': 'Safe to rollback',
+                        'dependentChanges': 0
+                    })
             
-            return {
-                'safe': True,
-                'reason': 'Safe to rollback',
-                'dependentChanges': 0
-            }
+            return results
             
         except Exception as e:
-            return {
+            return [{
                 'safe': False,
                 'reason': f'Error checking safety: {str(e)}',
                 'dependentChanges': 0
-            }
+            } for _ in audit_records]
 
 # Global audit service instance
 audit_service = AuditService()
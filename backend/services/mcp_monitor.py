@@ -1,21 +1,23 @@
-import asyncio
-import aiohttp
 import logging
 from datetime import datetime, timedelta
+from config import Config
 from models.mcp_operation import MCPOperation
 from models.system_health import SystemHealth
+from services.mcp_prober import get_mcp_prober
+from services.notification_hub import get_notification_hub
 from utils.database import get_db
-import threading
-import time
+from utils.job_scheduler import get_job_scheduler
+from utils.operation_counter import get_operation_counter
 
 class MCPMonitor:
-    def __init__(self, mcp_server_url="http://localhost:8000"):
-        self.mcp_server_url = mcp_server_url
+    def __init__(self, mcp_server_url=None):
+        self.mcp_server_url = mcp_server_url or Config.MCP_SERVER_URLS[0]
+        self.prober = get_mcp_prober()
         self.mcp_operation = MCPOperation()
         self.system_health = SystemHealth()
         self.db = get_db()
         self.monitoring = False
-        self.monitor_thread = None
+        self.job_name = 'mcp_monitor'
         
         # Setup logging
         logging.basicConfig(level=logging.INFO)
@@ -25,66 +27,61 @@ class MCPMonitor:
         """Start the monitoring service"""
         if not self.monitoring:
             self.monitoring = True
-            self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
-            self.monitor_thread.start()
+            self.prober.start()
+            # Every 30 seconds, or 60 after a failure
+            get_job_scheduler().add_job(self.job_name, self._run_checks, 30, initial_delay=0, error_backoff=60)
             self.logger.info("MCP Monitor started")
     
     def stop_monitoring(self):
         """Stop the monitoring service"""
         self.monitoring = False
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=5)
+        get_job_scheduler().remove_job(self.job_name)
+        self.prober.stop()
         self.logger.info("MCP Monitor stopped")
     
-    def _monitor_loop(self):
-        """Main monitoring loop"""
-        while self.monitoring:
-            try:
-                # Check MCP server health
-                self._check_mcp_server_health()
-                
-                # Record system metrics
-                self._record_system_metrics()
-                
-                # Check for stuck operations
-                self._check_stuck_operations()
-                
-                # Sleep for 30 seconds
-                time.sleep(30)
-                
-            except Exception as e:
-                self.logger.error(f"Error in monitoring loop: {str(e)}")
-                time.sleep(60)  # Wait longer on error
+    def _run_checks(self):
+        """One monitoring pass, run by the job scheduler"""
+        # Check MCP server health
+        self._check_mcp_server_health()
+        
+        # Record system metrics
+        self._record_system_metrics()
+        
+        # Check for stuck operations
+        self._check_stuck_operations()
     
     def _check_mcp_server_health(self):
         """Check MCP server health status"""
         try:
-            # This would make an actual HTTP request to MCP server health endpoint
-            # For now, we'll simulate based on recent operations
-            
-            recent_ops = self.db.mcp_operations.count_documents({
-                'timestamp': {'$gte': datetime.now() - timedelta(minutes=5)}
-            })
-            
-            failed_ops = self.db.mcp_operations.count_documents({
-                'timestamp': {'$gte': datetime.now() - timedelta(minutes=30)},
-                'status': 'failed'
-            })
+            counter = get_operation_counter()
+            recent_ops = counter.counts(5)['total']
+            error_rate = counter.failure_rate(30)['rate']
             
-            total_recent = self.db.mcp_operations.count_documents({
-                'timestamp': {'$gte': datetime.now() - timedelta(minutes=30)}
-            })
+            # Probe results since the previous check
+            window = self.prober.take_window()
+            endpoints = window['endpoints']
+            latency = window['latency']
+            healthy = [endpoint for endpoint in endpoints if endpoint['status'] == 'healthy']
+            primary = next((endpoint for endpoint in endpoints if endpoint['url'] == self.mcp_server_url), None)
             
-            error_rate = (failed_ops / max(total_recent, 1)) * 100
+            if endpoints and not healthy:
+                status = 'down'
+            elif error_rate >= 10 or len(healthy) < len(endpoints):
+                status = 'unhealthy'
+            else:
+                status = 'healthy'
             
             health_data = {
                 'serverUrl': self.mcp_server_url,
-                'status': 'healthy' if error_rate < 10 else 'unhealthy',
-                'responseTime': 0,  # Would be actual response time
+                'status': status,
+                'responseTime': latency.get('p50', 0),
+                'responseTimeP99': latency.get('p99', 0),
+                'latency': latency,
+                'endpoints': endpoints,
                 'recentOperations': recent_ops,
                 'errorRate': error_rate,
                 'lastCheck': datetime.now(),
-                'uptime': 'unknown'
+                'uptime': primary['uptimeSeconds'] if primary else 'unknown'
             }
             
             # Store health data
@@ -107,61 +104,42 @@ class MCPMonitor:
         except Exception as e:
             self.logger.error(f"Error recording system metrics: {str(e)}")
     
-    def _check_stuck_operations(self):
-        """Check for operations that might be stuck"""
+    def _check_stuck_operations(self, notify=True):
+        """Mark operations running for more than 10 minutes as failed"""
         try:
-            # Find operations that have been "running" for more than 10 minutes
             stuck_threshold = datetime.now() - timedelta(minutes=10)
             
-            stuck_operations = list(self.db.mcp_operations.find({
-                'status': 'running',
-                'timestamp': {'$lt': stuck_threshold}
-            }))
+            timed_out = self.mcp_operation.timeout_stuck_operations(stuck_threshold)
             
-            for operation in stuck_operations:
-                self.logger.warning(f"Found stuck operation: {operation['_id']}")
-                
-                # Mark as failed
-                self.mcp_operation.update_operation_status(
-                    str(operation['_id']),
-                    'failed',
-                    error_message='Operation timed out - marked as stuck'
-                )
+            if timed_out:
+                self.logger.warning(f"Marked {timed_out} stuck operations as failed")
                 
+                # One notification per sweep, however many operations it caught
+                if notify:
+                    get_notification_hub().send_custom_notification(
+                        'Stuck MCP Operations Timed Out',
+                        f'{timed_out} MCP operations running since before '
+                        f'{stuck_threshold.strftime("%H:%M:%S")} were marked as failed',
+                        severity='high',
+                        notification_type='mcp_operations_timed_out',
+                        data={'timedOut': timed_out, 'startedBefore': stuck_threshold.isoformat()}
+                    )
+            
+            return timed_out
+        
         except Exception as e:
             self.logger.error(f"Error checking stuck operations: {str(e)}")
+            return 0
     
-    async def ping_mcp_server(self):
-        """Ping MCP server to check if it's responsive"""
+    def ping_mcp_server(self, url=None):
+        """Probe an MCP server health endpoint now"""
         try:
-            async with aiohttp.ClientSession() as session:
-                start_time = time.time()
-                async with session.get(f"{self.mcp_server_url}/health", timeout=5) as response:
-                    response_time = (time.time() - start_time) * 1000  # Convert to ms
-                    
-                    if response.status == 200:
-                        data = await response.json()
-                        return {
-                            'status': 'healthy',
-                            'responseTime': round(response_time, 2),
-                            'serverData': data
-                        }
-                    else:
-                        return {
-                            'status': 'unhealthy',
-                            'responseTime': round(response_time, 2),
-                            'error': f'HTTP {response.status}'
-                        }
-        except asyncio.TimeoutError:
-            return {
-                'status': 'timeout',
-                'responseTime': 5000,
-                'error': 'Request timed out'
-            }
+            return self.prober.probe_now(url or self.mcp_server_url)
         except Exception as e:
             return {
+                'url': url or self.mcp_server_url,
                 'status': 'error',
-                'responseTime': 0,
+                'responseTime': None,
                 'error': str(e)
             }
     
@@ -204,7 +182,8 @@ class MCPMonitor:
                     'operationsLastHour': len(recent_ops)
                 },
                 'commonErrors': common_errors,
-                'serverUrl': self.mcp_server_url
+                'serverUrl': self.mcp_server_url,
+                'probes': self.prober.get_status()
             }
             
         except Exception as e:
@@ -238,9 +217,7 @@ class MCPMonitor:
             pending_ops = self.db.mcp_operations.count_documents({'status': 'pending'})
             
             # Recent activity (last 5 minutes)
-            recent_activity = self.db.mcp_operations.count_documents({
-                'timestamp': {'$gte': datetime.now() - timedelta(minutes=5)}
-            })
+            recent_activity = get_operation_counter().counts(5)['total']
             
             # System health
             system_metrics = self.system_health.get_current_system_metrics()
@@ -0,0 +1,219 @@
+import asyncio
+import aiohttp
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from config import Config
+from utils.latency_histogram import LatencyHistogram
+
+class MCPProber:
+    """Probes MCP server health endpoints from a dedicated event loop thread.
+    
+    All endpoints are pinged concurrently every interval through one
+    ClientSession, so keep-alive connections are reused between probes.
+    Each endpoint keeps a lifetime latency histogram and a window histogram
+    that the monitor drains every time it records server health.
+    """
+    
+    def __init__(self, endpoints: List[str] = None, interval: float = None, timeout: float = None):
+        self.endpoints = endpoints or Config.MCP_SERVER_URLS
+        self.interval = interval or Config.MCP_PROBE_INTERVAL
+        self.timeout = timeout or Config.MCP_PROBE_TIMEOUT
+        self.path = Config.MCP_PROBE_PATH
+        
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread: Optional[threading.Thread] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._probe_task: Optional[asyncio.Future] = None
+        self._start_lock = threading.Lock()
+        self.running = False
+        
+        self.state: Dict[str, Dict[str, Any]] = {url: self._new_state() for url in self.endpoints}
+        
+        # Setup logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+    
+    @staticmethod
+    def _new_state() -> Dict[str, Any]:
+        return {
+            'status': 'unknown',
+            'lastLatency': None,
+            'lastError': None,
+            'lastCheck': None,
+            'upSince': None,
+            'probes': 0,
+            'failures': 0,
+            'consecutiveFailures': 0,
+            'histogram': LatencyHistogram(),
+            'window': LatencyHistogram()
+        }
+    
+    def start(self):
+        """Start the event loop thread and the probe cycle"""
+        with self._start_lock:
+            if self.running:
+                return
+            
+            self.running = True
+            self.loop = asyncio.new_event_loop()
+            self.loop_thread = threading.Thread(target=self._run_loop, daemon=True)
+            self.loop_thread.start()
+            self._probe_task = asyncio.run_coroutine_threadsafe(self._probe_forever(), self.loop)
+        
+        self.logger.info(f"MCP prober started for {len(self.endpoints)} endpoint(s)")
+    
+    def stop(self):
+        """Stop probing, close the session and the event loop"""
+        with self._start_lock:
+            if not self.running:
+                return
+            self.running = False
+            
+            if self._probe_task:
+                self._probe_task.cancel()
+            
+            try:
+                asyncio.run_coroutine_threadsafe(self._close_session(), self.loop).result(timeout=5)
+            except Exception as e:
+                self.logger.error(f"Error closing MCP probe session: {str(e)}")
+            
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop_thread.join(timeout=5)
+        
+        self.logger.info("MCP prober stopped")
+    
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Session shared by every probe; created on the loop that uses it"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=2, keepalive_timeout=max(30, self.interval * 3))
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self.session
+    
+    async def _close_session(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+    
+    async def _probe_forever(self):
+        """Ping every endpoint concurrently, then wait for the next cycle"""
+        while self.running:
+            started = time.monotonic()
+            await asyncio.gather(*(self.probe(url) for url in self.endpoints))
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+    
+    async def probe(self, url: str) -> Dict[str, Any]:
+        """Ping one endpoint and record the result"""
+        session = await self._get_session()
+        started = time.perf_counter()
+        
+        try:
+            async with session.get(f"{url.rstrip('/')}{self.path}") as response:
+                # Read the body so the connection goes back to the pool
+                await response.read()
+                latency = (time.perf_counter() - started) * 1000
+                error = None if response.status == 200 else f'HTTP {response.status}'
+                status = 'healthy' if error is None else 'unhealthy'
+        except asyncio.TimeoutError:
+            latency = (time.perf_counter() - started) * 1000
+            status, error = 'timeout', 'Request timed out'
+        except aiohttp.ClientError as e:
+            latency = None
+            status, error = 'unreachable', str(e) or type(e).__name__
+        
+        return self._record(url, status, latency, error)
+    
+    def _record(self, url: str, status: str, latency: Optional[float], error: Optional[str]) -> Dict[str, Any]:
+        """Update an endpoint's state from a probe result"""
+        state = self.state.setdefault(url, self._new_state())
+        now = datetime.now()
+        
+        state['probes'] += 1
+        state['lastCheck'] = now
+        state['lastLatency'] = round(latency, 3) if latency is not None else None
+        state['lastError'] = error
+        
+        # Only answered requests say something about server latency
+        if latency is not None and status != 'timeout':
+            state['histogram'].record(latency)
+            state['window'].record(latency)
+        
+        if status == 'healthy':
+            if state['status'] != 'healthy':
+                state['upSince'] = now
+            state['consecutiveFailures'] = 0
+        else:
+            state['failures'] += 1
+            state['consecutiveFailures'] += 1
+            state['upSince'] = None
+        
+        state['status'] = status
+        
+        return {'url': url, 'status': status, 'responseTime': state['lastLatency'], 'error': error}
+    
+    def probe_now(self, url: str = None) -> Dict[str, Any]:
+        """Probe an endpoint immediately from a non-loop thread"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self.probe(url or self.endpoints[0]), self.loop)
+        return future.result(timeout=self.timeout + 1)
+    
+    def _endpoint_view(self, url: str, state: Dict[str, Any], latency: Dict[str, Any]) -> Dict[str, Any]:
+        up_since = state['upSince']
+        return {
+            'url': url,
+            'status': state['status'],
+            'lastLatency': state['lastLatency'],
+            'lastError': state['lastError'],
+            'lastCheck': state['lastCheck'],
+            'uptimeSeconds': round((datetime.now() - up_since).total_seconds(), 1) if up_since else 0,
+            'probes': state['probes'],
+            'failures': state['failures'],
+            'consecutiveFailures': state['consecutiveFailures'],
+            'latency': latency
+        }
+    
+    def take_window(self) -> Dict[str, Any]:
+        """Per-endpoint status and combined latency since the previous call"""
+        combined = LatencyHistogram()
+        endpoints = []
+        
+        for url, state in list(self.state.items()):
+            window = state['window']
+            state['window'] = LatencyHistogram()
+            combined.merge(window)
+            endpoints.append(self._endpoint_view(url, state, window.summary()))
+        
+        return {'endpoints': endpoints, 'latency': combined.summary()}
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Per-endpoint status with lifetime latency percentiles"""
+        return {
+            'running': self.running,
+            'intervalSeconds': self.interval,
+            'timeoutSeconds': self.timeout,
+            'endpoints': [
+                self._endpoint_view(url, state, state['histogram'].summary())
+                for url, state in list(self.state.items())
+            ]
+        }
+
+# Global MCP prober instance
+mcp_prober = None
+_mcp_prober_lock = threading.Lock()
+
+def get_mcp_prober():
+    """Get the global MCP prober instance"""
+    global mcp_prober
+    with _mcp_prober_lock:
+        if mcp_prober is None:
+            mcp_prober = MCPProber()
+    return mcp_prober
@@ -7,8 +7,9 @@ from models.notification import Notification
 from models.mcp_operation import MCPOperation
 from models.system_health import SystemHealth
 from utils.database import get_db
-import threading
-import time
+from utils.job_scheduler import get_job_scheduler
+from utils.operation_counter import get_operation_counter
+from services.mcp_prober import get_mcp_prober
 
 class NotificationHub:
     def __init__(self):
@@ -49,7 +50,7 @@ class NotificationHub:
         
         # Background monitoring
         self.monitoring = False
-        self.monitor_thread = None
+        self.job_name = 'notification_monitor'
         
         # Setup logging
         logging.basicConfig(level=logging.INFO)
@@ -59,33 +60,22 @@ class NotificationHub:
         """Start the notification monitoring service"""
         if not self.monitoring:
             self.monitoring = True
-            self.monitor_thread = threading.Thread(target=self._monitoring_loop, daemon=True)
-            self.monitor_thread.start()
+            # Every 60 seconds, or 120 after a failure
+            get_job_scheduler().add_job(self.job_name, self._run_checks, 60, initial_delay=0, error_backoff=120)
             self.logger.info("Notification Hub monitoring started")
     
     def stop_monitoring(self):
         """Stop the notification monitoring service"""
         self.monitoring = False
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=5)
+        get_job_scheduler().remove_job(self.job_name)
         self.logger.info("Notification Hub monitoring stopped")
     
-    def _monitoring_loop(self):
-        """Main monitoring loop"""
-        while self.monitoring:
-            try:
-                # Check various conditions and send notifications
-                self._check_failed_operations()
-                self._check_failure_rate()
-                self._check_system_resources()
-                self._check_mcp_server_health()
-                
-                # Sleep for 60 seconds
-                time.sleep(60)
-                
-            except Exception as e:
-                self.logger.error(f"Error in notification monitoring loop: {str(e)}")
-                time.sleep(120)  # Wait longer on error
+    def _run_checks(self):
+        """Check various conditions and send notifications; run by the job scheduler"""
+        self._check_failed_operations()
+        self._check_failure_rate()
+        self._check_system_resources()
+        self._check_mcp_server_health()
     
     def _check_failed_operations(self):
         """Check for recent failed operations"""
@@ -94,19 +84,16 @@ class NotificationHub:
                 return
             
             # Check for failed operations in the last 5 minutes
-            recent_failures = list(self.db.mcp_operations.find({
-                'status': 'failed',
-                'timestamp': {'$gte': datetime.now() - timedelta(minutes=5)}
-            }))
+            recent_failures = get_operation_counter().counts(5)['byStatus'].get('failed', 0)
             
             if recent_failures:
                 notification_data = {
                     'type': 'mcp_operation_failed',
                     'title': 'MCP Operation Failures Detected',
-                    'message': f'{len(recent_failures)} MCP operations failed in the last 5 minutes',
+                    'message': f'{recent_failures} MCP operations failed in the last 5 minutes',
                     'severity': 'high',
                     'data': {
-                        'failedOperations': len(recent_failures),
+                        'failedOperations': recent_failures,
                         'timeWindow': '5 minutes'
                     }
                 }
@@ -124,19 +111,12 @@ class NotificationHub:
                 return
             
             # Check failure rate in the last hour
-            start_time = datetime.now() - timedelta(hours=1)
-            
-            total_ops = self.db.mcp_operations.count_documents({
-                'timestamp': {'$gte': start_time}
-            })
-            
-            failed_ops = self.db.mcp_operations.count_documents({
-                'timestamp': {'$gte': start_time},
-                'status': 'failed'
-            })
+            window = get_operation_counter().failure_rate(60)
+            total_ops = window['total']
+            failed_ops = window['failed']
             
             if total_ops > 0:
-                failure_rate = (failed_ops / total_ops) * 100
+                failure_rate = window['rate']
                 threshold = self.notification_rules['high_failure_rate']['threshold']
                 
                 if failure_rate >= threshold:
@@ -220,13 +200,36 @@ class NotificationHub:
             if not self._should_notify('mcp_server_down'):
                 return
             
-            # Check if there have been no operations in the last 10 minutes
-            # This could indicate the MCP server is down
-            recent_ops = self.db.mcp_operations.count_documents({
-                'timestamp': {'$gte': datetime.now() - timedelta(minutes=10)}
-            })
+            # Endpoints that failed their last few health probes
+            prober = get_mcp_prober()
+            if prober.running:
+                down = [
+                    endpoint for endpoint in prober.get_status()['endpoints']
+                    if endpoint['consecutiveFailures'] >= 3
+                ]
+                
+                if down:
+                    notification_data = {
+                        'type': 'mcp_server_down',
+                        'title': 'MCP Server Unreachable',
+                        'message': f"{len(down)} MCP endpoint(s) failed their last health probes",
+                        'severity': 'critical',
+                        'data': {
+                            'endpoints': [
+                                {'url': endpoint['url'], 'status': endpoint['status'], 'error': endpoint['lastError']}
+                                for endpoint in down
+                            ]
+                        }
+                    }
+                    
+                    self._send_system_notification(notification_data)
+                    self._update_notification_cooldown('mcp_server_down')
+                return
+            
+            # Without probes, infer from operations: none in the last 10
+            # minutes plus recent failed connection attempts
+            recent_ops = get_operation_counter().counts(10)['total']
             
-            # Also check for recent failed connection attempts
             recent_failures = self.db.mcp_operations.count_documents({
                 'timestamp': {'$gte': datetime.now() - timedelta(minutes=5)},
                 'status': 'failed',
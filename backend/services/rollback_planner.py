@@ -0,0 +1,389 @@
+import logging
+import threading
+from datetime import datetime
+from bson import ObjectId
+from pymongo import DeleteOne, ReplaceOne
+from models.audit_trail import has_unknown_values
+from services.audit_service import get_audit_service
+from utils.database import get_db, get_client
+from utils.helpers import serialize_mongo_doc
+
+class RollbackPlanner:
+    """Plan and apply multi-change rollbacks.
+    
+    Changes are selected by time window, user, MCP command and/or collection.
+    For every affected entity only one inverse operation is needed: restore the
+    state it had before the first selected change. Inverse operations are
+    applied newest-first in bulk inside a MongoDB transaction.
+    """
+    
+    def __init__(self):
+        self.db = get_db()
+        self.audit_service = get_audit_service()
+        self.audit_trail = self.audit_service.audit_trail
+        self.jobs = self.db.rollback_jobs
+        
+        self.rollbackable_operations = ['create', 'insert', 'update', 'replace', 'delete']
+        self.batch_size = 500
+        
+        # Setup logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+    
+    def _build_filter(self, start_date=None, end_date=None, user_id=None,
+                      mcp_command=None, collection_name=None):
+        """Build the audit trail filter for the changes to revert"""
+        filter_query = {
+            'operationType': {'$in': self.rollbackable_operations},
+            'rolledBack': {'$ne': True}
+        }
+        
+        if start_date or end_date:
+            filter_query['timestamp'] = {}
+            if start_date:
+                filter_query['timestamp']['$gte'] = start_date
+            if end_date:
+                filter_query['timestamp']['$lte'] = end_date
+        
+        if user_id:
+            filter_query['userId'] = user_id
+        
+        if mcp_command:
+            filter_query['mcpCommand'] = mcp_command
+        
+        if collection_name:
+            filter_query['collectionName'] = collection_name
+        
+        return filter_query
+    
+    def _is_restorable(self, state):
+        """Check that a before state is a complete document"""
+        if not state:
+            return False
+        
+        # Change stream deletes only record the document key
+        if set(state.keys()) <= {'_id'}:
+            return False
+        
+        return not has_unknown_values(state)
+    
+    def _inverse_operation(self, first_change):
+        """Work out the operation that restores an entity's pre-window state"""
+        operation_type = first_change['operationType']
+        before_state = first_change.get('beforeState')
+        
+        if operation_type in ('create', 'insert'):
+            return 'delete', None
+        
+        if not self._is_restorable(before_state):
+            return None, None
+        
+        document = {key: value for key, value in before_state.items() if key != '_id'}
+        
+        if operation_type == 'delete':
+            return 'insert', document
+        
+        return 'restore', document
+    
+    def plan(self, start_date=None, end_date=None, user_id=None, mcp_command=None,
+             collection_name=None, force=False):
+        """Compute the ordered set of inverse operations for the selected changes"""
+        filter_query = self._build_filter(start_date, end_date, user_id, mcp_command, collection_name)
+        
+        cursor = self.audit_trail.collection.find(filter_query, {
+            'collectionName': 1,
+            'entityId': 1,
+            'operationType': 1,
+            'beforeState': 1,
+            'entityVersion': 1,
+            'storage': 1,
+            'delta': 1,
+            'timestamp': 1
+        }).sort([('collectionName', 1), ('entityId', 1), ('timestamp', 1)])
+        
+        # One entry per entity: first selected change plus every selected audit id
+        entities = {}
+        for change in cursor:
+            key = (change['collectionName'], change['entityId'])
+            
+            if key not in entities:
+                entities[key] = {
+                    'first': change,
+                    'auditIds': [],
+                    'lastTimestamp': change['timestamp']
+                }
+            
+            entities[key]['auditIds'].append(change['_id'])
+            entities[key]['lastTimestamp'] = change['timestamp']
+        
+        conflicts = self._find_conflicts(entities) if entities else {}
+        
+        operations = []
+        skipped = []
+        
+        for key, entry in entities.items():
+            collection, entity_id = key
+            
+            if key in conflicts and not force:
+                skipped.append({
+                    'collection': collection,
+                    'entityId': entity_id,
+                    'reason': f'{conflicts[key]} later changes outside the selection'
+                })
+                continue
+            
+            if not ObjectId.is_valid(entity_id):
+                skipped.append({
+                    'collection': collection,
+                    'entityId': entity_id,
+                    'reason': 'Entity id is not a valid ObjectId'
+                })
+                continue
+            
+            # Delta-stored changes need the previous version rebuilt
+            first = self.audit_trail.expand_record(entry['first'])
+            action, document = self._inverse_operation(first)
+            
+            if action is None:
+                skipped.append({
+                    'collection': collection,
+                    'entityId': entity_id,
+                    'reason': 'Previous state was not captured completely'
+                })
+                continue
+            
+            operations.append({
+                'collection': collection,
+                'entityId': entity_id,
+                'action': action,
+                'document': document,
+                'auditIds': entry['auditIds'],
+                'firstTimestamp': entry['first']['timestamp'],
+                'lastTimestamp': entry['lastTimestamp']
+            })
+        
+        # Undo the most recent changes first so dependants go before what they depend on
+        operations.sort(key=lambda op: op['firstTimestamp'], reverse=True)
+        
+        return {
+            'filter': filter_query,
+            'operations': operations,
+            'skipped': skipped,
+            'summary': {
+                'entities': len(entities),
+                'operations': len(operations),
+                'changes': sum(len(op['auditIds']) for op in operations),
+                'skipped': len(skipped),
+                'byAction': {
+                    action: sum(1 for op in operations if op['action'] == action)
+                    for action in ('delete', 'restore', 'insert')
+                }
+            }
+        }
+    
+    def _find_conflicts(self, entities):
+        """Count changes made after the selection that the plan would overwrite"""
+        # Only the count per entity comes back, however many later changes there are
+        pipeline = [
+            {'$match': {
+                '$or': [
+                    {
+                        'collectionName': collection,
+                        'entityId': entity_id,
+                        'timestamp': {'$gt': entry['lastTimestamp']},
+                        '_id': {'$nin': entry['auditIds']}
+                    }
+                    for (collection, entity_id), entry in entities.items()
+                ]
+            }},
+            {'$group': {
+                '_id': {'collection': '$collectionName', 'entityId': '$entityId'},
+                'changes': {'$sum': 1}
+            }}
+        ]
+        
+        conflicts = {}
+        for item in self.audit_trail.collection.aggregate(pipeline):
+            conflicts[(item['_id']['collection'], item['_id']['entityId'])] = item['changes']
+        
+        return conflicts
+    
+    def _write_model(self, operation):
+        """Bulk write model for a planned inverse operation"""
+        entity_filter = {'_id': ObjectId(operation['entityId'])}
+        
+        if operation['action'] == 'delete':
+            return DeleteOne(entity_filter)
+        
+        return ReplaceOne(entity_filter, operation['document'], upsert=True)
+    
+    def _update_job(self, job_id, **fields):
+        """Record job progress outside the transaction so it is visible while running"""
+        fields['updatedAt'] = datetime.now()
+        self.jobs.update_one({'_id': job_id}, {'$set': fields})
+    
+    def _apply(self, plan, job_id, reason, session, progress):
+        """Apply a plan's operations in batches using the given session"""
+        operations = plan['operations']
+        applied = 0
+        rollback_changes = []
+        
+        # A retried transaction drops the chain appends of the failed attempt
+        if session is not None:
+            self.audit_service.abort_chain_transaction(session)
+        
+        progress['applied'] = 0
+        self._update_job(job_id, applied=0)
+        
+        for start in range(0, len(operations), self.batch_size):
+            batch = operations[start:start + self.batch_size]
+            
+            # Keep newest-first order while grouping consecutive writes per collection
+            group = []
+            for operation in batch + [None]:
+                if group and (operation is None or operation['collection'] != group[0]['collection']):
+                    self.db[group[0]['collection']].bulk_write(
+                        [self._write_model(op) for op in group],
+                        ordered=True,
+                        session=session
+                    )
+                    group = []
+                if operation is not None:
+                    group.append(operation)
+            
+            audit_ids = [audit_id for op in batch for audit_id in op['auditIds']]
+            self.audit_trail.collection.update_many(
+                {'_id': {'$in': audit_ids}},
+                {'$set': {'rolledBack': True, 'rollbackJobId': str(job_id)}},
+                session=session
+            )
+            
+            changes = [{
+                'collection_name': op['collection'],
+                'operation_type': 'rollback',
+                'entity_id': op['entityId'],
+                'after_state': op['document'],
+                'mcp_command': f"ROLLBACK_PLAN:{job_id}",
+                'metadata': {
+                    'rollbackReason': reason,
+                    'rollbackJobId': str(job_id),
+                    'action': op['action'],
+                    'originalAuditIds': [str(audit_id) for audit_id in op['auditIds']]
+                }
+            } for op in batch]
+            
+            if session is None:
+                self.audit_service.log_database_changes_bulk(changes)
+            else:
+                rollback_changes.extend(changes)
+            
+            applied += len(batch)
+            progress['applied'] = applied
+            self._update_job(job_id, applied=applied)
+        
+        # Chain appends go last, so the chain lock covers only them and the commit
+        if rollback_changes:
+            self.audit_service.begin_chain_transaction(session)
+            self.audit_service.log_database_changes_bulk(rollback_changes, session=session)
+        
+        return applied
+    
+    def execute(self, reason=None, transactional=True, job_id=None, **plan_args):
+        """Plan and apply a rollback, recording progress in rollback_jobs"""
+        plan = self.plan(**plan_args)
+        
+        if job_id is None:
+            job_id = self.create_job(plan, reason)
+        else:
+            self._update_job(job_id, total=plan['summary']['operations'], summary=plan['summary'])
+        
+        progress = {'applied': 0}
+        
+        try:
+            self._update_job(job_id, status='running', startedAt=datetime.now())
+            
+            if not plan['operations']:
+                applied = 0
+            elif transactional:
+                with get_client().start_session() as session:
+                    try:
+                        applied = session.with_transaction(
+                            lambda s: self._apply(plan, job_id, reason, s, progress)
+                        )
+                    except Exception:
+                        self.audit_service.abort_chain_transaction(session)
+                        raise
+                    self.audit_service.commit_chain_transaction(session)
+            else:
+                applied = self._apply(plan, job_id, reason, None, progress)
+            
+            self._update_job(job_id, status='completed', applied=applied, completedAt=datetime.now())
+            self.logger.info(f"Rollback job {job_id} reverted {applied} entities")
+            
+            return {
+                'success': True,
+                'jobId': str(job_id),
+                'applied': applied,
+                'summary': plan['summary'],
+                'skipped': plan['skipped']
+            }
+        
+        except Exception as e:
+            self.logger.error(f"Error executing rollback job {job_id}: {str(e)}")
+            # Nothing survives an aborted transaction; without one, finished batches stay applied
+            applied = 0 if transactional else progress['applied']
+            self._update_job(job_id, status='failed', error=str(e), applied=applied)
+            return {'success': False, 'jobId': str(job_id), 'applied': applied, 'error': str(e)}
+    
+    def create_job(self, plan=None, reason=None):
+        """Create a rollback job record"""
+        job = {
+            'status': 'pending',
+            'reason': reason,
+            'total': plan['summary']['operations'] if plan else None,
+            'summary': plan['summary'] if plan else None,
+            'applied': 0,
+            'createdAt': datetime.now(),
+            'updatedAt': datetime.now()
+        }
+        
+        return self.jobs.insert_one(job).inserted_id
+    
+    def execute_async(self, reason=None, transactional=True, **plan_args):
+        """Start a rollback in a background thread and return its job id"""
+        job_id = self.create_job(reason=reason)
+        
+        thread = threading.Thread(
+            target=self.execute,
+            kwargs={'reason': reason, 'transactional': transactional, 'job_id': job_id, **plan_args},
+            daemon=True
+        )
+        thread.start()
+        
+        return str(job_id)
+    
+    def get_job(self, job_id):
+        """Get rollback job progress"""
+        job = self.jobs.find_one({'_id': ObjectId(job_id)})
+        return serialize_mongo_doc(job)
+    
+    def serialize_plan(self, plan):
+        """JSON-friendly view of a plan"""
+        return serialize_mongo_doc({
+            'operations': [
+                {
+                    **{key: value for key, value in op.items() if key not in ('document', 'auditIds')},
+                    'auditIds': [str(audit_id) for audit_id in op['auditIds']]
+                }
+                for op in plan['operations']
+            ],
+            'skipped': plan['skipped'],
+            'summary': plan['summary']
+        })
+
+# Global rollback planner instance
+rollback_planner = RollbackPlanner()
+
+def get_rollback_planner():
+    """Get the global rollback planner instance"""
+    return rollback_planner
@@ -0,0 +1,94 @@
+import json
+import hashlib
+import hmac
+from datetime import datetime, timezone
+
+# Kept free of database imports so it can be loaded by process-pool workers
+
+def compute_change_hash(collection_name, entity_id, operation_type, after_state):
+    """Generate a hash for the change to detect tampering"""
+    try:
+        content = f"{collection_name}:{entity_id}:{operation_type}:{json.dumps(after_state, sort_keys=True, default=str)}"
+        return hashlib.sha256(content.encode()).hexdigest()
+    except Exception:
+        return None
+
+# Records with this hashVersion hash every stored field, see compute_record_hash
+HASH_VERSION = 2
+
+# Left out of the record hash: identity and chain links (covered by the chain
+# hash), search tokens derived from mcpCommand, and the rollback markers set
+# on a record after it is written
+UNHASHED_FIELDS = frozenset((
+    '_id', 'changeHash', 'chainSeq', 'prevHash', 'chainHash',
+    'searchTokens', 'rolledBack', 'rollbackId', 'rollbackJobId'
+))
+
+def _canonical_value(value):
+    """JSON form of values json cannot encode, stable across a MongoDB round trip"""
+    if isinstance(value, datetime):
+        # MongoDB keeps naive UTC with millisecond precision
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat(timespec='milliseconds')
+    return str(value)
+
+def compute_record_hash(record):
+    """Hash a canonical serialization of every stored field of an audit record"""
+    try:
+        content = {key: value for key, value in record.items() if key not in UNHASHED_FIELDS}
+        canonical = json.dumps(content, sort_keys=True, separators=(',', ':'), default=_canonical_value)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+    except Exception:
+        return None
+
+def change_hash_payload(change):
+    """The part of an audit record covered by its change hash"""
+    if change.get('storage') == 'delta':
+        return change.get('delta')
+    return change.get('afterState')
+
+def verify_change(change):
+    """Recompute the hash of an audit record and compare it with the stored one"""
+    if change.get('hashVersion') == HASH_VERSION:
+        expected_hash = compute_record_hash(change)
+    else:
+        # Older records hash only the state they store
+        expected_hash = compute_change_hash(
+            change['collectionName'],
+            change['entityId'],
+            change['operationType'],
+            change_hash_payload(change)
+        )
+    
+    stored_hash = change.get('changeHash')
+    
+    return {
+        'valid': expected_hash == stored_hash,
+        'expectedHash': expected_hash,
+        'storedHash': stored_hash
+    }
+
+def verify_change_batch(changes):
+    """Verify a batch of audit records, returning only the ones that fail"""
+    failures = []
+    
+    for change in changes:
+        validation = verify_change(change)
+        if not validation['valid']:
+            failures.append((change, validation))
+    
+    return failures
+
+# Hash of the record preceding the first link in the chain
+GENESIS_HASH = '0' * 64
+
+def compute_chain_hash(chain_seq, prev_hash, change_hash):
+    """Link a change hash to the previous record's chain hash"""
+    content = f"{chain_seq}:{prev_hash}:{change_hash}"
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def sign_checkpoint(secret_key, chain_seq, chain_hash, created_at):
+    """HMAC signature over a chain checkpoint"""
+    content = f"{chain_seq}:{chain_hash}:{created_at.isoformat()}"
+    return hmac.new(secret_key.encode(), content.encode(), hashlib.sha256).hexdigest()
@@ -1,15 +1,71 @@
 import threading
 import time
 import logging
-from datetime import datetime
+import queue
+import zlib
+from collections import deque
+from datetime import datetime, timedelta
 from typing import Dict, Callable, Any, Optional
 from pymongo import MongoClient
 from pymongo.change_stream import ChangeStream
+from pymongo.errors import OperationFailure
+from config import Config
 from utils.database import get_db
+from utils.diff_engine import from_update_description
+from utils.operation_counter import get_operation_counter
 from services.audit_service import get_audit_service
 from services.notification_hub import get_notification_hub
 import json
 
+# Server error codes meaning a resume token can no longer be used
+RESUME_FAILED_CODES = (260, 280, 286)
+
+class ResumeTokenTracker:
+    """Tracks the newest resume token that is safe to checkpoint.
+    
+    Events are processed by several lanes, so a token is only safe once its
+    event and every event dispatched before it have been processed.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_seq = 0
+        self._done_seq = -1
+        self._pending: Dict[int, tuple] = {}
+        self._completed = set()
+        
+        self.token = None
+        self.cluster_time = None
+        self.last_dispatched_token = None
+        self.processed = 0
+    
+    def dispatched(self, token, cluster_time) -> int:
+        """Register an event handed to a lane and return its sequence number"""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._pending[seq] = (token, cluster_time)
+            self.last_dispatched_token = token
+            return seq
+    
+    def completed(self, seq: int):
+        """Mark an event processed and advance the watermark"""
+        with self._lock:
+            self._completed.add(seq)
+            self.processed += 1
+            
+            while self._done_seq + 1 in self._completed:
+                self._done_seq += 1
+                self._completed.discard(self._done_seq)
+                self.token, self.cluster_time = self._pending.pop(self._done_seq)
+    
+    def advance_idle(self, token):
+        """Move to the stream's post-batch token when nothing is in flight"""
+        with self._lock:
+            if token is not None and self._done_seq == self._next_seq - 1:
+                self.token = token
+                self.last_dispatched_token = token
+
 class ChangeStreamManager:
     def __init__(self):
         self.db = get_db()
@@ -59,12 +115,62 @@ class ChangeStreamManager:
                 'operations': ['insert'],
                 'audit_logging': False,
                 'notifications': False  # Avoid recursion
+            },
+            'audit_trail': {
+                'enabled': True,
+                'operations': ['insert'],
+                'audit_logging': False,  # Avoid recursion
+                'notifications': False  # Fanned out to websocket subscribers
             }
         }
         
-        # Active change streams
-        self.change_streams: Dict[str, ChangeStream] = {}
-        self.stream_threads: Dict[str, threading.Thread] = {}
+        # One database-level change stream feeds every configured collection
+        self.change_stream: Optional[ChangeStream] = None
+        self.watcher_thread: Optional[threading.Thread] = None
+        self.watched_collections: list = []
+        self.max_await_time_ms = Config.CHANGE_STREAM_MAX_AWAIT_MS
+        
+        # Worker lanes; a collection always maps to the same lane so its
+        # events are handled in order
+        self.lane_count = Config.CHANGE_STREAM_WORKERS
+        self.lane_queue_size = Config.CHANGE_STREAM_QUEUE_SIZE
+        self.lanes: list = []
+        self.lane_threads: list = []
+        self._stream_lock = threading.RLock()
+        
+        # Micro-batches: a lane waits up to batch_window for more events
+        self.batch_window = Config.CHANGE_STREAM_BATCH_WINDOW_MS / 1000
+        self.batch_size = Config.CHANGE_STREAM_BATCH_SIZE
+        
+        # Processing metrics; lag is cluster time to the end of processing
+        self._metrics_lock = threading.Lock()
+        self.lag_samples = deque(maxlen=1000)
+        self.events_processed = 0
+        self.batches_processed = 0
+        self.audit_records_written = 0
+        self.failed_batches = 0
+        self.max_retry_delay = 30
+        
+        # Batches still failing after max_batch_attempts are set aside
+        self.max_batch_attempts = 10
+        self.dead_letters = self.db.change_stream_dead_letters
+        self.dead_lettered_batches = 0
+        
+        # Resume token checkpoints, written in batches rather than per event
+        self.stream_name = 'erp_changes'
+        self.checkpoints = self.db.change_stream_checkpoints
+        self.checkpoint_interval = Config.CHANGE_STREAM_CHECKPOINT_INTERVAL
+        self.checkpoint_events = Config.CHANGE_STREAM_CHECKPOINT_EVENTS
+        self.catchup_batch_size = Config.CHANGE_STREAM_CATCHUP_BATCH_SIZE
+        self.tracker = ResumeTokenTracker()
+        self._saved_token = None
+        self._saved_at = 0.0
+        self._saved_processed = 0
+        
+        # Replay state after a restart
+        self.catching_up = False
+        self.replayed_events = 0
+        self.history_lost = False
         
         # Event handlers
         self.event_handlers: Dict[str, list] = {
@@ -80,99 +186,383 @@ class ChangeStreamManager:
         # Setup logging
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
+        
+        # Keep the rolling MCP operation counts current from the stream
+        get_operation_counter().attach(self)
     
     def start_change_streams(self):
         """Start monitoring change streams for all configured collections"""
-        if self.running:
-            self.logger.warning("Change streams already running")
-            return
-        
-        self.running = True
-        
-        for collection_name, config in self.stream_configs.items():
-            if config['enabled']:
-                self._start_collection_stream(collection_name, config)
+        with self._stream_lock:
+            if self.running:
+                self.logger.warning("Change streams already running")
+                return
+            
+            self.running = True
+            self.tracker = ResumeTokenTracker()
+            self._start_lanes()
+            self._start_watcher()
         
         self.logger.info("Change stream monitoring started")
     
     def stop_change_streams(self):
         """Stop all change stream monitoring"""
-        self.running = False
+        with self._stream_lock:
+            self.running = False
+            self._stop_watcher()
+            self._stop_lanes()
+            
+            # The watermark only covers processed events, so it is safe to save
+            self._save_checkpoint(force=True)
         
-        # Close all change streams
-        for collection_name, stream in self.change_streams.items():
-            try:
-                stream.close()
-                self.logger.info(f"Closed change stream for {collection_name}")
-            except Exception as e:
-                self.logger.error(f"Error closing change stream for {collection_name}: {str(e)}")
+        self.logger.info("Change stream monitoring stopped")
+    
+    def _build_pipeline(self):
+        """Match only the configured collections and their operations"""
+        enabled = {
+            name: config for name, config in self.stream_configs.items()
+            if config['enabled']
+        }
         
-        # Wait for threads to finish
-        for collection_name, thread in self.stream_threads.items():
-            try:
-                thread.join(timeout=5)
-                self.logger.info(f"Stopped change stream thread for {collection_name}")
-            except Exception as e:
-                self.logger.error(f"Error stopping thread for {collection_name}: {str(e)}")
+        return list(enabled), [{
+            '$match': {
+                'ns.coll': {'$in': list(enabled)},
+                '$or': [
+                    {'ns.coll': name, 'operationType': {'$in': config['operations']}}
+                    if config['operations'] else {'ns.coll': name}
+                    for name, config in enabled.items()
+                ]
+            }
+        }]
+    
+    def _load_checkpoint(self):
+        """Get the persisted resume token for this stream, if any"""
+        checkpoint = self.checkpoints.find_one({'_id': self.stream_name})
+        return checkpoint.get('resumeToken') if checkpoint else None
+    
+    def _save_checkpoint(self, force=False):
+        """Persist the watermark token once enough time or events have passed"""
+        token = self.tracker.token
+        if token is None or token == self._saved_token:
+            return
         
-        self.change_streams.clear()
-        self.stream_threads.clear()
+        processed = self.tracker.processed
+        due = (time.monotonic() - self._saved_at >= self.checkpoint_interval or
+               processed - self._saved_processed >= self.checkpoint_events)
         
-        self.logger.info("Change stream monitoring stopped")
+        if not (force or due):
+            return
+        
+        try:
+            self.checkpoints.update_one(
+                {'_id': self.stream_name},
+                {'$set': {
+                    'resumeToken': token,
+                    'clusterTime': self.tracker.cluster_time,
+                    'updatedAt': datetime.now()
+                }},
+                upsert=True
+            )
+            self._saved_token = token
+            self._saved_at = time.monotonic()
+            self._saved_processed = processed
+        except Exception as e:
+            self.logger.error(f"Error saving change stream checkpoint: {str(e)}")
     
-    def _start_collection_stream(self, collection_name: str, config: Dict[str, Any]):
-        """Start change stream for a specific collection"""
+    def _open_stream(self, resume_token=None):
+        """Open the change stream, resuming after resume_token when possible"""
+        _, pipeline = self._build_pipeline()
+        options = {'full_document': 'updateLookup', 'max_await_time_ms': self.max_await_time_ms}
+        
+        if resume_token is None:
+            return self.db.watch(pipeline, **options)
+        
         try:
-            collection = self.db[collection_name]
-            
-            # Create pipeline to filter operations
-            pipeline = []
+            # Catch up on the backlog in large batches
+            stream = self.db.watch(
+                pipeline,
+                start_after=resume_token,
+                batch_size=self.catchup_batch_size,
+                **options
+            )
+            self.catching_up = True
+            return stream
+        
+        except OperationFailure as e:
+            if e.code not in RESUME_FAILED_CODES:
+                raise
             
-            if config['operations']:
-                pipeline.append({
-                    '$match': {
-                        'operationType': {'$in': config['operations']}
-                    }
-                })
+            # The oplog no longer covers the token; continue from now
+            self.logger.warning(f"Change stream history lost, resuming from now: {str(e)}")
+            self.history_lost = True
+            self.checkpoints.delete_one({'_id': self.stream_name})
+            return self.db.watch(pipeline, **options)
+    
+    def _start_watcher(self):
+        """Open the database-level change stream and its watcher thread"""
+        try:
+            collections, _ = self._build_pipeline()
+            if not collections:
+                self.logger.info("No collections enabled for change streams")
+                return
             
-            # Create change stream
-            change_stream = collection.watch(pipeline, full_document='updateLookup')
-            self.change_streams[collection_name] = change_stream
+            resume_token = self.tracker.last_dispatched_token or self._load_checkpoint()
+            self.change_stream = self._open_stream(resume_token)
+            self.watched_collections = collections
             
-            # Start monitoring thread
-            thread = threading.Thread(
-                target=self._monitor_collection_changes,
-                args=(collection_name, change_stream, config),
+            self.watcher_thread = threading.Thread(
+                target=self._watch_changes,
+                args=(self.change_stream,),
                 daemon=True
             )
-            thread.start()
-            self.stream_threads[collection_name] = thread
+            self.watcher_thread.start()
             
-            self.logger.info(f"Started change stream for {collection_name}")
+            self.logger.info(f"Started change stream for {', '.join(collections)}"
+                             f"{' (resuming)' if resume_token else ''}")
             
         except Exception as e:
-            self.logger.error(f"Error starting change stream for {collection_name}: {str(e)}")
+            self.logger.error(f"Error starting change stream: {str(e)}")
     
-    def _monitor_collection_changes(self, collection_name: str, change_stream: ChangeStream, config: Dict[str, Any]):
-        """Monitor changes for a specific collection"""
-        while self.running:
+    def _stop_watcher(self):
+        """Close the change stream and wait for the watcher thread"""
+        stream, thread = self.change_stream, self.watcher_thread
+        self.change_stream = None
+        self.watcher_thread = None
+        self.watched_collections = []
+        
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception as e:
+                self.logger.error(f"Error closing change stream: {str(e)}")
+        
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+    
+    def _start_lanes(self):
+        """Start the worker lanes that process events"""
+        self.lanes = [queue.Queue(maxsize=self.lane_queue_size) for _ in range(self.lane_count)]
+        self.lane_threads = []
+        
+        for lane in self.lanes:
+            thread = threading.Thread(target=self._run_lane, args=(lane,), daemon=True)
+            thread.start()
+            self.lane_threads.append(thread)
+    
+    def _stop_lanes(self):
+        """Let the lanes drain their queues and exit"""
+        for lane in self.lanes:
+            try:
+                lane.put_nowait(None)
+            except queue.Full:
+                # A lane without room for the sentinel exits once it runs idle
+                pass
+        
+        for thread in self.lane_threads:
+            thread.join(timeout=5)
+        
+        self.lanes = []
+        self.lane_threads = []
+    
+    def _lane_for(self, collection_name: str) -> queue.Queue:
+        return self.lanes[zlib.crc32(collection_name.encode()) % len(self.lanes)]
+    
+    def _watch_changes(self, change_stream: ChangeStream):
+        """Dispatch events from the change stream to the worker lanes"""
+        while self.running and change_stream is self.change_stream:
             try:
-                # Wait for next change (with timeout)
+                # Blocks on the server for up to max_await_time_ms
                 change = change_stream.try_next()
                 
                 if change is None:
-                    time.sleep(0.1)  # Brief pause if no changes
+                    # Nothing left in the backlog
+                    self.catching_up = False
+                    self.tracker.advance_idle(change_stream.resume_token)
+                    self._save_checkpoint()
                     continue
                 
-                # Process the change
-                self._process_change(collection_name, change, config)
+                if self.catching_up:
+                    self.replayed_events += 1
+                
+                seq = self.tracker.dispatched(change['_id'], change.get('clusterTime'))
+                
+                # A full lane blocks the watcher instead of dropping events; an
+                # event left undelivered at shutdown holds the watermark and is replayed
+                collection_name = change.get('ns', {}).get('coll')
+                if not self._put_until_stopped(
+                        self._lane_for(collection_name), (collection_name, change, seq, self.catching_up)):
+                    break
+                
+                self._save_checkpoint()
                 
             except Exception as e:
-                self.logger.error(f"Error monitoring changes for {collection_name}: {str(e)}")
+                if not self.running or change_stream is not self.change_stream:
+                    break
+                self.logger.error(f"Error monitoring changes: {str(e)}")
                 time.sleep(1)  # Wait before retrying
+                
+                # Reopen after the last event handed to a lane so nothing is skipped
+                try:
+                    change_stream.close()
+                    change_stream = self._open_stream(self.tracker.last_dispatched_token or self._load_checkpoint())
+                    self.change_stream = change_stream
+                except Exception as reopen_error:
+                    self.logger.error(f"Error reopening change stream: {str(reopen_error)}")
+    
+    def _put_until_stopped(self, lane: queue.Queue, item) -> bool:
+        """Queue an item on a lane, giving up if the stream stops while the lane is full"""
+        while self.running:
+            try:
+                lane.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _next_batch(self, lane: queue.Queue):
+        """Block for one event, then collect more until the window or size limit.
+        
+        Returns (items, stop) where stop means the shutdown sentinel was seen
+        or the stream stopped while the lane was idle.
+        """
+        while True:
+            try:
+                item = lane.get(timeout=1)
+                break
+            except queue.Empty:
+                if not self.running:
+                    return [], True
+        
+        if item is None:
+            return [], True
+        
+        items = [item]
+        deadline = time.monotonic() + self.batch_window
+        
+        while len(items) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = lane.get(timeout=remaining) if remaining > 0 else lane.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return items, True
+            items.append(item)
+        
+        return items, False
     
-    def _process_change(self, collection_name: str, change: Dict[str, Any], config: Dict[str, Any]):
-        """Process a detected change"""
+    def _run_lane(self, lane: queue.Queue):
+        """Process the events routed to one lane in arrival order"""
+        stop = False
+        while not stop:
+            items, stop = self._next_batch(lane)
+            if not items:
+                continue
+            
+            if not self._process_until_done(items):
+                # Stopping: leave the batch uncompleted so the checkpoint stays
+                # before it and it is replayed on the next start
+                return
+            
+            for item in items:
+                self.tracker.completed(item[2])
+    
+    def _process_until_done(self, items: list) -> bool:
+        """Process a batch, retrying with backoff until it succeeds or the stream stops.
+        
+        A failed batch holds the watermark, so its events are never
+        checkpointed past before their audit records are written. After
+        max_batch_attempts the batch goes to the dead-letter collection
+        instead, so one poison event cannot stall its lane forever.
+        """
+        delay = 1
+        attempts = 0
+        while True:
+            try:
+                self._process_batch(items)
+                return True
+            except Exception as e:
+                attempts += 1
+                with self._metrics_lock:
+                    self.failed_batches += 1
+                
+                if attempts >= self.max_batch_attempts and self._dead_letter(items, e, attempts):
+                    return True
+                
+                self.logger.error(f"Error processing {len(items)} changes, retrying in {delay}s: {str(e)}")
+            
+            deadline = time.monotonic() + delay
+            while self.running and time.monotonic() < deadline:
+                time.sleep(0.5)
+            if not self.running:
+                return False
+            
+            delay = min(delay * 2, self.max_retry_delay)
+            
+            # Audit records written before the failure are skipped on the retry
+            items = [(collection_name, change, seq, True) for collection_name, change, seq, _ in items]
+    
+    def _dead_letter(self, items: list, error: Exception, attempts: int) -> bool:
+        """Store a batch that keeps failing for manual replay; False if that fails too"""
+        now = datetime.now()
+        
+        try:
+            self.dead_letters.insert_many([{
+                'stream': self.stream_name,
+                'collection': collection_name,
+                'change': change,
+                'error': str(error),
+                'attempts': attempts,
+                'createdAt': now
+            } for collection_name, change, _, _ in items])
+        except Exception as e:
+            self.logger.error(f"Error writing {len(items)} changes to the dead-letter collection: {str(e)}")
+            return False
+        
+        with self._metrics_lock:
+            self.dead_lettered_batches += 1
+        self.logger.error(f"Gave up on {len(items)} changes after {attempts} attempts, "
+                          f"moved them to the dead-letter collection: {str(error)}")
+        return True
+    
+    def _process_batch(self, items: list):
+        """Process a micro-batch: one audit insert_many and coalesced notifications"""
+        events = []
+        for collection_name, change, seq, replayed in items:
+            config = self.stream_configs.get(collection_name)
+            if not config:
+                continue
+            event = self._extract_event(collection_name, change)
+            if event:
+                event['config'] = config
+                event['replayed'] = replayed
+                events.append(event)
+        
+        # Log to audit trail if enabled
+        audited = [event for event in events if event['config'].get('audit_logging', False)]
+        if audited:
+            self._log_changes_to_audit(audited)
+        
+        # Send notifications if enabled
+        notify = [event for event in events if event['config'].get('notifications', False)]
+        if notify:
+            self._send_change_notifications(notify)
+        
+        for event in events:
+            # Call registered event handlers
+            self._call_event_handlers(event['operation'], {
+                'collection': event['collection'],
+                'operation': event['operation'],
+                'entityId': event['entityId'],
+                'beforeState': event['beforeState'],
+                'afterState': event['afterState'],
+                'change': event['change']
+            })
+        
+        self._record_batch([change for _, change, _, _ in items], len(audited))
+        self.logger.debug(f"Processed batch of {len(items)} changes")
+    
+    def _extract_event(self, collection_name: str, change: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Extract the before/after states of a detected change"""
         try:
             operation_type = change.get('operationType')
             document_id = change.get('documentKey', {}).get('_id')
@@ -181,14 +571,18 @@ class ChangeStreamManager:
             # Extract before and after states
             before_state = None
             after_state = None
+            update_delta = None
             
             if operation_type == 'insert':
                 after_state = full_document
             elif operation_type == 'update':
                 after_state = full_document
-                # Try to get before state from update description
                 update_desc = change.get('updateDescription', {})
-                if update_desc:
+                if update_desc and self.audit_service.audit_trail.delta_storage:
+                    # Exact for this change, unlike fullDocument which may be newer
+                    update_delta = from_update_description(update_desc)
+                elif update_desc:
+                    # Try to get before state from update description
                     before_state = self._reconstruct_before_state(full_document, update_desc)
             elif operation_type == 'delete':
                 # For delete, we only have the document key
@@ -196,40 +590,73 @@ class ChangeStreamManager:
             elif operation_type == 'replace':
                 after_state = full_document
             
-            # Log to audit trail if enabled
-            if config.get('audit_logging', False):
-                self._log_change_to_audit(
-                    collection_name=collection_name,
-                    operation_type=operation_type,
-                    entity_id=str(document_id),
-                    before_state=before_state,
-                    after_state=after_state,
-                    change_metadata=change
-                )
-            
-            # Send notifications if enabled
-            if config.get('notifications', False):
-                self._send_change_notification(
-                    collection_name=collection_name,
-                    operation_type=operation_type,
-                    entity_id=str(document_id),
-                    change_data=change
-                )
-            
-            # Call registered event handlers
-            self._call_event_handlers(operation_type, {
+            return {
                 'collection': collection_name,
                 'operation': operation_type,
                 'entityId': str(document_id),
                 'beforeState': before_state,
                 'afterState': after_state,
+                'delta': update_delta,
                 'change': change
-            })
-            
-            self.logger.debug(f"Processed {operation_type} change for {collection_name}.{document_id}")
+            }
             
         except Exception as e:
             self.logger.error(f"Error processing change for {collection_name}: {str(e)}")
+            return None
+    
+    def _event_lag(self, change: Dict[str, Any]) -> Optional[float]:
+        """Seconds between the change's cluster time and now"""
+        wall_time = change.get('wallTime')
+        if isinstance(wall_time, datetime):
+            # wallTime (MongoDB 6.0+) is UTC with millisecond precision
+            return (datetime.utcnow() - wall_time.replace(tzinfo=None)).total_seconds()
+        
+        cluster_time = change.get('clusterTime')
+        if cluster_time is not None and hasattr(cluster_time, 'time'):
+            return time.time() - cluster_time.time
+        
+        return None
+    
+    def _record_batch(self, changes: list, audit_records: int):
+        """Update processing counters and lag samples after a batch"""
+        lags = [lag for lag in (self._event_lag(change) for change in changes) if lag is not None]
+        
+        with self._metrics_lock:
+            self.events_processed += len(changes)
+            self.batches_processed += 1
+            self.audit_records_written += audit_records
+            self.lag_samples.extend(lags)
+    
+    def get_processing_metrics(self) -> Dict[str, Any]:
+        """Batch sizes and cluster-time-to-processed lag percentiles"""
+        with self._metrics_lock:
+            samples = sorted(self.lag_samples)
+            events = self.events_processed
+            batches = self.batches_processed
+            audit_records = self.audit_records_written
+            failed_batches = self.failed_batches
+            dead_lettered_batches = self.dead_lettered_batches
+        
+        def percentile(fraction):
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(len(samples) * fraction))] * 1000, 1)
+        
+        return {
+            'events_processed': events,
+            'batches_processed': batches,
+            'audit_records_written': audit_records,
+            'failed_batches': failed_batches,
+            'dead_lettered_batches': dead_lettered_batches,
+            'average_batch_size': round(events / batches, 2) if batches else 0,
+            'lag_ms': {
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99),
+                'max': round(samples[-1] * 1000, 1) if samples else None,
+                'samples': len(samples)
+            }
+        }
     
     def _reconstruct_before_state(self, current_document: Dict[str, Any], update_desc: Dict[str, Any]) -> Dict[str, Any]:
         """Attempt to reconstruct the before state from update description"""
@@ -257,64 +684,149 @@ class ChangeStreamManager:
             self.logger.error(f"Error reconstructing before state: {str(e)}")
             return None
     
-    def _log_change_to_audit(self, collection_name: str, operation_type: str, entity_id: str,
-                           before_state: Optional[Dict], after_state: Optional[Dict], 
-                           change_metadata: Dict[str, Any]):
-        """Log change to audit trail"""
+    def _log_changes_to_audit(self, events: list):
+        """Log a batch of changes to the audit trail with one insert_many.
+        
+        Raises on failure so the batch is retried instead of checkpointed.
+        """
         try:
-            # Sanitize states (remove sensitive info)
-            if before_state:
-                before_state = self._sanitize_document(before_state)
-            
-            if after_state:
-                after_state = self._sanitize_document(after_state)
-            
-            # Create audit log entry
-            self.audit_service.log_database_change(
-                collection_name=collection_name,
-                operation_type=operation_type,
-                entity_id=entity_id,
-                before_state=before_state,
-                after_state=after_state,
-                mcp_command='CHANGE_STREAM_DETECTED',
-                metadata={
-                    'changeStreamId': str(change_metadata.get('_id', {}).get('_data', '')),
-                    'timestamp': change_metadata.get('wallTime', datetime.now()),
-                    'source': 'mongodb_change_stream'
-                }
-            )
+            replayed_ids = [
+                self._change_stream_id(event['change']) for event in events if event['replayed']
+            ]
+            
+            # Events replayed after a restart may already have been logged
+            logged = self._logged_change_stream_ids(replayed_ids)
+            
+            changes = []
+            for event in events:
+                change_stream_id = self._change_stream_id(event['change'])
+                if change_stream_id in logged:
+                    continue
+                
+                # Sanitize states (remove sensitive info)
+                changes.append({
+                    'collection_name': event['collection'],
+                    'operation_type': event['operation'],
+                    'entity_id': event['entityId'],
+                    'before_state': self._sanitize_document(event['beforeState']),
+                    'after_state': self._sanitize_document(event['afterState']),
+                    'delta': event['delta'] and self._sanitize_delta(event['delta']),
+                    'mcp_command': 'CHANGE_STREAM_DETECTED',
+                    'metadata': {
+                        'changeStreamId': change_stream_id,
+                        'timestamp': event['change'].get('wallTime', datetime.now()),
+                        'source': 'mongodb_change_stream'
+                    }
+                })
+            
+            if changes:
+                try:
+                    self.audit_service.log_database_changes_bulk(changes)
+                except Exception as e:
+                    # One bad document fails the whole insert; isolate it
+                    self.logger.warning(f"Bulk audit insert of {len(changes)} changes failed, writing them one by one: {str(e)}")
+                    self._log_changes_individually(changes)
             
         except Exception as e:
-            self.logger.error(f"Error logging change to audit: {str(e)}")
+            self.logger.error(f"Error logging {len(events)} changes to audit: {str(e)}")
+            raise
     
-    def _send_change_notification(self, collection_name: str, operation_type: str, 
-                                entity_id: str, change_data: Dict[str, Any]):
-        """Send notification for significant changes"""
-        try:
-            # Only notify for certain types of changes
-            if operation_type not in ['insert', 'delete']:
-                return
-            
-            # Create notification based on collection and operation
-            title, message = self._create_change_notification_content(
-                collection_name, operation_type, entity_id, change_data
+    def _logged_change_stream_ids(self, change_stream_ids: list) -> set:
+        """Change stream ids that already have an audit record"""
+        if not change_stream_ids:
+            return set()
+        
+        return {
+            record['metadata']['changeStreamId']
+            for record in self.audit_service.audit_trail.collection.find(
+                {'metadata.changeStreamId': {'$in': change_stream_ids}},
+                {'metadata.changeStreamId': 1}
             )
+        }
+    
+    def _log_changes_individually(self, changes: list):
+        """Write changes one at a time after a failed bulk insert; raises listing those that still fail"""
+        # An ordered insert_many may have written a prefix before failing
+        logged = self._logged_change_stream_ids([change['metadata']['changeStreamId'] for change in changes])
+        
+        failed = []
+        for change in changes:
+            change_stream_id = change['metadata']['changeStreamId']
+            if change_stream_id in logged:
+                continue
             
-            if title and message:
-                self.notification_hub.send_custom_notification(
-                    title=title,
-                    message=message,
-                    severity='info',
-                    notification_type='database_change',
-                    data={
-                        'collection': collection_name,
-                        'operation': operation_type,
-                        'entityId': entity_id
-                    }
+            try:
+                self.audit_service.log_database_changes_bulk([change])
+            except Exception as e:
+                self.logger.error(
+                    f"Could not audit {change['collection_name']}.{change['operation_type']} "
+                    f"for entity {change['entity_id']} (change {change_stream_id}): {str(e)}"
                 )
+                failed.append(change_stream_id)
+        
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(changes)} changes could not be audited: {', '.join(failed[:10])}")
+    
+    def _change_stream_id(self, change: Dict[str, Any]) -> str:
+        return str(change.get('_id', {}).get('_data', ''))
+    
+    def _send_change_notifications(self, events: list):
+        """Send notifications for significant changes, one per collection and operation"""
+        # Only notify for certain types of changes
+        groups: Dict[tuple, list] = {}
+        for event in events:
+            if event['operation'] in ['insert', 'delete']:
+                groups.setdefault((event['collection'], event['operation']), []).append(event)
+        
+        for (collection_name, operation_type), group in groups.items():
+            try:
+                if len(group) == 1:
+                    title, message = self._create_change_notification_content(
+                        collection_name, operation_type, group[0]['entityId'], group[0]['change']
+                    )
+                else:
+                    title, message = self._create_bulk_notification_content(
+                        collection_name, operation_type, len(group)
+                    )
+                
+                if title and message:
+                    data = {'collection': collection_name, 'operation': operation_type}
+                    if len(group) == 1:
+                        data['entityId'] = group[0]['entityId']
+                    else:
+                        data['count'] = len(group)
+                        data['entityIds'] = [event['entityId'] for event in group[:50]]
+                    
+                    self.notification_hub.send_custom_notification(
+                        title=title,
+                        message=message,
+                        severity='info',
+                        notification_type='database_change',
+                        data=data
+                    )
             
-        except Exception as e:
-            self.logger.error(f"Error sending change notification: {str(e)}")
+            except Exception as e:
+                self.logger.error(f"Error sending change notification: {str(e)}")
+    
+    def _create_bulk_notification_content(self, collection_name: str, operation_type: str,
+                                          count: int) -> tuple[str, str]:
+        """Create one notification for many changes of the same kind"""
+        # Only collections that notify for single changes get a summary
+        sample, _ = self._create_change_notification_content(collection_name, operation_type, '', {})
+        if not sample:
+            return None, None
+        
+        labels = {
+            'students': ('Students', 'student records'),
+            'courses': ('Courses', 'courses'),
+            'fees': ('Fee Records', 'fee records'),
+            'mcp_operations': ('MCP Operations', 'MCP operations')
+        }
+        title, label = labels.get(collection_name, (collection_name.title(), f'{collection_name} records'))
+        
+        if operation_type == 'insert':
+            return f'{count} {title} Added', f'{count} {label} have been added to the system'
+        return f'{count} {title} Removed', f'{count} {label} have been deleted'
     
     def _create_change_notification_content(self, collection_name: str, operation_type: str,
                                           entity_id: str, change_data: Dict[str, Any]) -> tuple[str, str]:
@@ -389,6 +901,22 @@ class ChangeStreamManager:
         
         return sanitized
     
+    def _sanitize_delta(self, delta: list) -> list:
+        """Remove sensitive information from delta operations"""
+        sensitive_fields = ['password', 'token', 'secret', 'key', 'hash']
+        sanitized = []
+        
+        for op in delta:
+            op = dict(op)
+            if any(sensitive in str(part).lower() for part in op['path'] for sensitive in sensitive_fields):
+                if 'new' in op:
+                    op['new'] = '[REDACTED]'
+            elif isinstance(op.get('new'), dict):
+                op['new'] = self._sanitize_document(op['new'])
+            sanitized.append(op)
+        
+        return sanitized
+    
     def _call_event_handlers(self, operation_type: str, event_data: Dict[str, Any]):
         """Call registered event handlers"""
         try:
@@ -426,28 +954,19 @@ class ChangeStreamManager:
             if key in self.stream_configs[collection_name]:
                 self.stream_configs[collection_name][key] = value
         
-        # If running, restart the stream for this collection
-        if self.running and collection_name in self.change_streams:
+        # If running, restart the stream so the filter matches the new settings
+        if self.running:
             self._restart_collection_stream(collection_name)
         
         return self.stream_configs[collection_name]
     
     def _restart_collection_stream(self, collection_name: str):
-        """Restart change stream for a specific collection"""
+        """Reopen the change stream so it picks up a collection's new settings"""
         try:
-            # Stop existing stream
-            if collection_name in self.change_streams:
-                self.change_streams[collection_name].close()
-                del self.change_streams[collection_name]
-            
-            if collection_name in self.stream_threads:
-                # Note: Thread will exit naturally when change stream closes
-                del self.stream_threads[collection_name]
-            
-            # Start new stream if enabled
-            config = self.stream_configs[collection_name]
-            if config['enabled']:
-                self._start_collection_stream(collection_name, config)
+            with self._stream_lock:
+                self._stop_watcher()
+                if self.running:
+                    self._start_watcher()
             
             self.logger.info(f"Restarted change stream for {collection_name}")
             
@@ -458,15 +977,24 @@ class ChangeStreamManager:
         """Get status of all change streams"""
         status = {
             'running': self.running,
-            'active_streams': len(self.change_streams),
+            'active_streams': len(self.watched_collections),
             'configured_collections': len(self.stream_configs),
+            'watcher_alive': bool(self.watcher_thread and self.watcher_thread.is_alive()),
+            'lanes': [lane.qsize() for lane in self.lanes],
+            'processing': self.get_processing_metrics(),
+            'resume': {
+                'catching_up': self.catching_up,
+                'replayed_events': self.replayed_events,
+                'history_lost': self.history_lost,
+                'checkpoint_cluster_time': str(self.tracker.cluster_time) if self.tracker.cluster_time else None
+            },
             'streams': {}
         }
         
         for collection_name, config in self.stream_configs.items():
             status['streams'][collection_name] = {
                 'enabled': config['enabled'],
-                'active': collection_name in self.change_streams,
+                'active': collection_name in self.watched_collections,
                 'operations': config['operations'],
                 'audit_logging': config['audit_logging'],
                 'notifications': config['notifications']
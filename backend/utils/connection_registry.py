@@ -0,0 +1,262 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+_EMPTY = frozenset()
+
+class ConnectionRegistry:
+    """Websocket connections and their subscriptions, safe across threads.
+    
+    Writes hold a lock and replace the affected index entries with new
+    frozensets, so readers (the streaming threads) look up who is subscribed
+    to a room or stream in O(1) without locking and never see a set change
+    while they iterate it.
+    
+    Each connection also has an outbox holding at most one message per stream
+    for clients whose send queue is full; a newer message replaces the held
+    one, so a stalled client costs bounded memory.
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._connections: Dict[str, Dict[str, Any]] = {}  # session_id -> connection info
+        self._rooms: Dict[str, frozenset] = {}             # room -> session_ids
+        self._stream_sessions: Dict[str, frozenset] = {}   # stream -> session_ids in any of its rooms
+        self._stream_rooms: Dict[str, frozenset] = {}      # stream -> room names
+        self._backlogged = _EMPTY                           # sessions with a non-empty outbox
+        self.disconnected_slow = 0
+    
+    @staticmethod
+    def room_name(stream_name: str, room: str) -> str:
+        return f"{stream_name}:{room}"
+    
+    def add(self, session_id: str, user_id: Optional[str] = None):
+        """Register a new connection"""
+        with self._lock:
+            self._connections[session_id] = {
+                'connected_at': datetime.now(),
+                'user_id': user_id,
+                'subscriptions': {},   # room -> stream
+                'acked_versions': {},
+                'last_ping': datetime.now(),
+                'queue_depth': 0,
+                'outbox': {},          # stream -> (event, message, held_at)
+                'sent': 0,
+                'dropped': 0
+            }
+    
+    def remove(self, session_id: str) -> bool:
+        """Drop a connection and all of its subscriptions"""
+        with self._lock:
+            connection = self._connections.pop(session_id, None)
+            if connection is None:
+                return False
+            
+            self._backlogged = self._backlogged - {session_id}
+            
+            for room, stream_name in connection['subscriptions'].items():
+                self._discard(room, stream_name, session_id)
+            
+            for stream_name in set(connection['subscriptions'].values()):
+                self._discard_stream_session(stream_name, session_id)
+            
+            return True
+    
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._connections.get(session_id)
+    
+    def subscribe(self, session_id: str, stream_name: str, room: str) -> str:
+        """Add a session to a stream room and return the room name"""
+        full_room_name = self.room_name(stream_name, room)
+        
+        with self._lock:
+            connection = self._connections.get(session_id)
+            if connection is not None:
+                connection['subscriptions'][full_room_name] = stream_name
+            
+            self._rooms[full_room_name] = self._rooms.get(full_room_name, _EMPTY) | {session_id}
+            self._stream_rooms[stream_name] = self._stream_rooms.get(stream_name, _EMPTY) | {full_room_name}
+            self._stream_sessions[stream_name] = self._stream_sessions.get(stream_name, _EMPTY) | {session_id}
+        
+        return full_room_name
+    
+    def unsubscribe(self, session_id: str, stream_name: str, room: str) -> bool:
+        """Remove a session from a stream room.
+        
+        Returns True while the session is still in another room of the stream.
+        """
+        full_room_name = self.room_name(stream_name, room)
+        
+        with self._lock:
+            connection = self._connections.get(session_id)
+            if connection is not None:
+                connection['subscriptions'].pop(full_room_name, None)
+            
+            self._discard(full_room_name, stream_name, session_id)
+            
+            still_subscribed = bool(connection) and stream_name in connection['subscriptions'].values()
+            if not still_subscribed:
+                self._discard_stream_session(stream_name, session_id)
+            
+            return still_subscribed
+    
+    def _discard(self, room: str, stream_name: str, session_id: str):
+        """Remove a session from a room index; caller holds the lock"""
+        members = self._rooms.get(room, _EMPTY) - {session_id}
+        if members:
+            self._rooms[room] = members
+            return
+        
+        self._rooms.pop(room, None)
+        rooms = self._stream_rooms.get(stream_name, _EMPTY) - {room}
+        if rooms:
+            self._stream_rooms[stream_name] = rooms
+        else:
+            self._stream_rooms.pop(stream_name, None)
+    
+    def _discard_stream_session(self, stream_name: str, session_id: str):
+        sessions = self._stream_sessions.get(stream_name, _EMPTY) - {session_id}
+        if sessions:
+            self._stream_sessions[stream_name] = sessions
+        else:
+            self._stream_sessions.pop(stream_name, None)
+    
+    def rooms_for_stream(self, stream_name: str) -> frozenset:
+        """Rooms with at least one subscriber for a stream"""
+        return self._stream_rooms.get(stream_name, _EMPTY)
+    
+    def sessions_for_stream(self, stream_name: str) -> frozenset:
+        """Sessions subscribed to any room of a stream"""
+        return self._stream_sessions.get(stream_name, _EMPTY)
+    
+    def sessions_in_room(self, room: str) -> frozenset:
+        return self._rooms.get(room, _EMPTY)
+    
+    def has_subscribers(self, stream_name: str) -> bool:
+        return stream_name in self._stream_sessions
+    
+    def touch(self, session_id: str):
+        """Record a client ping"""
+        connection = self._connections.get(session_id)
+        if connection is not None:
+            connection['last_ping'] = datetime.now()
+    
+    def ack(self, session_id: str, stream_name: str, version):
+        """Record the snapshot version a client has applied"""
+        connection = self._connections.get(session_id)
+        if connection is not None:
+            connection['acked_versions'][stream_name] = version
+    
+    def acked_version(self, session_id: str, stream_name: str):
+        connection = self._connections.get(session_id)
+        return connection['acked_versions'].get(stream_name) if connection else None
+    
+    def set_queue_depth(self, session_id: str, depth: int):
+        """Record how many packets are waiting to be sent to a client"""
+        connection = self._connections.get(session_id)
+        if connection is not None:
+            connection['queue_depth'] = depth
+    
+    def record_sent(self, session_ids, count: int = 1):
+        """Count messages handed to the transport for these sessions"""
+        for session_id in session_ids:
+            connection = self._connections.get(session_id)
+            if connection is not None:
+                connection['sent'] += count
+    
+    def hold(self, session_id: str, stream_name: str, event: str, message: Any):
+        """Keep only the latest message for a stream while a client is congested"""
+        with self._lock:
+            connection = self._connections.get(session_id)
+            if connection is None:
+                return
+            
+            held = connection['outbox'].get(stream_name)
+            if held:
+                # The held message is superseded and never sent
+                connection['dropped'] += 1
+            
+            held_at = held[2] if held else time.monotonic()
+            connection['outbox'][stream_name] = (event, message, held_at)
+            self._backlogged = self._backlogged | {session_id}
+    
+    def has_held(self, session_id: str, stream_name: str) -> bool:
+        connection = self._connections.get(session_id)
+        return bool(connection) and stream_name in connection['outbox']
+    
+    def backlogged_sessions(self) -> frozenset:
+        return self._backlogged
+    
+    def take_outbox(self, session_id: str) -> Dict[str, tuple]:
+        """Remove and return a client's held messages"""
+        with self._lock:
+            self._backlogged = self._backlogged - {session_id}
+            connection = self._connections.get(session_id)
+            if connection is None:
+                return {}
+            outbox, connection['outbox'] = connection['outbox'], {}
+            return outbox
+    
+    def record_slow_disconnect(self):
+        with self._lock:
+            self.disconnected_slow += 1
+    
+    def client_metrics(self, current_versions: Dict[str, int], limit: int = 50) -> list:
+        """Per-client send queue, lag and drop figures, most lagged first"""
+        now = time.monotonic()
+        clients = []
+        
+        with self._lock:
+            for session_id, connection in self._connections.items():
+                held_since = [held[2] for held in connection['outbox'].values()]
+                version_lag = {
+                    stream_name: current_versions[stream_name] - version
+                    for stream_name, version in connection['acked_versions'].items()
+                    if stream_name in current_versions and isinstance(version, int)
+                }
+                clients.append({
+                    'session_id': session_id,
+                    'user_id': connection['user_id'],
+                    'queue_depth': connection['queue_depth'],
+                    'held_streams': list(connection['outbox']),
+                    'lag_seconds': round(now - min(held_since), 2) if held_since else 0,
+                    'version_lag': version_lag,
+                    'sent': connection['sent'],
+                    'dropped': connection['dropped']
+                })
+        
+        clients.sort(key=lambda client: (client['lag_seconds'], client['queue_depth'], client['dropped']), reverse=True)
+        return clients[:limit]
+    
+    def session_ids(self) -> list:
+        with self._lock:
+            return list(self._connections)
+    
+    def stale_sessions(self, max_idle_seconds: float) -> list:
+        """Sessions that have not pinged within max_idle_seconds"""
+        now = datetime.now()
+        with self._lock:
+            return [
+                session_id for session_id, connection in self._connections.items()
+                if (now - connection['last_ping']).total_seconds() > max_idle_seconds
+            ]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Connection, room and send-queue counts"""
+        with self._lock:
+            depths = [connection['queue_depth'] for connection in self._connections.values()]
+            return {
+                'backlogged': len(self._backlogged),
+                'dropped': sum(connection['dropped'] for connection in self._connections.values()),
+                'disconnected_slow': self.disconnected_slow,
+                'connections': len(self._connections),
+                'rooms': len(self._rooms),
+                'subscribers_by_stream': {
+                    stream_name: len(sessions) for stream_name, sessions in self._stream_sessions.items()
+                },
+                'queue_depth': {
+                    'total': sum(depths),
+                    'max': max(depths, default=0)
+                }
+            }
@@ -2,6 +2,8 @@ from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure
 import os
 from config import Config
+from utils.indexes import apply_index_registry
+from utils.timeseries import ensure_timeseries_collections
 
 # Global database connection
 db = None
@@ -31,40 +33,27 @@ def get_db():
         init_db()
     return db
 
+def get_client():
+    """Get the MongoClient, e.g. for sessions and transactions"""
+    if client is None:
+        init_db()
+    return client
+
 def create_indexes():
     """Create database indexes for better performance"""
     db = get_db()
     
-    # User indexes (keeping existing for compatibility)
-    try:
-        db.users.create_index("username", unique=True)
-        db.users.create_index("email", unique=True)
-        db.users.create_index("profile.rollNumber", unique=True, sparse=True)
-    except:
-        pass
-    
-    # New schema indexes
-    
-    # Attendance indexes - roll_no should be unique
-    db.attendance.create_index("roll_no", unique=True)
-    db.attendance.create_index("name")
-    
-    # Leave indexes
-    db.leave.create_index("roll_no")
-    db.leave.create_index("status")
-    db.leave.create_index("date_of_leave")
-    
-    # Course indexes - course_name should be unique
-    db.courses.create_index("course_name", unique=True)
-    db.courses.create_index("handling_faculty")
+    # Time-series collections must exist before their indexes are built
+    timeseries = ensure_timeseries_collections(db)
+    for name, copied in timeseries['migrated'].items():
+        print(f"✅ Migrated {copied} {name} documents to time-series storage")
+    for skipped in timeseries['skipped']:
+        print(f"⚠️  Kept {skipped['collection']} as a regular collection: {skipped['reason']}")
     
-    # Timetable indexes
-    db.timetable.create_index([("day", 1), ("period", 1)])
-    db.timetable.create_index("course_name")
+    # Indexes are declared per collection in utils/indexes.py
+    results = apply_index_registry(db)
     
-    # Notification indexes
-    db.notification.create_index("priority")
-    db.notification.create_index("author")
-    db.notification.create_index("due_date")
+    for failure in results['failed']:
+        print(f"⚠️  Skipped index {failure['index']}: {failure['error']}")
     
     print("✅ Database indexes created successfully!")
@@ -0,0 +1,189 @@
+import copy
+
+# Field-level deltas between two versions of a document.
+#
+# A delta is a list of operations, each with a 'path' (list of keys):
+#   {'op': 'add',   'path': [...], 'new': value}
+#   {'op': 'set',   'path': [...], 'old': value, 'new': value}
+#   {'op': 'unset', 'path': [...], 'old': value}
+# Nested dicts are diffed recursively; lists and scalars are replaced whole.
+# Like audit_hash, this module has no database imports.
+
+_MISSING = object()
+
+def diff(before, after, path=None):
+    """Compute the delta that turns before into after"""
+    path = path or []
+    ops = []
+    
+    for key, old_value in before.items():
+        if key not in after:
+            ops.append({'op': 'unset', 'path': path + [key], 'old': old_value})
+    
+    for key, new_value in after.items():
+        if key not in before:
+            ops.append({'op': 'add', 'path': path + [key], 'new': new_value})
+            continue
+        
+        old_value = before[key]
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            ops.extend(diff(old_value, new_value, path + [key]))
+        elif old_value != new_value or type(old_value) is not type(new_value):
+            ops.append({'op': 'set', 'path': path + [key], 'old': old_value, 'new': new_value})
+    
+    return ops
+
+def _get(state, path):
+    """Value at a path, or _MISSING"""
+    current = state
+    for key in path:
+        if isinstance(current, dict) and key in current:
+            current = current[key]
+        elif isinstance(current, list) and str(key).isdigit() and int(key) < len(current):
+            current = current[int(key)]
+        else:
+            return _MISSING
+    return current
+
+def _parent(state, path, create=False):
+    """Container holding the last key of a path"""
+    current = state
+    for key in path[:-1]:
+        if isinstance(current, list) and str(key).isdigit():
+            current = current[int(key)]
+            continue
+        if key not in current and create:
+            current[key] = {}
+        current = current[key]
+    return current
+
+def _assign(state, path, value):
+    parent = _parent(state, path, create=True)
+    key = path[-1]
+    if isinstance(parent, list) and str(key).isdigit():
+        index = int(key)
+        if index < len(parent):
+            parent[index] = value
+        else:
+            parent.append(value)
+    else:
+        parent[key] = value
+
+def _remove(state, path):
+    parent = _parent(state, path)
+    key = path[-1]
+    if isinstance(parent, list) and str(key).isdigit():
+        del parent[int(key)]
+    else:
+        parent.pop(key, None)
+
+def apply(state, delta):
+    """Replay a delta forwards, returning the new state"""
+    state = copy.deepcopy(state) if state is not None else {}
+    
+    for op in delta:
+        if op['op'] == 'unset':
+            _remove(state, op['path'])
+        else:
+            _assign(state, op['path'], copy.deepcopy(op['new']))
+    
+    return state
+
+def revert(state, delta):
+    """Replay a delta backwards, returning the previous state"""
+    state = copy.deepcopy(state) if state is not None else {}
+    
+    for op in reversed(delta):
+        if op['op'] == 'add':
+            _remove(state, op['path'])
+        else:
+            _assign(state, op['path'], copy.deepcopy(op['old']))
+    
+    return state
+
+def conflicts(state, delta):
+    """Operations whose recorded old value does not match the given state"""
+    mismatched = []
+    
+    for op in delta:
+        current = _get(state or {}, op['path'])
+        
+        if op['op'] == 'add':
+            if current is not _MISSING:
+                mismatched.append(op)
+        elif current is _MISSING or current != op['old']:
+            mismatched.append(op)
+    
+    return mismatched
+
+def from_update_description(update_description):
+    """Forward-only delta from a change stream updateDescription.
+    
+    Old values are unknown here; fill_old_values adds them from the
+    previous version. Returns None when arrays were truncated, since the
+    description alone then cannot be replayed.
+    """
+    if update_description.get('truncatedArrays'):
+        return None
+    
+    ops = []
+    
+    for field in update_description.get('removedFields', []):
+        ops.append({'op': 'unset', 'path': field.split('.')})
+    
+    for field, value in update_description.get('updatedFields', {}).items():
+        ops.append({'op': 'set', 'path': field.split('.'), 'new': value})
+    
+    return ops
+
+def fill_old_values(state, delta):
+    """Record the previous value for each operation of a forward-only delta"""
+    filled = []
+    
+    for op in delta:
+        current = _get(state or {}, op['path'])
+        
+        if op['op'] == 'unset':
+            if current is not _MISSING:
+                filled.append({'op': 'unset', 'path': op['path'], 'old': current})
+        elif current is _MISSING:
+            filled.append({'op': 'add', 'path': op['path'], 'new': op['new']})
+        elif current != op['new']:
+            filled.append({'op': 'set', 'path': op['path'], 'old': current, 'new': op['new']})
+    
+    return filled
+
+def _pointer(path):
+    """JSON pointer for a path, escaping '~' and '/'"""
+    return ''.join('/' + str(key).replace('~', '~0').replace('/', '~1') for key in path)
+
+def json_patch(before, after, path=None):
+    """JSON-patch (RFC 6902) style operations that turn before into after.
+    
+    Unlike diff, lists of equal length are compared element by element so a
+    single changed row does not resend the whole list.
+    """
+    path = path or []
+    
+    if isinstance(before, dict) and isinstance(after, dict):
+        ops = []
+        for key in before:
+            if key not in after:
+                ops.append({'op': 'remove', 'path': _pointer(path + [key])})
+        for key, value in after.items():
+            if key not in before:
+                ops.append({'op': 'add', 'path': _pointer(path + [key]), 'value': value})
+            else:
+                ops.extend(json_patch(before[key], value, path + [key]))
+        return ops
+    
+    if isinstance(before, list) and isinstance(after, list) and len(before) == len(after):
+        ops = []
+        for index, (old_item, new_item) in enumerate(zip(before, after)):
+            ops.extend(json_patch(old_item, new_item, path + [index]))
+        return ops
+    
+    if before != after or type(before) is not type(after):
+        return [{'op': 'replace', 'path': _pointer(path), 'value': after}]
+    
+    return []
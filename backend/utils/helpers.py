@@ -1,4 +1,4 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 import re
 
@@ -66,6 +66,20 @@ def format_datetime(dt):
         return dt.isoformat()
     return None
 
+def to_naive_utc(dt):
+    """Convert an aware datetime to naive UTC, the form PyMongo returns stored dates in.
+    
+    >>> to_naive_utc(datetime.fromisoformat('2024-01-01T05:30:00Z'.replace('Z', '+00:00')))
+    datetime.datetime(2024, 1, 1, 5, 30)
+    >>> to_naive_utc(datetime.fromisoformat('2024-01-01T11:00:00+05:30'))
+    datetime.datetime(2024, 1, 1, 5, 30)
+    >>> to_naive_utc(datetime(2024, 1, 1, 5, 30))
+    datetime.datetime(2024, 1, 1, 5, 30)
+    """
+    if dt is not None and dt.tzinfo is not None:
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
 def serialize_mongo_doc(doc):
     """Convert MongoDB document to JSON serializable format"""
     if doc is None:
@@ -0,0 +1,299 @@
+"""Declarative index registry and query-shape index advisor.
+
+Run from the backend directory:
+    python -m utils.indexes apply     # create any missing indexes
+    python -m utils.indexes advise    # explain() known query shapes
+"""
+import argparse
+import json
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+# collection -> list of index specs. Each spec has 'keys' plus any
+# create_index options (unique, sparse, ...). Applying is idempotent.
+INDEX_REGISTRY = {
+    # Users (keeping existing for compatibility)
+    'users': [
+        {'keys': [('username', ASCENDING)], 'unique': True},
+        {'keys': [('email', ASCENDING)], 'unique': True},
+        {'keys': [('profile.rollNumber', ASCENDING)], 'unique': True, 'sparse': True},
+    ],
+    
+    # Attendance - roll_no should be unique
+    'attendance': [
+        {'keys': [('roll_no', ASCENDING)], 'unique': True},
+        {'keys': [('name', ASCENDING)]},
+    ],
+    
+    'leave': [
+        {'keys': [('roll_no', ASCENDING)]},
+        {'keys': [('status', ASCENDING)]},
+        {'keys': [('date_of_leave', ASCENDING)]},
+    ],
+    
+    # Courses - course_name should be unique
+    'courses': [
+        {'keys': [('course_name', ASCENDING)], 'unique': True},
+        {'keys': [('handling_faculty', ASCENDING)]},
+    ],
+    
+    'timetable': [
+        {'keys': [('day', ASCENDING), ('period', ASCENDING)]},
+        {'keys': [('course_name', ASCENDING)]},
+    ],
+    
+    'notification': [
+        {'keys': [('priority', ASCENDING)]},
+        {'keys': [('author', ASCENDING)]},
+        {'keys': [('due_date', ASCENDING)]},
+    ],
+    
+    # Monitoring plane
+    'audit_trail': [
+        {'keys': [('timestamp', DESCENDING)]},
+        {'keys': [('collectionName', ASCENDING), ('entityId', ASCENDING), ('timestamp', ASCENDING), ('chainSeq', ASCENDING)]},
+        {'keys': [('collectionName', ASCENDING), ('entityId', ASCENDING), ('entityVersion', DESCENDING)], 'sparse': True},
+        {'keys': [('collectionName', ASCENDING), ('operationType', ASCENDING), ('timestamp', DESCENDING)]},
+        {'keys': [('operationType', ASCENDING), ('timestamp', DESCENDING)]},
+        {'keys': [('userId', ASCENDING), ('timestamp', DESCENDING)]},
+        {'keys': [('chainSeq', ASCENDING)], 'unique': True, 'sparse': True},
+        # Indexed search: one (field, timestamp) index per searchable field
+        {'keys': [('collectionName', ASCENDING), ('timestamp', DESCENDING)]},
+        {'keys': [('entityId', ASCENDING), ('timestamp', DESCENDING)]},
+        {'keys': [('mcpCommand', ASCENDING), ('timestamp', DESCENDING)]},
+        {'keys': [('searchTokens', ASCENDING), ('timestamp', DESCENDING)]},
+        # Duplicate check for change events replayed after a restart
+        {'keys': [('metadata.changeStreamId', ASCENDING)], 'sparse': True},
+    ],
+    
+    'audit_rollups': [
+        {'keys': [('hour', ASCENDING), ('collectionName', ASCENDING),
+                  ('operationType', ASCENDING), ('userId', ASCENDING)], 'unique': True},
+    ],
+    
+    'audit_checkpoints': [
+        {'keys': [('chainSeq', ASCENDING)]},
+    ],
+    
+    'mcp_operations': [
+        {'keys': [('timestamp', DESCENDING)]},
+        {'keys': [('status', ASCENDING), ('timestamp', DESCENDING)]},
+        {'keys': [('operationType', ASCENDING), ('timestamp', DESCENDING)]},
+    ],
+    
+    'system_health': [
+        {'keys': [('timestamp', DESCENDING)]},
+        {'keys': [('component', ASCENDING), ('timestamp', DESCENDING)]},
+    ],
+    
+    'rate_limit_logs': [
+        {'keys': [('timestamp', DESCENDING)]},
+        {'keys': [('ruleName', ASCENDING), ('timestamp', DESCENDING)]},
+        {'keys': [('clientId', ASCENDING), ('timestamp', DESCENDING)]},
+    ],
+    
+    'notifications': [
+        {'keys': [('userId', ASCENDING), ('createdAt', DESCENDING)]},
+        {'keys': [('createdAt', DESCENDING)]},
+    ],
+}
+
+def _query_shapes():
+    """Representative query shapes issued by the app, for explain()"""
+    now = datetime.now()
+    day_ago = now - timedelta(hours=24)
+    
+    return [
+        {'source': 'AuditTrail.get_changes', 'collection': 'audit_trail',
+         'filter': {'collectionName': 'students', 'operationType': 'update',
+                    'timestamp': {'$gte': day_ago, '$lte': now}},
+         'sort': [('timestamp', DESCENDING)]},
+        {'source': 'AuditTrail.get_entity_history', 'collection': 'audit_trail',
+         'filter': {'collectionName': 'students', 'entityId': 'x'},
+         'sort': [('timestamp', ASCENDING), ('chainSeq', ASCENDING)]},
+        {'source': 'AuditTrail.reconstruct', 'collection': 'audit_trail',
+         'filter': {'collectionName': 'students', 'entityId': 'x', 'storage': 'delta',
+                    'entityVersion': {'$gt': 0, '$lte': 20}},
+         'sort': [('entityVersion', ASCENDING)]},
+        {'source': 'AuditService._check_rollback_safety', 'collection': 'audit_trail',
+         'filter': {'collectionName': 'students', 'entityId': 'x', 'timestamp': {'$gt': day_ago}}},
+        {'source': 'AuditTrail.get_rollback_candidates', 'collection': 'audit_trail',
+         'filter': {'timestamp': {'$gte': day_ago}, 'operationType': {'$in': ['create', 'update']},
+                    'rolledBack': {'$ne': True}},
+         'sort': [('timestamp', DESCENDING)]},
+        {'source': 'AuditTrail.search_changes', 'collection': 'audit_trail',
+         'filter': {'$or': [{name: {'$regex': '^stud'}} for name in
+                            ('collectionName', 'entityId', 'mcpCommand', 'userId')] +
+                           [{'searchTokens': {'$all': ['stud']}}],
+                    'timestamp': {'$gte': now - timedelta(days=7)}},
+         'sort': [('timestamp', DESCENDING)]},
+        {'source': 'AuditTrail.get_recent_changes', 'collection': 'audit_trail',
+         'filter': {'timestamp': {'$gte': day_ago}},
+         'sort': [('timestamp', DESCENDING)]},
+        {'source': 'AuditService.verify_chain', 'collection': 'audit_trail',
+         'filter': {'chainSeq': {'$gt': 0}},
+         'sort': [('chainSeq', ASCENDING)]},
+        {'source': 'AuditRollup.get_window_counts', 'collection': 'audit_rollups',
+         'filter': {'hour': {'$gte': day_ago, '$lte': now}}},
+        {'source': 'AuditRollup.get_window_counts (partial hour)', 'collection': 'audit_trail',
+         'filter': {'timestamp': {'$gte': now - timedelta(minutes=30), '$lt': now}}},
+        {'source': 'MCPOperation.get_operations', 'collection': 'mcp_operations',
+         'filter': {'status': 'failed', 'timestamp': {'$gte': day_ago, '$lte': now}},
+         'sort': [('timestamp', DESCENDING)]},
+        {'source': 'MCPOperation.timeout_stuck_operations', 'collection': 'mcp_operations',
+         'filter': {'status': 'running', 'timestamp': {'$lt': now - timedelta(minutes=10)}}},
+        {'source': 'OperationCounter._ensure_seeded', 'collection': 'mcp_operations',
+         'filter': {'timestamp': {'$gte': now - timedelta(hours=1)}}},
+        {'source': 'MCPOperation.get_live_operations', 'collection': 'mcp_operations',
+         'filter': {}, 'sort': [('timestamp', DESCENDING)]},
+        {'source': 'AnalyticsEngine.detect_anomalies', 'collection': 'mcp_operations',
+         'pipeline': [
+             {'$match': {'timestamp': {'$gte': day_ago}}},
+             {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+         ]},
+        {'source': 'NotificationHub._check_system_resources', 'collection': 'system_health',
+         'filter': {'component': 'system'}, 'sort': [('timestamp', DESCENDING)]},
+        {'source': 'AnalyticsEngine._detect_resource_anomalies', 'collection': 'system_health',
+         'filter': {'component': 'system', 'timestamp': {'$gte': day_ago}}},
+        {'source': 'RateLimiter.get_system_stats', 'collection': 'rate_limit_logs',
+         'pipeline': [
+             {'$match': {'timestamp': {'$gte': now - timedelta(hours=1)}}},
+             {'$group': {'_id': '$ruleName', 'count': {'$sum': 1}}}
+         ]},
+        {'source': 'NotificationHub.get_recent_notifications', 'collection': 'notifications',
+         'filter': {'userId': 'system', 'createdAt': {'$gte': day_ago}},
+         'sort': [('createdAt', DESCENDING)]},
+    ]
+
+def _index_name(keys):
+    """Default MongoDB index name for a key list"""
+    return '_'.join(f'{field}_{direction}' for field, direction in keys)
+
+def apply_index_registry(db, registry=None, logger=None):
+    """Create every registered index. Safe to run repeatedly."""
+    registry = registry or INDEX_REGISTRY
+    results = {'created': [], 'failed': []}
+    
+    for collection_name, specs in registry.items():
+        collection = db[collection_name]
+        
+        for spec in specs:
+            options = {key: value for key, value in spec.items() if key != 'keys'}
+            options.setdefault('name', _index_name(spec['keys']))
+            
+            try:
+                collection.create_index(spec['keys'], **options)
+                results['created'].append(f"{collection_name}.{options['name']}")
+            except OperationFailure as e:
+                # Conflicting options or duplicate data; leave the collection usable
+                results['failed'].append({
+                    'index': f"{collection_name}.{options['name']}",
+                    'error': str(e)
+                })
+                if logger:
+                    logger.warning(f"Could not create index {collection_name}.{options['name']}: {str(e)}")
+    
+    return results
+
+def _plan_stages(plan):
+    """Collect stage names from an explain() plan tree"""
+    stages = []
+    
+    if not isinstance(plan, dict):
+        return stages
+    
+    if 'stage' in plan:
+        stages.append(plan['stage'])
+    
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    
+    for child in plan.get('inputStages', []):
+        stages.extend(_plan_stages(child))
+    
+    return stages
+
+def _winning_plan(explain_result):
+    """Find the winning plan in find() or aggregate() explain output"""
+    if 'queryPlanner' in explain_result:
+        return explain_result['queryPlanner'].get('winningPlan', {})
+    
+    for stage in explain_result.get('stages', []):
+        if '$cursor' in stage:
+            return stage['$cursor'].get('queryPlanner', {}).get('winningPlan', {})
+    
+    return {}
+
+def advise(db, shapes=None):
+    """Explain the app's query shapes and flag collection scans and in-memory sorts"""
+    report = []
+    
+    for shape in shapes or _query_shapes():
+        collection = db[shape['collection']]
+        
+        try:
+            if 'pipeline' in shape:
+                explain_result = db.command(
+                    'aggregate', shape['collection'],
+                    pipeline=shape['pipeline'], explain=True
+                )
+            else:
+                cursor = collection.find(shape['filter'])
+                if shape.get('sort'):
+                    cursor = cursor.sort(shape['sort'])
+                explain_result = cursor.limit(100).explain()
+            
+            stages = _plan_stages(_winning_plan(explain_result))
+            
+            report.append({
+                'source': shape['source'],
+                'collection': shape['collection'],
+                'stages': stages,
+                'collectionScan': 'COLLSCAN' in stages,
+                'inMemorySort': 'SORT' in stages
+            })
+        
+        except Exception as e:
+            report.append({
+                'source': shape['source'],
+                'collection': shape['collection'],
+                'error': str(e)
+            })
+    
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage MongoDB indexes for the ERP backend')
+    parser.add_argument('command', choices=['apply', 'advise'])
+    args = parser.parse_args()
+    
+    from utils.database import get_db
+    db = get_db()
+    
+    if args.command == 'apply':
+        results = apply_index_registry(db)
+        print(f"✅ Applied {len(results['created'])} indexes")
+        for failure in results['failed']:
+            print(f"❌ {failure['index']}: {failure['error']}")
+        return
+    
+    report = advise(db)
+    for entry in report:
+        if 'error' in entry:
+            print(f"❌ {entry['source']} ({entry['collection']}): {entry['error']}")
+        elif entry['collectionScan'] or entry['inMemorySort']:
+            problems = [name for flag, name in ((entry['collectionScan'], 'COLLSCAN'),
+                                                (entry['inMemorySort'], 'in-memory SORT')) if flag]
+            print(f"⚠️  {entry['source']} ({entry['collection']}): {', '.join(problems)}")
+        else:
+            print(f"✅ {entry['source']} ({entry['collection']}): {' <- '.join(entry['stages'])}")
+    
+    print(json.dumps({
+        'shapes': len(report),
+        'collectionScans': sum(1 for entry in report if entry.get('collectionScan'))
+    }))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+import atexit
+import heapq
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+from config import Config
+
+class JobScheduler:
+    """Runs periodic background jobs on a bounded worker pool.
+    
+    One dispatcher thread keeps a heap of due times and hands due jobs to a
+    fixed-size pool. A job never overlaps itself: if it is still running when
+    it falls due again, that run is skipped and counted. Each run is spread by
+    a random jitter so jobs with the same interval do not fire together.
+    """
+    
+    def __init__(self, max_workers: int = None, jitter: float = None):
+        self.max_workers = max_workers or Config.SCHEDULER_WORKERS
+        self.jitter = Config.SCHEDULER_JITTER if jitter is None else jitter
+        
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._heap: list = []
+        self._condition = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self.running = False
+        
+        # Setup logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+    
+    def start(self):
+        """Start the dispatcher and worker pool"""
+        with self._condition:
+            if self.running:
+                return
+            
+            self.running = True
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+            self._dispatcher.start()
+        
+        atexit.register(self.shutdown)
+        self.logger.info(f"Job scheduler started with {self.max_workers} workers")
+    
+    def shutdown(self, wait: bool = True):
+        """Stop dispatching and let running jobs finish"""
+        with self._condition:
+            if not self.running:
+                return
+            self.running = False
+            self._condition.notify_all()
+        
+        if self._dispatcher and self._dispatcher is not threading.current_thread():
+            self._dispatcher.join(timeout=5)
+        
+        if self._executor:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+        
+        self.logger.info("Job scheduler stopped")
+    
+    def add_job(self, name: str, func: Callable[[], Any], interval: float,
+                initial_delay: float = None, error_backoff: float = None):
+        """Run func every interval seconds; after a failure wait error_backoff instead"""
+        with self._condition:
+            self.jobs[name] = {
+                'func': func,
+                'interval': interval,
+                'error_backoff': error_backoff or interval * 2,
+                'generation': self.jobs.get(name, {}).get('generation', 0) + 1,
+                'running': False,
+                'runs': 0,
+                'failures': 0,
+                'overruns': 0,
+                'skipped': 0,
+                'total_seconds': 0.0,
+                'max_seconds': 0.0,
+                'last_seconds': None,
+                'last_run_at': None,
+                'last_error': None,
+                'next_run': None
+            }
+            self._schedule(name, self._jittered(interval if initial_delay is None else initial_delay))
+        
+        self.start()
+    
+    def remove_job(self, name: str):
+        """Stop scheduling a job; a run in progress finishes"""
+        with self._condition:
+            self.jobs.pop(name, None)
+    
+    def reschedule(self, name: str, interval: float):
+        """Change a job's interval from its next run on"""
+        with self._condition:
+            job = self.jobs.get(name)
+            if job is None:
+                return False
+            job['interval'] = interval
+            job['error_backoff'] = interval * 2
+            self._schedule(name, self._jittered(interval))
+            return True
+    
+    def _jittered(self, delay: float) -> float:
+        if not self.jitter:
+            return delay
+        return max(0.0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+    
+    def _schedule(self, name: str, delay: float):
+        """Queue the job's next run; caller holds the condition"""
+        job = self.jobs[name]
+        job['generation'] += 1
+        job['next_run'] = time.monotonic() + delay
+        heapq.heappush(self._heap, (job['next_run'], job['generation'], name))
+        self._condition.notify()
+    
+    def _dispatch(self):
+        """Hand due jobs to the worker pool"""
+        with self._condition:
+            while self.running:
+                now = time.monotonic()
+                
+                if not self._heap:
+                    self._condition.wait(timeout=1)
+                    continue
+                
+                due_at, generation, name = self._heap[0]
+                if due_at > now:
+                    self._condition.wait(timeout=due_at - now)
+                    continue
+                
+                heapq.heappop(self._heap)
+                job = self.jobs.get(name)
+                
+                # Removed or rescheduled since this entry was queued
+                if job is None or job['generation'] != generation:
+                    continue
+                
+                if job['running']:
+                    job['skipped'] += 1
+                    self._schedule(name, self._jittered(job['interval']))
+                    continue
+                
+                job['running'] = True
+                try:
+                    self._executor.submit(self._run, name, job, generation)
+                except RuntimeError:
+                    # Pool already shut down
+                    job['running'] = False
+                    return
+    
+    def _run(self, name: str, job: Dict[str, Any], generation: int):
+        """Run one job and schedule its next run"""
+        started = time.monotonic()
+        failed = False
+        
+        try:
+            job['func']()
+        except Exception as e:
+            failed = True
+            job['failures'] += 1
+            job['last_error'] = str(e)
+            self.logger.error(f"Error in scheduled job {name}: {str(e)}")
+        
+        duration = time.monotonic() - started
+        
+        with self._condition:
+            job['running'] = False
+            job['runs'] += 1
+            job['last_seconds'] = duration
+            job['total_seconds'] += duration
+            job['max_seconds'] = max(job['max_seconds'], duration)
+            job['last_run_at'] = time.time()
+            if duration > job['interval']:
+                job['overruns'] += 1
+            
+            # Next run counts from when this one started, so the rate holds
+            if self.running and self.jobs.get(name) is job:
+                delay = job['error_backoff'] if failed else job['interval']
+                self._schedule(name, max(0.0, self._jittered(delay) - duration))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-job run counts, durations and overruns, busiest first"""
+        now = time.monotonic()
+        
+        with self._condition:
+            jobs = {
+                name: {
+                    'interval_seconds': job['interval'],
+                    'running': job['running'],
+                    'runs': job['runs'],
+                    'failures': job['failures'],
+                    'overruns': job['overruns'],
+                    'skipped': job['skipped'],
+                    'avg_ms': round(job['total_seconds'] / job['runs'] * 1000, 2) if job['runs'] else None,
+                    'max_ms': round(job['max_seconds'] * 1000, 2),
+                    'last_ms': round(job['last_seconds'] * 1000, 2) if job['last_seconds'] is not None else None,
+                    'total_seconds': round(job['total_seconds'], 3),
+                    'last_error': job['last_error'],
+                    'next_run_in': round(job['next_run'] - now, 2) if job['next_run'] else None
+                }
+                for name, job in self.jobs.items()
+            }
+        
+        return {
+            'running': self.running,
+            'workers': self.max_workers,
+            'jitter': self.jitter,
+            'jobs': dict(sorted(jobs.items(), key=lambda item: item[1]['total_seconds'], reverse=True))
+        }
+
+# Global job scheduler instance
+job_scheduler = None
+_job_scheduler_lock = threading.Lock()
+
+def get_job_scheduler():
+    """Get the global job scheduler instance"""
+    global job_scheduler
+    with _job_scheduler_lock:
+        if job_scheduler is None:
+            job_scheduler = JobScheduler()
+    return job_scheduler
@@ -0,0 +1,104 @@
+import math
+import threading
+from typing import Dict, Any
+
+class LatencyHistogram:
+    """HDR-style latency histogram with bounded relative error.
+    
+    Values are stored in microseconds. Each power-of-two range is split into
+    2**precision_bits linear sub-buckets, so a reported percentile is within
+    1 / 2**precision_bits of the true value (under 1% by default) while the
+    number of buckets stays logarithmic in the value range.
+    """
+    
+    def __init__(self, precision_bits: int = 7, max_ms: float = 60000):
+        self.precision_bits = precision_bits
+        self.max_us = int(max_ms * 1000)
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        """Discard all recorded values"""
+        with self._lock:
+            self.counts: Dict[int, int] = {}
+            self.count = 0
+            self.total_us = 0
+            self.min_us = None
+            self.max_us_seen = 0
+    
+    def _bucket(self, value_us: int) -> int:
+        """Lowest value sharing a bucket with value_us"""
+        shift = value_us.bit_length() - self.precision_bits
+        if shift <= 0:
+            return value_us
+        return (value_us >> shift) << shift
+    
+    def _highest_equivalent(self, bucket: int) -> int:
+        """Highest value that falls in the bucket starting at bucket"""
+        shift = bucket.bit_length() - self.precision_bits
+        if shift <= 0:
+            return bucket
+        return bucket + (1 << shift) - 1
+    
+    def record(self, value_ms: float):
+        """Record one latency in milliseconds"""
+        value_us = min(max(int(value_ms * 1000), 0), self.max_us)
+        bucket = self._bucket(value_us)
+        
+        with self._lock:
+            self.counts[bucket] = self.counts.get(bucket, 0) + 1
+            self.count += 1
+            self.total_us += value_us
+            self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+            self.max_us_seen = max(self.max_us_seen, value_us)
+    
+    def merge(self, other: 'LatencyHistogram'):
+        """Add another histogram's values to this one"""
+        with other._lock:
+            counts = dict(other.counts)
+            count, total_us = other.count, other.total_us
+            min_us, max_us_seen = other.min_us, other.max_us_seen
+        
+        with self._lock:
+            for bucket, bucket_count in counts.items():
+                self.counts[bucket] = self.counts.get(bucket, 0) + bucket_count
+            self.count += count
+            self.total_us += total_us
+            if min_us is not None:
+                self.min_us = min_us if self.min_us is None else min(self.min_us, min_us)
+            self.max_us_seen = max(self.max_us_seen, max_us_seen)
+    
+    def _percentile_us(self, percentile: float, buckets: list) -> int:
+        """Value at a percentile; caller holds the lock"""
+        target = max(1, math.ceil(self.count * percentile / 100.0))
+        seen = 0
+        for bucket, bucket_count in buckets:
+            seen += bucket_count
+            if seen >= target:
+                return min(self._highest_equivalent(bucket), self.max_us_seen)
+        return self.max_us_seen
+    
+    def percentile(self, percentile: float) -> float:
+        """Latency in milliseconds at a percentile (0-100)"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            return self._percentile_us(percentile, sorted(self.counts.items())) / 1000.0
+    
+    def summary(self) -> Dict[str, Any]:
+        """Count, mean, extremes and common percentiles in milliseconds"""
+        with self._lock:
+            if not self.count:
+                return {'count': 0}
+            
+            buckets = sorted(self.counts.items())
+            return {
+                'count': self.count,
+                'min': self.min_us / 1000.0,
+                'mean': round(self.total_us / self.count / 1000.0, 3),
+                'p50': self._percentile_us(50, buckets) / 1000.0,
+                'p90': self._percentile_us(90, buckets) / 1000.0,
+                'p99': self._percentile_us(99, buckets) / 1000.0,
+                'p999': self._percentile_us(99.9, buckets) / 1000.0,
+                'max': self.max_us_seen / 1000.0
+            }
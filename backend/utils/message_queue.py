@@ -0,0 +1,95 @@
+import pickle
+import time
+from datetime import datetime
+from bson import Binary
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+import socketio
+from config import Config
+from utils.database import get_db
+
+class MongoCappedManager(socketio.PubSubManager):
+    """Socket.IO client manager that shares broadcasts through a capped collection.
+    
+    Every process appends the messages it emits and tails the collection for
+    messages from the others, so a room broadcast reaches the clients of every
+    process without an extra broker.
+    """
+    
+    name = 'mongodb'
+    
+    def __init__(self, channel='flask-socketio', write_only=False, logger=None,
+                 collection_name='websocket_messages', size=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.collection_name = collection_name
+        self.size = size or Config.WEBSOCKET_QUEUE_COLLECTION_SIZE
+        self._collection = None
+    
+    def _get_collection(self):
+        """The capped collection, created on first use"""
+        if self._collection is None:
+            db = get_db()
+            if self.collection_name not in db.list_collection_names():
+                try:
+                    db.create_collection(self.collection_name, capped=True, size=self.size)
+                except CollectionInvalid:
+                    # Another process created it first
+                    pass
+            self._collection = db[self.collection_name]
+        return self._collection
+    
+    def _publish(self, data):
+        self._get_collection().insert_one({
+            'channel': self.channel,
+            'payload': Binary(pickle.dumps(data)),
+            'createdAt': datetime.now()
+        })
+    
+    def _listen(self):
+        """Tail the capped collection from its current end.
+        
+        After a reconnect the tail restarts in natural (insertion) order and
+        skips up to the last message seen. ObjectIds are not monotonic across
+        processes, so an _id range could skip a message that was inserted
+        later with a lower id.
+        """
+        collection = self._get_collection()
+        query = {'channel': self.channel}
+        last = collection.find_one(query, sort=[('$natural', -1)], projection={'_id': 1})
+        last_id = last['_id'] if last else None
+        
+        while True:
+            skipping = last_id is not None
+            if skipping and collection.find_one({'_id': last_id}, projection={'_id': 1}) is None:
+                # Rolled out of the capped collection: everything left is newer
+                self._get_logger().warning("Websocket message queue rolled over while reconnecting; messages may have been missed")
+                skipping = False
+            
+            try:
+                cursor = collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    for message in cursor:
+                        if skipping:
+                            skipping = message['_id'] != last_id
+                            continue
+                        last_id = message['_id']
+                        yield bytes(message['payload'])
+            except Exception as e:
+                self._get_logger().error(f"Error reading websocket message queue: {str(e)}")
+            
+            # A tailable cursor dies when the collection is empty or was rolled over
+            time.sleep(0.5)
+
+def get_queue_options(message_queue=None):
+    """SocketIO keyword arguments for the configured broadcast queue"""
+    message_queue = Config.WEBSOCKET_MESSAGE_QUEUE if message_queue is None else message_queue
+    
+    # In-process: the default Socket.IO manager keeps rooms in memory
+    if not message_queue:
+        return {}
+    
+    if message_queue == 'mongodb':
+        return {'client_manager': MongoCappedManager()}
+    
+    # Broker URLs are handled by Flask-SocketIO's own managers
+    return {'message_queue': message_queue}
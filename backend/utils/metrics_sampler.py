@@ -0,0 +1,158 @@
+import threading
+import time
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Any
+import psutil
+from config import Config
+from utils.database import get_db
+from utils.job_scheduler import get_job_scheduler
+
+class MetricsSampler:
+    """Samples CPU, memory, disk and database metrics as a scheduled job.
+    
+    Samples go into a fixed-size deque; appends and reads of the last item are
+    atomic, so readers never take a lock and get the latest sample in O(1).
+    """
+    
+    def __init__(self, interval: float = None, history_size: int = None):
+        self.db = get_db()
+        self.interval = interval or Config.METRICS_SAMPLE_INTERVAL
+        self.db_interval = Config.METRICS_DB_SAMPLE_INTERVAL
+        self.samples = deque(maxlen=history_size or Config.METRICS_HISTORY_SIZE)
+        
+        self._db_metrics: Dict[str, Any] = {}
+        self._db_sampled_at = 0.0
+        self.job_name = 'metrics_sampler'
+        self._start_lock = threading.Lock()
+        
+        # Static for the life of the process
+        self.core_count = psutil.cpu_count()
+        self.boot_time = psutil.boot_time()
+        
+        # Setup logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+    
+    @property
+    def running(self) -> bool:
+        scheduler = get_job_scheduler()
+        return scheduler.running and self.job_name in scheduler.jobs
+    
+    def start(self):
+        """Schedule periodic sampling"""
+        with self._start_lock:
+            if self.running:
+                return
+            
+            # The first non-blocking reading only sets the baseline
+            psutil.cpu_percent(interval=None)
+            
+            get_job_scheduler().add_job(self.job_name, self._sample_once, self.interval)
+        
+        self.logger.info(f"Metrics sampler started ({self.interval}s resolution)")
+    
+    def stop(self):
+        """Stop periodic sampling"""
+        get_job_scheduler().remove_job(self.job_name)
+        self.logger.info("Metrics sampler stopped")
+    
+    def _sample_once(self):
+        """Scheduled job: take one sample"""
+        self.samples.append(self._collect())
+    
+    def _database_metrics(self) -> Dict[str, Any]:
+        """Database connection info, refreshed every db_interval"""
+        now = time.monotonic()
+        if now - self._db_sampled_at >= self.db_interval:
+            self._db_sampled_at = now
+            try:
+                db_stats = self.db.command("serverStatus")
+                self._db_metrics = {
+                    'connections': db_stats.get('connections', {}),
+                    'uptime_seconds': db_stats.get('uptime', 0),
+                    'version': db_stats.get('version', 'unknown')
+                }
+            except Exception as e:
+                self._db_metrics = {'error': str(e)}
+        
+        return self._db_metrics
+    
+    def _collect(self) -> Dict[str, Any]:
+        """Take one sample without blocking on CPU measurement"""
+        # CPU usage since the previous call
+        cpu_percent = psutil.cpu_percent(interval=None)
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage('/')
+        
+        return {
+            'timestamp': datetime.now(),
+            'cpu': {
+                'usage_percent': cpu_percent,
+                'core_count': self.core_count
+            },
+            'memory': {
+                'total_gb': round(memory.total / (1024**3), 2),
+                'used_gb': round(memory.used / (1024**3), 2),
+                'usage_percent': memory.percent,
+                'available_gb': round(memory.available / (1024**3), 2)
+            },
+            'disk': {
+                'total_gb': round(disk.total / (1024**3), 2),
+                'used_gb': round(disk.used / (1024**3), 2),
+                'usage_percent': round((disk.used / disk.total) * 100, 2),
+                'free_gb': round(disk.free / (1024**3), 2)
+            },
+            'database': self._database_metrics(),
+            'system': {
+                'uptime_seconds': time.time() - self.boot_time,
+                'load_average': psutil.getloadavg() if hasattr(psutil, 'getloadavg') else [0, 0, 0]
+            }
+        }
+    
+    def latest(self) -> Dict[str, Any]:
+        """Most recent sample, starting the sampler on first use"""
+        try:
+            return dict(self.samples[-1])
+        except IndexError:
+            # No sample yet: start sampling and take the first one now
+            self.start()
+            sample = self._collect()
+            self.samples.append(sample)
+            return dict(sample)
+    
+    def get_history(self, seconds: int = 300) -> list:
+        """Samples from the last `seconds` seconds, oldest first"""
+        cutoff = datetime.now() - timedelta(seconds=seconds)
+        return [sample for sample in list(self.samples) if sample['timestamp'] >= cutoff]
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Sampler configuration and fill level"""
+        return {
+            'running': self.running,
+            'interval_seconds': self.interval,
+            'db_interval_seconds': self.db_interval,
+            'samples': len(self.samples),
+            'capacity': self.samples.maxlen
+        }
+
+# Global metrics sampler instance
+metrics_sampler = None
+_metrics_sampler_lock = threading.Lock()
+
+def get_metrics_sampler():
+    """Get the global metrics sampler instance"""
+    global metrics_sampler
+    with _metrics_sampler_lock:
+        if metrics_sampler is None:
+            metrics_sampler = MetricsSampler()
+    return metrics_sampler
+
+def start_metrics_sampling():
+    """Start background metrics sampling"""
+    get_metrics_sampler().start()
+
+def stop_metrics_sampling():
+    """Stop background metrics sampling"""
+    get_metrics_sampler().stop()
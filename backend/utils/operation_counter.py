@@ -0,0 +1,215 @@
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+from config import Config
+from utils.database import get_db
+from utils.timeseries import is_timeseries
+
+class OperationCounter:
+    """Rolling-window counts of MCP operations by status and type.
+    
+    Operations are counted in one-minute buckets by their creation timestamp,
+    like the count_documents queries they replace. Each operation in the
+    window is remembered with its current status, so a status change moves
+    its count instead of adding a new one and replayed events are no-ops.
+    
+    Counts come from the change stream when it is running, which sees writes
+    from every process, and from MCPOperation's logging path otherwise.
+    """
+    
+    BUCKET_SECONDS = 60
+    
+    def __init__(self, window_minutes: int = None):
+        self.db = get_db()
+        self.window_minutes = window_minutes or Config.OPERATION_COUNTER_WINDOW_MINUTES
+        
+        self._lock = threading.Lock()
+        self._buckets: Dict[int, Dict[str, Any]] = {}
+        self._operations: Dict[str, tuple] = {}
+        self._seeded = False
+        self._change_stream_manager = None
+        
+        # Setup logging
+        logging.basicConfig(level=logging.INFO)
+        self.logger = logging.getLogger(__name__)
+    
+    @classmethod
+    def _bucket(cls, timestamp: datetime) -> int:
+        return int(timestamp.timestamp()) // cls.BUCKET_SECONDS
+    
+    def _oldest_bucket(self) -> int:
+        return self._bucket(datetime.now()) - self.window_minutes + 1
+    
+    def attach(self, change_stream_manager):
+        """Count operations from change stream events while the stream runs"""
+        self._change_stream_manager = change_stream_manager
+        for operation_type in ('insert', 'update', 'replace'):
+            change_stream_manager.register_event_handler(operation_type, self._on_change)
+    
+    def _stream_fed(self) -> bool:
+        # Change streams do not report writes to time-series collections
+        if is_timeseries('mcp_operations'):
+            return False
+        return bool(self._change_stream_manager and self._change_stream_manager.running)
+    
+    def _ensure_seeded(self):
+        """Load operations already in the window; caller holds the lock"""
+        if self._seeded:
+            return
+        
+        cutoff = datetime.fromtimestamp(self._oldest_bucket() * self.BUCKET_SECONDS)
+        cursor = self.db.mcp_operations.find(
+            {'timestamp': {'$gte': cutoff}},
+            {'timestamp': 1, 'status': 1, 'operationType': 1}
+        )
+        
+        for operation in cursor:
+            self._apply(str(operation['_id']), operation['timestamp'],
+                        operation.get('status'), operation.get('operationType'))
+        
+        self._seeded = True
+    
+    def _apply(self, operation_id: str, timestamp: datetime, status: str, operation_type: str):
+        """Count a new operation or move an existing one to its new status"""
+        known = self._operations.get(operation_id)
+        
+        if known is not None:
+            bucket_key, old_status, operation_type, timestamp = known
+            if old_status == status:
+                return
+            bucket = self._buckets.get(bucket_key)
+            if bucket is not None:
+                bucket['status'][old_status] -= 1
+                bucket['status'][status] = bucket['status'].get(status, 0) + 1
+            self._operations[operation_id] = (bucket_key, status, operation_type, timestamp)
+            return
+        
+        if not isinstance(timestamp, datetime):
+            return
+        
+        bucket_key = self._bucket(timestamp)
+        if bucket_key < self._oldest_bucket():
+            return
+        
+        bucket = self._buckets.setdefault(bucket_key, {'total': 0, 'status': {}, 'type': {}})
+        bucket['total'] += 1
+        bucket['status'][status] = bucket['status'].get(status, 0) + 1
+        bucket['type'][operation_type] = bucket['type'].get(operation_type, 0) + 1
+        self._operations[operation_id] = (bucket_key, status, operation_type, timestamp)
+    
+    def _prune(self):
+        """Drop buckets that left the window; caller holds the lock"""
+        oldest = self._oldest_bucket()
+        expired = [key for key in self._buckets if key < oldest]
+        
+        if not expired:
+            return
+        
+        for key in expired:
+            del self._buckets[key]
+        self._operations = {
+            operation_id: entry for operation_id, entry in self._operations.items()
+            if entry[0] >= oldest
+        }
+    
+    def _on_change(self, event: Dict[str, Any]):
+        """Change stream handler for mcp_operations writes"""
+        if event.get('collection') != 'mcp_operations' or not event.get('afterState'):
+            return
+        
+        document = event['afterState']
+        self.record(event['entityId'], document.get('timestamp'),
+                    document.get('status'), document.get('operationType'))
+    
+    def record(self, operation_id: str, timestamp: Optional[datetime], status: str,
+               operation_type: str = None):
+        """Count an operation, or its change of status"""
+        with self._lock:
+            self._ensure_seeded()
+            self._prune()
+            self._apply(str(operation_id), timestamp, status, operation_type)
+    
+    def record_local(self, operation_id: str, timestamp: Optional[datetime], status: str,
+                     operation_type: str = None):
+        """Count a write made by this process unless the change stream will report it"""
+        if not self._stream_fed():
+            self.record(operation_id, timestamp, status, operation_type)
+    
+    def record_transition_local(self, from_status: str, to_status: str, created_before: datetime):
+        """Mirror a bulk status change made by this process, e.g. a stuck-operation sweep"""
+        if self._stream_fed():
+            return
+        
+        with self._lock:
+            self._ensure_seeded()
+            self._prune()
+            matched = [
+                operation_id for operation_id, entry in self._operations.items()
+                if entry[1] == from_status and entry[3] < created_before
+            ]
+            for operation_id in matched:
+                self._apply(operation_id, None, to_status, None)
+    
+    def counts(self, minutes: int) -> Dict[str, Any]:
+        """Operations created in the last `minutes` minutes, by status and type"""
+        if minutes > self.window_minutes:
+            raise ValueError(f"Window of {minutes} minutes exceeds the counter's {self.window_minutes}")
+        
+        with self._lock:
+            self._ensure_seeded()
+            self._prune()
+            
+            oldest = self._bucket(datetime.now()) - minutes + 1
+            total = 0
+            by_status: Dict[str, int] = {}
+            by_type: Dict[str, int] = {}
+            
+            for key, bucket in self._buckets.items():
+                if key < oldest:
+                    continue
+                total += bucket['total']
+                for status, count in bucket['status'].items():
+                    by_status[status] = by_status.get(status, 0) + count
+                for operation_type, count in bucket['type'].items():
+                    by_type[operation_type] = by_type.get(operation_type, 0) + count
+        
+        return {
+            'total': total,
+            'byStatus': {status: count for status, count in by_status.items() if count},
+            'byType': by_type
+        }
+    
+    def failure_rate(self, minutes: int) -> Dict[str, Any]:
+        """Failed and total operations in a window with the failure percentage"""
+        window = self.counts(minutes)
+        failed = window['byStatus'].get('failed', 0)
+        
+        return {
+            'total': window['total'],
+            'failed': failed,
+            'rate': (failed / max(window['total'], 1)) * 100
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Counter size and where its counts come from"""
+        with self._lock:
+            return {
+                'windowMinutes': self.window_minutes,
+                'buckets': len(self._buckets),
+                'trackedOperations': len(self._operations),
+                'source': 'change_stream' if self._stream_fed() else 'local',
+                'seeded': self._seeded
+            }
+
+# Global operation counter instance
+operation_counter = None
+_operation_counter_lock = threading.Lock()
+
+def get_operation_counter():
+    """Get the global operation counter instance"""
+    global operation_counter
+    with _operation_counter_lock:
+        if operation_counter is None:
+            operation_counter = OperationCounter()
+    return operation_counter
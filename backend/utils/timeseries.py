@@ -0,0 +1,186 @@
+"""Opt-in time-series storage for monitoring collections.
+
+Collections listed in Config.TIMESERIES_COLLECTIONS are created as MongoDB
+time-series collections, bucketed by their metaField so windowed reads only
+unpack the buckets they need. An existing regular collection is migrated in
+place: it is renamed aside, the time-series collection is created under the
+original name and the documents are copied back in timestamp order. A
+migration interrupted part way resumes from the newest copied timestamp on
+the next start.
+
+Change streams do not report writes to time-series collections; callers
+that rely on them check is_timeseries() and fall back to polling.
+"""
+import logging
+from pymongo.errors import OperationFailure
+from config import Config
+
+# collection -> time-series options plus the oldest server version whose
+# time-series collections support the updates the model makes
+TIMESERIES_REGISTRY = {
+    # Append-only health samples
+    'system_health': {
+        'timeField': 'timestamp',
+        'metaField': 'component',
+        'granularity': 'seconds',
+        'min_version': (5, 0)
+    },
+    # Status updates by _id need arbitrary time-series updates (7.0+)
+    'mcp_operations': {
+        'timeField': 'timestamp',
+        'metaField': 'operationType',
+        'granularity': 'seconds',
+        'min_version': (7, 0)
+    },
+}
+
+LEGACY_SUFFIX = '_pre_timeseries'
+COPY_BATCH_SIZE = 1000
+
+# Names of collections found or made time-series in this process
+_timeseries_collections = set()
+
+logger = logging.getLogger(__name__)
+
+def is_timeseries(collection_name):
+    """Whether a collection is stored as a time-series collection"""
+    return collection_name in _timeseries_collections
+
+def _server_version(db):
+    version = db.client.server_info().get('versionArray') or [0, 0]
+    return tuple(version[:2])
+
+def _collection_type(db, name):
+    """'timeseries', 'collection' or None when it does not exist"""
+    for info in db.list_collections(filter={'name': name}):
+        return info.get('type', 'collection')
+    return None
+
+def _create(db, name, spec):
+    options = {key: spec[key] for key in ('timeField', 'metaField', 'granularity')}
+    extra = {}
+    if Config.TIMESERIES_EXPIRE_DAYS > 0:
+        extra['expireAfterSeconds'] = int(Config.TIMESERIES_EXPIRE_DAYS * 86400)
+    db.create_collection(name, timeseries=options, **extra)
+
+def _copy(db, name, spec):
+    """Copy legacy documents into the time-series collection; returns (copied, skipped)"""
+    time_field = spec['timeField']
+    legacy = db[f"{name}{LEGACY_SUFFIX}"]
+    target = db[name]
+    
+    # Resume after the newest copied timestamp, skipping ids already copied at it
+    newest = target.find_one({}, {time_field: 1}, sort=[(time_field, -1)])
+    filter_query = {time_field: {'$type': 'date'}}
+    copied_at_newest = set()
+    if newest:
+        filter_query[time_field]['$gte'] = newest[time_field]
+        copied_at_newest = {doc['_id'] for doc in target.find({time_field: newest[time_field]}, {'_id': 1})}
+    
+    copied = 0
+    batch = []
+    for document in legacy.find(filter_query).sort(time_field, 1):
+        if document['_id'] in copied_at_newest:
+            continue
+        batch.append(document)
+        if len(batch) >= COPY_BATCH_SIZE:
+            target.insert_many(batch, ordered=True)
+            copied += len(batch)
+            batch = []
+    
+    if batch:
+        target.insert_many(batch, ordered=True)
+        copied += len(batch)
+    
+    # Time-series documents need a date in the time field
+    skipped = legacy.count_documents({time_field: {'$not': {'$type': 'date'}}})
+    
+    return copied, skipped
+
+def _migrate(db, name, spec, results):
+    """Bring one collection into time-series storage"""
+    legacy_name = f"{name}{LEGACY_SUFFIX}"
+    collection_type = _collection_type(db, name)
+    
+    if collection_type == 'collection':
+        db[name].rename(legacy_name)
+        collection_type = None
+    
+    if collection_type is None:
+        _create(db, name, spec)
+        results['created'].append(name)
+    
+    if _collection_type(db, legacy_name) is not None:
+        copied, skipped = _copy(db, name, spec)
+        results['migrated'][name] = copied
+        
+        if skipped:
+            # Keep the leftovers for inspection rather than losing them
+            logger.warning(f"{skipped} {name} documents without a {spec['timeField']} date stay in {legacy_name}")
+        else:
+            db[legacy_name].drop()
+    
+    _timeseries_collections.add(name)
+
+def _refresh_known(db):
+    """Record collections that are already time-series, configured or not"""
+    try:
+        for info in db.list_collections(filter={'type': 'timeseries'}):
+            _timeseries_collections.add(info['name'])
+    except Exception as e:
+        logger.warning(f"Could not list time-series collections: {str(e)}")
+
+def ensure_timeseries_collections(db, names=None):
+    """Create or migrate the configured time-series collections. Safe to run repeatedly."""
+    names = Config.TIMESERIES_COLLECTIONS if names is None else names
+    results = {'created': [], 'migrated': {}, 'skipped': []}
+    
+    _refresh_known(db)
+    
+    if not names:
+        return results
+    
+    try:
+        version = _server_version(db)
+    except Exception as e:
+        results['skipped'] = [{'collection': name, 'reason': str(e)} for name in names]
+        return results
+    
+    for name in names:
+        spec = TIMESERIES_REGISTRY.get(name)
+        
+        if spec is None:
+            results['skipped'].append({'collection': name, 'reason': 'No time-series definition'})
+            continue
+        
+        if version < spec['min_version']:
+            results['skipped'].append({
+                'collection': name,
+                'reason': f"Needs MongoDB {'.'.join(map(str, spec['min_version']))}+"
+            })
+            continue
+        
+        try:
+            _migrate(db, name, spec, results)
+        except OperationFailure as e:
+            results['skipped'].append({'collection': name, 'reason': str(e)})
+    
+    return results
+
+def get_storage_stats(db, names=None):
+    """Storage mode and size of the time-series candidates"""
+    stats = {}
+    
+    for name in names or TIMESERIES_REGISTRY:
+        try:
+            coll_stats = db.command('collStats', name)
+            stats[name] = {
+                'mode': 'timeseries' if is_timeseries(name) else 'regular',
+                'count': coll_stats.get('count'),
+                'storageSize': coll_stats.get('storageSize'),
+                'totalIndexSize': coll_stats.get('totalIndexSize')
+            }
+        except Exception as e:
+            stats[name] = {'mode': 'timeseries' if is_timeseries(name) else 'regular', 'error': str(e)}
+    
+    return stats
@@ -3,12 +3,20 @@ import json
 import logging
 import weakref
 from datetime import datetime
-from typing import Dict, Set, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable
 from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect
 from services.mcp_monitor import get_monitor_instance
 from services.audit_service import get_audit_service
 from services.analytics_engine import get_analytics_engine
 from services.notification_hub import get_notification_hub
+from utils.change_streams import get_change_stream_manager
+from utils.helpers import serialize_mongo_doc
+from utils.diff_engine import json_patch
+from utils.message_queue import get_queue_options
+from utils.connection_registry import ConnectionRegistry
+from utils.job_scheduler import get_job_scheduler
+from utils.timeseries import is_timeseries
+from config import Config
 import threading
 import time
 
@@ -18,22 +26,46 @@ class WebSocketManager:
         self.app = app
         
         # Connection management
-        self.connections: Dict[str, Dict] = {}  # session_id -> connection_info
-        self.rooms: Dict[str, Set[str]] = {}     # room_name -> set of session_ids
+        self.registry = ConnectionRegistry()
         
-        # Real-time data streams
+        # Backpressure for clients that read slower than we send
+        self.max_queue_depth = Config.WEBSOCKET_MAX_QUEUE_DEPTH
+        self.backpressure_policy = Config.WEBSOCKET_BACKPRESSURE_POLICY
+        self.outbox_drain_interval = Config.WEBSOCKET_OUTBOX_DRAIN_INTERVAL
+        
+        # Distributed mode: local sessions taken out of stream:<name> delta rooms
+        self.gated_sessions: Dict[str, set] = {}
+        
+        # Real-time data streams; streams with a coalesce window are pushed
+        # from the change stream and only polled while it is not running
         self.data_streams = {
-            'mcp_operations': {'enabled': True, 'interval': 2},
+            'mcp_operations': {'enabled': True, 'interval': 2, 'coalesce_ms': 100},
             'system_health': {'enabled': True, 'interval': 5},
-            'audit_trail': {'enabled': True, 'interval': 3},
+            'audit_trail': {'enabled': True, 'interval': 3, 'coalesce_ms': 250},
             'analytics': {'enabled': True, 'interval': 10},
-            'notifications': {'enabled': True, 'interval': 1}
+            'notifications': {'enabled': True, 'interval': 1, 'coalesce_ms': 50}
         }
         
+        # Change events waiting for their stream's coalesce window to close
+        self.pending_deltas: Dict[str, Dict[str, Any]] = {}
+        self._delta_condition = threading.Condition()
+        self.max_delta_items = 100
+        self._metrics_sent_at = 0.0
+        
+        # Versioned snapshots per polled stream; clients that acknowledge a
+        # version get patches against it instead of the full snapshot
+        self.snapshots: Dict[str, Dict[str, Any]] = {}
+        self.snapshot_history = Config.WEBSOCKET_SNAPSHOT_HISTORY
+        self.snapshot_stats = {'full': 0, 'patch': 0, 'unchanged': 0}
+        
         # Background tasks
         self.background_tasks = {}
         self.running = False
         
+        # With a message queue, broadcasts reach the clients of every process
+        self.async_mode = Config.WEBSOCKET_ASYNC_MODE
+        self.distributed = bool(Config.WEBSOCKET_MESSAGE_QUEUE)
+        
         # Services
         self.mcp_monitor = get_monitor_instance()
         self.audit_service = get_audit_service()
@@ -53,9 +85,12 @@ class WebSocketManager:
         self.socketio = SocketIO(
             app,
             cors_allowed_origins="*",
-            async_mode='threading',
+            async_mode=self.async_mode,
             logger=True,
-            engineio_logger=True
+            engineio_logger=True,
+            http_compression=Config.WEBSOCKET_COMPRESSION,
+            compression_threshold=Config.WEBSOCKET_COMPRESSION_THRESHOLD,
+            **get_queue_options()
         )
         
         # Register event handlers
@@ -72,12 +107,11 @@ class WebSocketManager:
             session_id = self._get_session_id()
             
             # Store connection info
-            self.connections[session_id] = {
-                'connected_at': datetime.now(),
-                'user_id': auth.get('user_id') if auth else None,
-                'subscriptions': set(),
-                'last_ping': datetime.now()
-            }
+            self.registry.add(session_id, auth.get('user_id') if auth else None)
+            
+            # Per-user room so send_to_user works across processes
+            if auth and auth.get('user_id'):
+                join_room(f"user:{auth['user_id']}")
             
             self.logger.info(f"WebSocket connected: {session_id}")
             
@@ -92,16 +126,8 @@ class WebSocketManager:
         def handle_disconnect():
             session_id = self._get_session_id()
             
-            # Clean up connection
-            if session_id in self.connections:
-                # Leave all rooms
-                for room in list(self.rooms.keys()):
-                    if session_id in self.rooms[room]:
-                        self.rooms[room].discard(session_id)
-                        if not self.rooms[room]:
-                            del self.rooms[room]
-                
-                del self.connections[session_id]
+            # Clean up connection and its subscriptions
+            self.registry.remove(session_id)
             
             self.logger.info(f"WebSocket disconnected: {session_id}")
         
@@ -115,17 +141,12 @@ class WebSocketManager:
                 emit('error', {'message': f'Unknown stream: {stream_name}'})
                 return
             
-            # Add to room
-            full_room_name = f"{stream_name}:{room_name}"
+            # Track subscription and add to room
+            full_room_name = self.registry.subscribe(session_id, stream_name, room_name)
             join_room(full_room_name)
             
-            # Track subscription
-            if session_id in self.connections:
-                self.connections[session_id]['subscriptions'].add(full_room_name)
-            
-            if full_room_name not in self.rooms:
-                self.rooms[full_room_name] = set()
-            self.rooms[full_room_name].add(session_id)
+            # Change stream deltas go to one room per stream
+            join_room(f"stream:{stream_name}")
             
             self.logger.info(f"Client {session_id} subscribed to {full_room_name}")
             
@@ -134,6 +155,8 @@ class WebSocketManager:
                 'room': room_name,
                 'status': 'success'
             })
+            
+            self._send_current_snapshot(session_id, stream_name)
         
         @self.socketio.on('unsubscribe')
         def handle_unsubscribe(data):
@@ -141,17 +164,12 @@ class WebSocketManager:
             stream_name = data.get('stream')
             room_name = data.get('room', 'default')
             
-            full_room_name = f"{stream_name}:{room_name}"
+            full_room_name = ConnectionRegistry.room_name(stream_name, room_name)
             leave_room(full_room_name)
             
             # Remove from tracking
-            if session_id in self.connections:
-                self.connections[session_id]['subscriptions'].discard(full_room_name)
-            
-            if full_room_name in self.rooms:
-                self.rooms[full_room_name].discard(session_id)
-                if not self.rooms[full_room_name]:
-                    del self.rooms[full_room_name]
+            if not self.registry.unsubscribe(session_id, stream_name, room_name):
+                leave_room(f"stream:{stream_name}")
             
             self.logger.info(f"Client {session_id} unsubscribed from {full_room_name}")
             
@@ -161,12 +179,18 @@ class WebSocketManager:
                 'status': 'success'
             })
         
-        @self.socketio.on('ping')
-        def handle_ping():
+        @self.socketio.on('ack_snapshot')
+        def handle_ack_snapshot(data):
             session_id = self._get_session_id()
+            stream_name = data.get('stream')
             
-            if session_id in self.connections:
-                self.connections[session_id]['last_ping'] = datetime.now()
+            # Later snapshots for this stream may be sent as patches against it
+            if stream_name in self.data_streams:
+                self.registry.ack(session_id, stream_name, data.get('version'))
+        
+        @self.socketio.on('ping')
+        def handle_ping():
+            self.registry.touch(self._get_session_id())
             
             emit('pong', {'server_time': datetime.now().isoformat()})
         
@@ -236,57 +260,258 @@ class WebSocketManager:
             return
         
         self.running = True
+        scheduler = get_job_scheduler()
         
+        # Polled streams are periodic jobs on the shared scheduler
         for stream_name, config in self.data_streams.items():
             if config['enabled']:
-                task_thread = threading.Thread(
-                    target=self._stream_data,
-                    args=(stream_name, config['interval']),
-                    daemon=True
-                )
-                task_thread.start()
-                self.background_tasks[stream_name] = task_thread
-        
-        # Start connection cleanup task
-        cleanup_thread = threading.Thread(target=self._cleanup_connections, daemon=True)
-        cleanup_thread.start()
-        self.background_tasks['cleanup'] = cleanup_thread
+                job_name = f"websocket:{stream_name}"
+                scheduler.add_job(job_name, lambda name=stream_name: self._stream_data(name),
+                                  config['interval'], initial_delay=0)
+                self.background_tasks[stream_name] = job_name
+        
+        # Push deltas for change stream backed streams
+        change_stream_manager = get_change_stream_manager()
+        for operation_type in ('insert', 'update', 'replace'):
+            change_stream_manager.register_event_handler(operation_type, self._on_change)
+        
+        delta_thread = threading.Thread(target=self._flush_deltas, daemon=True)
+        delta_thread.start()
+        self.background_tasks['deltas'] = delta_thread
+        
+        # Deliver held messages once congested clients catch up
+        scheduler.add_job('websocket:outbox', self._drain_outboxes, self.outbox_drain_interval)
+        self.background_tasks['outbox'] = 'websocket:outbox'
+        
+        # Queued deltas bypass _deliverable, so each process gates its own clients
+        if self.distributed:
+            scheduler.add_job('websocket:delta_backpressure', self._gate_delta_rooms, self.outbox_drain_interval)
+            self.background_tasks['delta_backpressure'] = 'websocket:delta_backpressure'
+        
+        # Connection cleanup every minute
+        scheduler.add_job('websocket:cleanup', self._cleanup_connections, 60)
+        self.background_tasks['cleanup'] = 'websocket:cleanup'
         
         self.logger.info("Background tasks started")
     
     def stop_background_tasks(self):
         """Stop all background tasks"""
         self.running = False
+        
+        scheduler = get_job_scheduler()
+        for name, task in list(self.background_tasks.items()):
+            if isinstance(task, str):
+                scheduler.remove_job(task)
+                del self.background_tasks[name]
+        
+        with self._delta_condition:
+            self._delta_condition.notify_all()
         self.logger.info("Background tasks stopped")
     
-    def _stream_data(self, stream_name: str, interval: int):
-        """Background task to stream data"""
+    def _is_event_driven(self, stream_name: str) -> bool:
+        """Check whether a stream is currently fed by the change stream.
+        
+        In a multi-process deployment the change stream runs in the process
+        with background services and its deltas arrive through the queue.
+        """
+        if 'coalesce_ms' not in self.data_streams[stream_name]:
+            return False
+        # Change streams do not report writes to time-series collections
+        if is_timeseries(stream_name):
+            return False
+        return self.distributed or get_change_stream_manager().running
+    
+    def _on_change(self, event: Dict[str, Any]):
+        """Queue a change stream event for its stream's next delta"""
+        stream_name = event.get('collection')
+        config = self.data_streams.get(stream_name)
+        
+        if not config or not config['enabled'] or 'coalesce_ms' not in config:
+            return
+        
+        # Nothing to do while nobody is listening; other processes' listeners
+        # are not visible here
+        if not self.distributed and not self.registry.has_subscribers(stream_name):
+            return
+        
+        document = event.get('afterState')
+        if not document:
+            return
+        
+        # Only system notifications are streamed, as with polling
+        if stream_name == 'notifications' and document.get('userId') != 'system':
+            return
+        
+        with self._delta_condition:
+            pending = self.pending_deltas.get(stream_name)
+            if pending is None:
+                pending = {
+                    'due': time.monotonic() + config['coalesce_ms'] / 1000,
+                    'changes': {},
+                    'skipped': 0
+                }
+                self.pending_deltas[stream_name] = pending
+                self._delta_condition.notify()
+            
+            # Later updates to the same document replace earlier ones
+            key = event.get('entityId')
+            if key in pending['changes'] or len(pending['changes']) < self.max_delta_items:
+                pending['changes'][key] = {
+                    'operation': event.get('operation'),
+                    'entityId': key,
+                    'document': document
+                }
+            else:
+                pending['skipped'] += 1
+    
+    def _flush_deltas(self):
+        """Emit coalesced deltas once each stream's window closes"""
         while self.running:
-            try:
-                # Check if anyone is subscribed to this stream
-                subscribed_rooms = [room for room in self.rooms.keys() if room.startswith(f"{stream_name}:")]
+            with self._delta_condition:
+                now = time.monotonic()
+                due = [name for name, pending in self.pending_deltas.items() if pending['due'] <= now]
+                ready = {name: self.pending_deltas.pop(name) for name in due}
                 
-                if not subscribed_rooms:
-                    time.sleep(interval)
+                if not ready:
+                    next_due = min((pending['due'] for pending in self.pending_deltas.values()), default=None)
+                    self._delta_condition.wait(timeout=max(0, next_due - now) if next_due else 1)
                     continue
-                
-                # Get data for this stream
-                data = self._get_stream_data(stream_name)
-                
-                if data:
-                    # Broadcast to all subscribed rooms
-                    for room in subscribed_rooms:
-                        self.socketio.emit('stream_data', {
-                            'stream': stream_name,
-                            'data': data,
-                            'timestamp': datetime.now().isoformat()
-                        }, room=room)
-                
-                time.sleep(interval)
-                
-            except Exception as e:
-                self.logger.error(f"Error in {stream_name} stream: {str(e)}")
-                time.sleep(interval * 2)  # Wait longer on error
+            
+            for stream_name, pending in ready.items():
+                try:
+                    self._emit_delta(stream_name, pending)
+                except Exception as e:
+                    self.logger.error(f"Error emitting {stream_name} delta: {str(e)}")
+    
+    def _emit_delta(self, stream_name: str, pending: Dict[str, Any]):
+        """Send one coalesced delta to every subscriber of a stream"""
+        if not self.distributed and not self.registry.has_subscribers(stream_name):
+            return
+        
+        data = {
+            'changes': serialize_mongo_doc(list(pending['changes'].values())),
+            'skipped': pending['skipped']
+        }
+        
+        # Aggregate metrics are refreshed at most once per polling interval
+        if stream_name == 'mcp_operations':
+            now = time.monotonic()
+            if now - self._metrics_sent_at >= self.data_streams[stream_name]['interval']:
+                data['realtime_metrics'] = self.mcp_monitor.get_realtime_metrics()
+                self._metrics_sent_at = now
+        
+        message = {
+            'stream': stream_name,
+            'data': data,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        # Every process emits to its own members of the room; congested ones
+        # have been taken out of it by _gate_delta_rooms
+        if self.distributed:
+            self.socketio.emit('stream_delta', message, to=f"stream:{stream_name}")
+            return
+        
+        # Congested clients skip deltas and are told to reload once they drain
+        ready = self._deliverable(self.registry.sessions_for_stream(stream_name), stream_name,
+                                  'resync_required', {'stream': stream_name})
+        if ready:
+            self.socketio.emit('stream_delta', message, to=list(ready))
+            self.registry.record_sent(ready)
+    
+    def _stream_data(self, stream_name: str):
+        """Scheduled job: publish a stream's snapshot to its subscribers"""
+        # Check if anyone is subscribed to this stream; change stream deltas
+        # replace polling while it runs
+        if not self.registry.has_subscribers(stream_name) or self._is_event_driven(stream_name):
+            return
+        
+        # Get data for this stream
+        data = self._get_stream_data(stream_name)
+        
+        if data:
+            self._publish_snapshot(stream_name, data)
+    
+    def _send_current_snapshot(self, session_id: str, stream_name: str):
+        """Give a new subscriber the latest snapshot instead of waiting for the data to change"""
+        snapshot = self.snapshots.get(stream_name)
+        if not snapshot or snapshot['data'] is None or self._is_event_driven(stream_name):
+            return
+        
+        self.socketio.emit('stream_data', {
+            'stream': stream_name,
+            'version': snapshot['version'],
+            'data': snapshot['data'],
+            'timestamp': snapshot['timestamp']
+        }, to=session_id, ignore_queue=True)
+        self.registry.record_sent([session_id])
+    
+    def _publish_snapshot(self, stream_name: str, data: Dict[str, Any]):
+        """Publish a new snapshot version, serialized once and shared by all rooms"""
+        data = serialize_mongo_doc(data)
+        snapshot = self.snapshots.setdefault(stream_name, {'version': 0, 'data': None, 'history': {}, 'timestamp': None})
+        
+        if data == snapshot['data']:
+            self.snapshot_stats['unchanged'] += 1
+            return
+        
+        version = snapshot['version'] + 1
+        snapshot['version'] = version
+        snapshot['data'] = data
+        snapshot['history'][version] = data
+        for old_version in [v for v in snapshot['history'] if v <= version - self.snapshot_history]:
+            del snapshot['history'][old_version]
+        
+        timestamp = datetime.now().isoformat()
+        snapshot['timestamp'] = timestamp
+        message = {
+            'stream': stream_name,
+            'version': version,
+            'data': data,
+            'timestamp': timestamp
+        }
+        
+        # Congested clients only keep the newest snapshot until they drain
+        sessions = self._deliverable(self.registry.sessions_for_stream(stream_name), stream_name,
+                                     'stream_data', message)
+        
+        # Group subscribers by the version they acknowledged
+        by_base: Dict[int, list] = {}
+        for session_id in sessions:
+            base = self.registry.acked_version(session_id, stream_name)
+            if base in snapshot['history'] and base != version:
+                by_base.setdefault(base, []).append(session_id)
+        
+        full_payload = None
+        patched = set()
+        
+        for base, session_ids in by_base.items():
+            ops = json_patch(snapshot['history'][base], data)
+            
+            # A patch is only worth sending when it is smaller than the snapshot
+            if full_payload is None:
+                full_payload = len(json.dumps(data, default=str))
+            if len(json.dumps(ops, default=str)) >= full_payload:
+                continue
+            
+            self.socketio.emit('stream_patch', {
+                'stream': stream_name,
+                'base': base,
+                'version': version,
+                'ops': ops,
+                'timestamp': timestamp
+            }, to=session_ids, ignore_queue=True)
+            patched.update(session_ids)
+            self.snapshot_stats['patch'] += 1
+        
+        # One emit for everyone else, so the snapshot is encoded once. Every
+        # process polls for its own clients, so snapshots skip the queue.
+        remaining = sessions - patched
+        if remaining:
+            self.socketio.emit('stream_data', message, to=list(remaining), ignore_queue=True)
+            self.snapshot_stats['full'] += 1
+        
+        self.registry.record_sent(sessions)
     
     def _get_stream_data(self, stream_name: str) -> Optional[Dict[str, Any]]:
         """Get current data for a stream"""
@@ -325,35 +550,108 @@ class WebSocketManager:
     
     def _cleanup_connections(self):
         """Clean up stale connections"""
-        while self.running:
+        # Connections that haven't pinged in 5 minutes
+        for session_id in self.registry.stale_sessions(300):
+            self.logger.info(f"Cleaning up stale connection: {session_id}")
+            self.registry.remove(session_id)
+        
+        self._sample_queue_depths()
+    
+    def _queue_depth(self, session_id: str) -> int:
+        """Packets waiting in a client's Engine.IO send queue"""
+        try:
+            server = self.socketio.server
+            eio_sid = server.manager.eio_sid_from_sid(session_id, '/')
+            socket = server.eio.sockets.get(eio_sid)
+            depth = socket.queue.qsize() if socket is not None else 0
+        except Exception:
+            return 0
+        
+        self.registry.set_queue_depth(session_id, depth)
+        return depth
+    
+    def _sample_queue_depths(self):
+        """Record each client's pending Engine.IO packet count in the registry"""
+        if not self.socketio:
+            return
+        
+        for session_id in self.registry.session_ids():
+            self._queue_depth(session_id)
+    
+    def _deliverable(self, session_ids, stream_name: str, event: str, message: Any) -> set:
+        """Sessions that can take a message now; the rest get the backpressure policy"""
+        ready = set()
+        
+        for session_id in session_ids:
+            congested = (self.registry.has_held(session_id, stream_name) or
+                         self._queue_depth(session_id) > self.max_queue_depth)
+            
+            if not congested:
+                ready.add(session_id)
+            elif self.backpressure_policy == 'disconnect':
+                self._disconnect_slow_client(session_id)
+            else:
+                self.registry.hold(session_id, stream_name, event, message)
+        
+        return ready
+    
+    def _gate_delta_rooms(self):
+        """Scheduled job: apply backpressure to queued deltas for this process's clients.
+        
+        With a message queue, deltas reach every process through the queue and
+        go straight to the local members of stream:<name>, so the sender cannot
+        see congestion here. Congested clients leave those rooms and get the
+        backpressure policy; _drain_outboxes puts them back once they drain.
+        """
+        if not self.socketio:
+            return
+        
+        for session_id in [sid for sid in self.gated_sessions if not self.registry.get(sid)]:
+            del self.gated_sessions[session_id]
+        
+        for stream_name in self.data_streams:
+            if not self._is_event_driven(stream_name):
+                continue
+            
+            sessions = {
+                session_id for session_id in self.registry.sessions_for_stream(stream_name)
+                if stream_name not in self.gated_sessions.get(session_id, ())
+            }
+            ready = self._deliverable(sessions, stream_name, 'resync_required', {'stream': stream_name})
+            
+            for session_id in sessions - ready:
+                if not self.registry.get(session_id):
+                    continue
+                self.socketio.server.leave_room(session_id, f"stream:{stream_name}", namespace='/')
+                self.gated_sessions.setdefault(session_id, set()).add(stream_name)
+    
+    def _disconnect_slow_client(self, session_id: str):
+        """Drop a client whose send queue stays full"""
+        self.logger.warning(f"Disconnecting slow WebSocket client: {session_id}")
+        self.registry.remove(session_id)
+        self.registry.record_slow_disconnect()
+        try:
+            self.socketio.server.disconnect(session_id, ignore_queue=True)
+        except Exception as e:
+            self.logger.error(f"Error disconnecting {session_id}: {str(e)}")
+    
+    def _drain_outboxes(self):
+        """Send held messages to clients whose queue has drained"""
+        for session_id in self.registry.backlogged_sessions():
             try:
-                current_time = datetime.now()
-                stale_connections = []
-                
-                for session_id, conn_info in self.connections.items():
-                    # Check for connections that haven't pinged in 5 minutes
-                    if (current_time - conn_info['last_ping']).total_seconds() > 300:
-                        stale_connections.append(session_id)
-                
-                # Remove stale connections
-                for session_id in stale_connections:
-                    self.logger.info(f"Cleaning up stale connection: {session_id}")
-                    
-                    # Remove from rooms
-                    for room in list(self.rooms.keys()):
-                        if session_id in self.rooms[room]:
-                            self.rooms[room].discard(session_id)
-                            if not self.rooms[room]:
-                                del self.rooms[room]
-                    
-                    # Remove from connections
-                    del self.connections[session_id]
+                # Wait until the queue is half empty so the client does not flap
+                if self._queue_depth(session_id) > self.max_queue_depth // 2:
+                    continue
                 
-                time.sleep(60)  # Check every minute
+                # Rejoin delta rooms before the resync so no delta falls in between
+                for stream_name in self.gated_sessions.pop(session_id, ()):
+                    self.socketio.server.enter_room(session_id, f"stream:{stream_name}", namespace='/')
                 
+                for event, message, _ in self.registry.take_outbox(session_id).values():
+                    self.socketio.emit(event, message, to=session_id, ignore_queue=True)
+                    self.registry.record_sent([session_id])
             except Exception as e:
-                self.logger.error(f"Error in connection cleanup: {str(e)}")
-                time.sleep(60)
+                self.logger.error(f"Error draining outbox for {session_id}: {str(e)}")
     
     def broadcast_notification(self, notification_data: Dict[str, Any]):
         """Broadcast a notification to all connected clients"""
@@ -369,26 +667,42 @@ class WebSocketManager:
     
     def send_to_user(self, user_id: str, event: str, data: Any):
         """Send data to a specific user"""
-        # Find sessions for this user
-        user_sessions = [
-            sid for sid, conn_info in self.connections.items()
-            if conn_info.get('user_id') == user_id
-        ]
-        
-        for session_id in user_sessions:
-            self.socketio.emit(event, data, room=session_id)
+        # Sessions join their user's room on connect, in whichever process
+        self.socketio.emit(event, data, to=f"user:{user_id}")
     
     def get_connection_stats(self) -> Dict[str, Any]:
         """Get WebSocket connection statistics"""
+        self._sample_queue_depths()
+        registry_stats = self.registry.get_stats()
+        current_versions = {name: snapshot['version'] for name, snapshot in self.snapshots.items()}
+        
         return {
-            'total_connections': len(self.connections),
-            'active_rooms': len(self.rooms),
+            'total_connections': registry_stats['connections'],
+            'active_rooms': registry_stats['rooms'],
+            'subscribers_by_stream': registry_stats['subscribers_by_stream'],
+            'send_queue_depth': registry_stats['queue_depth'],
+            'backpressure': {
+                'policy': self.backpressure_policy,
+                'max_queue_depth': self.max_queue_depth,
+                'backlogged_clients': registry_stats['backlogged'],
+                'dropped_messages': registry_stats['dropped'],
+                'disconnected_slow': registry_stats['disconnected_slow']
+            },
+            'clients': self.registry.client_metrics(current_versions),
             'streams': self.data_streams,
             'background_tasks': list(self.background_tasks.keys()),
-            'running': self.running
+            'event_driven_streams': [name for name in self.data_streams if self._is_event_driven(name)],
+            'pending_deltas': {name: len(pending['changes']) for name, pending in self.pending_deltas.items()},
+            'snapshot_versions': current_versions,
+            'snapshot_emits': dict(self.snapshot_stats),
+            'running': self.running,
+            'async_mode': self.async_mode,
+            'message_queue': Config.WEBSOCKET_MESSAGE_QUEUE.split('://')[0] or 'in-process',
+            'node': getattr(self.socketio.server.manager, 'host_id', None) if self.socketio else None
         }
     
-    def configure_stream(self, stream_name: str, enabled: bool = None, interval: int = None):
+    def configure_stream(self, stream_name: str, enabled: bool = None, interval: int = None,
+                         coalesce_ms: int = None):
         """Configure a data stream"""
         if stream_name not in self.data_streams:
             return {'success': False, 'error': f'Unknown stream: {stream_name}'}
@@ -398,6 +712,12 @@ class WebSocketManager:
         
         if interval is not None:
             self.data_streams[stream_name]['interval'] = interval
+            get_job_scheduler().reschedule(f"websocket:{stream_name}", interval)
+        
+        if coalesce_ms is not None:
+            if 'coalesce_ms' not in self.data_streams[stream_name]:
+                return {'success': False, 'error': f'Stream {stream_name} is not change stream backed'}
+            self.data_streams[stream_name]['coalesce_ms'] = coalesce_ms
         
         return {
             'success': True,